@@ -0,0 +1,106 @@
+"""Measure churn model scoring throughput with the warm model registry.
+
+Usage: python benchmarks/bench_churn_scoring.py [--customers 500000] [--algorithm auto]
+
+Trains a model on synthetic RFM aggregates, then times: loading the artifact from disk
+(what every request paid without the registry) against a warm registry lookup; scoring
+one customer per predict_proba call against batched scoring; and the full batched path
+including the output records.
+"""
+from __future__ import annotations
+
+import argparse
+import pathlib
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.services.predictive.app.pipelines import churn_model
+from ai_insight_suite.services.predictive.app.pipelines.churn import churn_records
+from ai_insight_suite.services.predictive.app.pipelines.churn_registry import ChurnRegistry
+
+
+def _aggregates(n: int, seed: int) -> pd.DataFrame:
+	rng = np.random.default_rng(seed)
+	end = pd.Timestamp("2024-12-31")
+	last = end - pd.to_timedelta(rng.exponential(60, n).astype(int), unit="D")
+	first = last - pd.to_timedelta(rng.integers(0, 900, n), unit="D")
+	frequency = rng.poisson(12, n) + 1
+	return pd.DataFrame({
+		"customer_id": np.arange(n),
+		"first_date": first,
+		"last_date": last,
+		"frequency": frequency,
+		"monetary": frequency * rng.gamma(2.0, 40.0, n),
+	})
+
+
+def _time(fn, repeat: int):
+	times = []
+	out = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		out = fn()
+		times.append(time.perf_counter() - start)
+	return statistics.median(times), out
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--customers", type=int, default=500_000)
+	parser.add_argument("--train-customers", type=int, default=50_000)
+	parser.add_argument("--algorithm", default="auto")
+	parser.add_argument("--single", type=int, default=2_000, help="customers scored one by one")
+	parser.add_argument("--repeat", type=int, default=3)
+	args = parser.parse_args()
+
+	registry = ChurnRegistry(pathlib.Path(tempfile.mkdtemp()) / "churn")
+	churn_model.churn_registry = registry
+	train = _aggregates(args.train_customers, 0)
+	cutoff = pd.Timestamp("2024-12-31")
+	X = churn_model.features(train, cutoff)
+	y = (X[:, 0] > 90).astype(np.int8)  # stand-in label; throughput does not depend on it
+	algo, estimator = churn_model._estimator(args.algorithm)
+	estimator.fit(X, y)
+	meta = churn_model.ChurnModel(
+		name="bench",
+		algorithm=algo,
+		features=list(churn_model.FEATURES),
+		label_days=90,
+		cutoff=cutoff,
+		customers=len(train),
+		churn_rate=float(y.mean()),
+	)
+	registry.save(meta, estimator)
+	agg = _aggregates(args.customers, 1)
+
+	cold_s, _ = _time(lambda: ChurnRegistry(registry.root).get("bench"), args.repeat)
+	warm_s, loaded = _time(lambda: registry.get("bench"), args.repeat)
+	sample = agg.head(args.single)
+	single_s, _ = _time(
+		lambda: [
+			loaded.estimator.predict_proba(churn_model.features(sample.iloc[i : i + 1], cutoff))
+			for i in range(len(sample))
+		],
+		1,
+	)
+	batch_s, proba = _time(lambda: churn_model.predict(loaded, agg, cutoff), args.repeat)
+	full_s, _ = _time(
+		lambda: churn_records(agg["customer_id"].to_numpy(), churn_model.predict(loaded, agg, cutoff)),
+		args.repeat,
+	)
+
+	print(f"{algo} model, {args.customers} customers, batch={settings.CHURN_SCORE_BATCH}")
+	print(f"artifact load (cold)   {cold_s * 1000:10.2f} ms")
+	print(f"registry get (warm)    {warm_s * 1000:10.4f} ms")
+	print(f"one per call           {len(sample) / single_s:12,.0f} customers/s")
+	print(f"batched predict        {len(agg) / batch_s:12,.0f} customers/s")
+	print(f"batched with records   {len(agg) / full_s:12,.0f} customers/s")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,98 @@
+"""Compare per-value locale formatting with the bulk Series formatters.
+
+Usage: python benchmarks/bench_i18n.py [--rows 50000] [--distinct 2000] [--locale ar]
+
+Builds a frame of amounts and dates with a given number of distinct values, formats it
+once with ``Series.map`` over the per-value helpers and once with the bulk APIs, checks
+the outputs match, and prints the median wall time of each.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from ai_insight_suite.libs.common.i18n import (
+	AR_DIGITS,
+	format_dates,
+	format_money,
+	format_money_series,
+	format_numbers,
+	parse_arabic_numerals,
+	to_locale_date,
+	to_locale_number,
+)
+
+
+def _parse_per_char(text: str) -> str:
+	# the previous parse_arabic_numerals: reverse map rebuilt per call, joined per character
+	rev = {v: k for k, v in AR_DIGITS.items()}
+	return "".join(rev.get(ch, ch) for ch in text)
+
+
+def _time(fn, repeat: int):
+	times = []
+	out = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		out = fn()
+		times.append(time.perf_counter() - start)
+	return statistics.median(times), out
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--rows", type=int, default=50_000)
+	parser.add_argument("--distinct", type=int, default=2_000)
+	parser.add_argument("--locale", default="ar")
+	parser.add_argument("--repeat", type=int, default=3)
+	args = parser.parse_args()
+
+	rng = np.random.default_rng(0)
+	pool = np.round(rng.uniform(1, 100_000, args.distinct), 2)
+	amounts = pd.Series(rng.choice(pool, args.rows))
+	days = pd.date_range("2023-01-01", periods=min(args.distinct, 3650), freq="D")
+	dates = pd.Series(rng.choice(days.date, args.rows))
+	loc = args.locale
+
+	cases = [
+		(
+			"numbers",
+			lambda: amounts.map(lambda v: to_locale_number(float(v), loc)),
+			lambda: format_numbers(amounts, loc),
+		),
+		(
+			"dates",
+			lambda: dates.map(lambda v: to_locale_date(v, loc)),
+			lambda: format_dates(dates, loc),
+		),
+		(
+			"money",
+			lambda: amounts.map(lambda v: format_money(float(v), "SAR", loc)),
+			lambda: format_money_series(amounts, "SAR", loc),
+		),
+	]
+	text = " ".join(format_numbers(amounts, "ar").head(10_000))
+	cases.append(
+		(
+			"parse digits",
+			lambda: _parse_per_char(text),
+			lambda: parse_arabic_numerals(text),
+		)
+	)
+
+	print(f"{args.rows} rows, {args.distinct} distinct values, locale={loc}")
+	print(f"{'case':14} {'per-value s':>12} {'bulk s':>8} {'speedup':>8}")
+	for name, per_value, bulk in cases:
+		slow_s, slow = _time(per_value, args.repeat)
+		fast_s, fast = _time(bulk, args.repeat)
+		if isinstance(slow, pd.Series) and not slow.equals(fast):
+			raise SystemExit(f"{name}: bulk output differs from per-value output")
+		print(f"{name:14} {slow_s:12.3f} {fast_s:8.3f} {slow_s / fast_s:7.1f}x")
+
+
+if __name__ == "__main__":
+	main()
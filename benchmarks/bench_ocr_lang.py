@@ -0,0 +1,55 @@
+"""Compare fixed ``ara+eng`` OCR against per-page script detection.
+
+Usage: python benchmarks/bench_ocr_lang.py DOC [DOC ...]
+
+Runs every document through ``ocr_document`` (no result cache) with the PDF text layer
+disabled, so every page is OCR'd: once with the dual model and once with ``lang=auto``.
+Prints wall time per document plus the languages chosen.
+Requires tesseract with the eng, ara and osd traineddata installed.
+"""
+from __future__ import annotations
+
+import argparse
+import pathlib
+import statistics
+import time
+from difflib import SequenceMatcher
+
+from ai_insight_suite.services.doc_automation.app.pipelines.ocr import OcrConfig, ocr_document
+
+
+def _run(path: pathlib.Path, lang: str, repeat: int):
+	times = []
+	text, meta = "", {}
+	cfg = OcrConfig(lang=lang, text_layer=False)
+	for _ in range(repeat):
+		start = time.perf_counter()
+		text, meta = ocr_document(path, parallel=False, config=cfg)
+		times.append(time.perf_counter() - start)
+	return statistics.median(times), text, meta
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("docs", nargs="+", type=pathlib.Path)
+	parser.add_argument("--repeat", type=int, default=3)
+	args = parser.parse_args()
+
+	total_dual = total_auto = 0.0
+	print(f"{'document':40} {'ara+eng s':>10} {'auto s':>8} {'speedup':>8} {'similarity':>10}  langs")
+	for doc in args.docs:
+		dual_s, dual_text, _ = _run(doc, "ara+eng", args.repeat)
+		auto_s, auto_text, meta = _run(doc, "auto", args.repeat)
+		langs = ",".join(str(p.get("lang")) for p in meta.get("page_timings", []))
+		similarity = SequenceMatcher(None, dual_text, auto_text).ratio()
+		total_dual += dual_s
+		total_auto += auto_s
+		print(
+			f"{doc.name[:40]:40} {dual_s:10.2f} {auto_s:8.2f} {dual_s / auto_s:7.2f}x "
+			f"{similarity:10.3f}  {langs}"
+		)
+	print(f"{'TOTAL':40} {total_dual:10.2f} {total_auto:8.2f} {total_dual / total_auto:7.2f}x")
+
+
+if __name__ == "__main__":
+	main()
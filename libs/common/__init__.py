@@ -4,6 +4,9 @@ __all__ = [
 	"i18n",
 	"storage",
 	"sheets",
+	"cache",
+	"jobs",
+	"db",
 ]
 
 
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import json
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .storage import CACHE_DIR
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+	key TEXT PRIMARY KEY,
+	value BLOB NOT NULL,
+	size INTEGER NOT NULL,
+	accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+	name TEXT PRIMARY KEY,
+	value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0), ('evictions', 0);
+"""
+
+
+# JSON result cache in a SQLite file under the data dir. SQLite's file locking makes one
+# cache safe to share between uvicorn workers; entries are evicted least-recently-used
+# once either the byte or the entry limit is exceeded.
+class ResultCache:
+	def __init__(
+		self,
+		name: str,
+		max_bytes: int,
+		max_entries: int,
+		directory: pathlib.Path = CACHE_DIR,
+	):
+		directory.mkdir(parents=True, exist_ok=True)
+		self.path = directory / f"{name}.sqlite3"
+		self.max_bytes = max_bytes
+		self.max_entries = max_entries
+		self._local = threading.local()
+		self._conn().executescript(_SCHEMA)
+
+	def _conn(self) -> sqlite3.Connection:
+		conn = getattr(self._local, "conn", None)
+		if conn is None:
+			conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			self._local.conn = conn
+		return conn
+
+	def get(self, key: str) -> Optional[Any]:
+		conn = self._conn()
+		row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+		if row is None:
+			conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'misses'")
+			return None
+		conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+		conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'hits'")
+		return json.loads(row[0])
+
+	def put(self, key: str, value: Any) -> None:
+		blob = json.dumps(value, ensure_ascii=False).encode("utf-8")
+		if len(blob) > self.max_bytes:
+			return
+		conn = self._conn()
+		conn.execute("BEGIN IMMEDIATE")
+		try:
+			conn.execute(
+				"INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+				(key, blob, len(blob), time.time()),
+			)
+			self._evict(conn)
+			conn.execute("COMMIT")
+		except BaseException:
+			conn.execute("ROLLBACK")
+			raise
+
+	def _evict(self, conn: sqlite3.Connection) -> None:
+		count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+		if count <= self.max_entries and total <= self.max_bytes:
+			return
+		victims = []
+		for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+			if count <= self.max_entries and total <= self.max_bytes:
+				break
+			victims.append((key,))
+			count -= 1
+			total -= size
+		conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+		conn.execute(
+			"UPDATE counters SET value = value + ? WHERE name = 'evictions'", (len(victims),)
+		)
+
+	def stats(self) -> Dict[str, int]:
+		conn = self._conn()
+		out = {name: value for name, value in conn.execute("SELECT name, value FROM counters")}
+		count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+		out.update(entries=count, bytes=total)
+		return out
+
+	def clear(self) -> None:
+		conn = self._conn()
+		conn.execute("DELETE FROM entries")
+		conn.execute("UPDATE counters SET value = 0")
@@ -14,6 +14,12 @@ class Settings(BaseSettings):
 	# Auth
 	ADMIN_API_KEY: str | None = Field(default=None)
 
+	# Uploads
+	MAX_UPLOAD_BYTES: int = Field(default=25 * 1024 * 1024)  # per file
+	MAX_REQUEST_BYTES: int = Field(default=256 * 1024 * 1024)  # whole request body (batches)
+	UPLOAD_CHUNK_BYTES: int = Field(default=1024 * 1024)
+	UPLOAD_MEMORY_BYTES: int = Field(default=8 * 1024 * 1024)  # images up to this decode from memory
+
 	# Optional Cloud OCR
 	USE_TEXTRACT: bool = Field(default=False)
 	USE_GVISION: bool = Field(default=False)
@@ -28,15 +34,72 @@ class Settings(BaseSettings):
 
 	# Google Sheets
 	GOOGLE_SHEETS_CREDS_JSON: str | None = None
+	SHEETS_CACHE_TTL_SECONDS: int = Field(default=300)  # cached worksheets and header rows
+	SHEETS_FLUSH_SECONDS: float = Field(default=2.0)  # coalesced appends are written this often
+	SHEETS_BATCH_ROWS: int = Field(default=500)  # or as soon as this many rows are queued
+	SHEETS_QUEUE_SIZE: int = Field(default=10_000)
+	SHEETS_MAX_RETRIES: int = Field(default=5)
+	SHEETS_BACKOFF_SECONDS: float = Field(default=0.5)
+	SHEETS_BACKOFF_MAX_SECONDS: float = Field(default=30.0)
 
 	# OpenAI (optional)
 	OPENAI_API_KEY: str | None = None
 
+	# OCR
+	OCR_ENGINE: str = Field(default="auto")  # tesserocr (in-process), pytesseract, or auto
+	OCR_LANG: str = Field(default="auto")  # "auto" = per-page script detection, else e.g. "ara+eng"
+	OCR_DETECT_MAX_SIDE: int = Field(default=1024)  # px, longest side of the OSD copy
+	OCR_DETECT_MIN_CONF: float = Field(default=1.5)  # below this OSD falls back to ara+eng
+	OCR_WORKERS: int = Field(default=1)  # >1 enables the shared per-page process pool
+	OCR_MAX_PENDING_PAGES: int = Field(default=0)  # pages queued across all requests; 0 = 2x workers
+	OCR_PDF_DPI: int = Field(default=200)
+	OCR_PDF_GRAYSCALE: bool = Field(default=True)
+	OCR_PDF_WINDOW: int = Field(default=1)  # pages rasterized per poppler call
+	OCR_MAX_PAGES: int = Field(default=0)  # 0 = no limit
+	OCR_USE_TEXT_LAYER: bool = Field(default=True)  # read embedded PDF text instead of OCR
+	OCR_TEXT_LAYER_MIN_CHARS: int = Field(default=32)
+	OCR_CACHE_ENABLED: bool = Field(default=True)
+	OCR_CACHE_MAX_BYTES: int = Field(default=256 * 1024 * 1024)
+	OCR_CACHE_MAX_ENTRIES: int = Field(default=10_000)
+
+	# Background jobs
+	JOB_WORKERS: int = Field(default=2)
+	JOB_QUEUE_SIZE: int = Field(default=16)  # waiting jobs beyond the running ones
+	JOB_RESULT_TTL_SECONDS: int = Field(default=3600)
+	BATCH_CONCURRENCY: int = Field(default=4)  # documents in flight per batch request
+	BATCH_MAX_FILES: int = Field(default=500)
+	# per zip archive in a batch; each document inside is still held to MAX_UPLOAD_BYTES
+	BATCH_MAX_ZIP_BYTES: int = Field(default=256 * 1024 * 1024)
+
 	# Predictive
+	INGEST_BATCH_ROWS: int = Field(default=500_000)  # rows per frame when uploads are streamed
+	INGEST_BLOCK_BYTES: int = Field(default=1024 * 1024)  # pyarrow CSV block size
 	USE_PROPHET: bool = False
+	FORECAST_STATE_ENABLED: bool = Field(default=True)  # reuse fitted models across calls
+	FORECAST_REFIT_EVERY: int = Field(default=26)  # observations appended before a full refit
+	FORECAST_REFIT_MAX_AGE_DAYS: int = Field(default=30)
+	FORECAST_DRIFT_Z: float = Field(default=3.0)  # mean |standardized error| on new points
+	FORECAST_WORKERS: int = Field(default=0)  # multi-series process pool size; 0 = one per core
+	FORECAST_CHUNK_SERIES: int = Field(default=8)  # series per pool task
+	FORECAST_SERIES_TIMEOUT_SECONDS: float = Field(default=60.0)  # per series, pool workers only
+	FORECAST_MAX_SERIES: int = Field(default=20_000)
+	CHURN_LABEL_DAYS: int = Field(default=90)  # no purchase in this window = churned
+	CHURN_MODEL_ALGORITHM: str = Field(default="auto")  # xgboost, lightgbm, sklearn or auto
+	CHURN_SCORE_BATCH: int = Field(default=200_000)  # customers per predict_proba call
+	CHURN_REGISTRY_SIZE: int = Field(default=8)  # trained models kept loaded per worker
+	PREDICT_WORKERS: int = Field(default=2)  # forecast/churn requests computed at once
+	PREDICT_QUEUE_SIZE: int = Field(default=8)  # waiting beyond those; more get a 429
+	PREDICT_TIMEOUT_SECONDS: float = Field(default=120.0)  # per request, queueing included; 0 = none
 
 	# Database
 	DATABASE_URL: str = Field(default="sqlite:///./data/app.db")
+	DB_POOL_SIZE: int = Field(default=5)  # ignored for SQLite
+	DB_MAX_OVERFLOW: int = Field(default=10)
+	DB_POOL_RECYCLE_SECONDS: int = Field(default=1800)
+	DB_ECHO: bool = Field(default=False)
+	PERSIST_RESULTS: bool = Field(default=True)  # store extraction runs and corrections
+	EXPORT_FILES: bool = Field(default=True)  # also write CSV/JSON files to data/outputs
+	SEARCH_ENABLED: bool = Field(default=True)  # full-text index of stored runs (data/search)
 
 
 settings = Settings()
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import pathlib
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+
+from .config import settings
+from .logging import get_logger
+
+
+log = get_logger("db")
+
+
+class Base(DeclarativeBase):
+	pass
+
+
+_engine: Optional[Engine] = None
+_sessions: Optional[sessionmaker] = None
+_tables_ready = False
+_lock = threading.Lock()
+
+
+def _create_engine(url: str) -> Engine:
+	parsed = make_url(url)
+	if parsed.get_backend_name() != "sqlite":
+		return create_engine(
+			url,
+			pool_size=settings.DB_POOL_SIZE,
+			max_overflow=settings.DB_MAX_OVERFLOW,
+			pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+			pool_pre_ping=True,
+			echo=settings.DB_ECHO,
+		)
+	if parsed.database and parsed.database != ":memory:":
+		pathlib.Path(parsed.database).parent.mkdir(parents=True, exist_ok=True)
+	engine = create_engine(
+		url,
+		connect_args={"check_same_thread": False, "timeout": 30},
+		echo=settings.DB_ECHO,
+	)
+
+	@event.listens_for(engine, "connect")
+	def _sqlite_pragmas(conn, _record) -> None:
+		# WAL lets the API, job threads and the Streamlit demo read while one of them writes
+		cur = conn.cursor()
+		cur.execute("PRAGMA journal_mode=WAL")
+		cur.execute("PRAGMA synchronous=NORMAL")
+		cur.execute("PRAGMA foreign_keys=ON")
+		cur.close()
+
+	return engine
+
+
+def get_engine() -> Engine:
+	global _engine, _sessions
+	with _lock:
+		if _engine is None:
+			_engine = _create_engine(settings.DATABASE_URL)
+			_sessions = sessionmaker(bind=_engine, expire_on_commit=False)
+		return _engine
+
+
+def init_db() -> None:
+	# Creates the tables of every model imported so far; safe to call repeatedly
+	global _tables_ready
+	engine = get_engine()
+	with _lock:
+		if not _tables_ready:
+			Base.metadata.create_all(engine)
+			_tables_ready = True
+
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+	init_db()
+	assert _sessions is not None
+	session = _sessions()
+	try:
+		yield session
+		session.commit()
+	except BaseException:
+		session.rollback()
+		raise
+	finally:
+		session.close()
+
+
+def reset_engine() -> None:
+	# Drops the pooled engine so the next call reconnects (new DATABASE_URL, forked worker)
+	global _engine, _sessions, _tables_ready
+	with _lock:
+		if _engine is not None:
+			_engine.dispose()
+		_engine = None
+		_sessions = None
+		_tables_ready = False
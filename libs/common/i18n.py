@@ -1,6 +1,12 @@
 from __future__ import annotations
 
 import datetime as dt
+from functools import lru_cache
+from typing import Callable, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+from babel import Locale
 from babel.dates import format_date, format_datetime
 from babel.numbers import format_currency, format_decimal, parse_decimal
 
@@ -16,26 +22,36 @@ AR_DIGITS = {
 	"8": "٨",
 	"9": "٩",
 }
+_TO_AR = str.maketrans(AR_DIGITS)
+_FROM_AR = str.maketrans({v: k for k, v in AR_DIGITS.items()})
+
+
+@lru_cache(maxsize=64)
+def get_locale(locale: str) -> Locale:
+	# Babel parses the identifier and loads its CLDR data on every call given a string
+	return Locale.parse(locale)
+
+
+def localize_digits(text: str, locale: str = "en") -> str:
+	return text.translate(_TO_AR) if locale.startswith("ar") else text
 
 
 def to_locale_number(value: float | int | str, locale: str = "en") -> str:
 	if isinstance(value, (int, float)):
-		text = format_decimal(value, locale=locale)
+		text = format_decimal(value, locale=get_locale(locale))
 	else:
 		text = value
-	if locale.startswith("ar"):
-		return "".join(AR_DIGITS.get(ch, ch) for ch in str(text))
-	return str(text)
+	return localize_digits(str(text), locale)
 
 
 def to_locale_date(value: dt.date | dt.datetime, locale: str = "en") -> str:
 	if isinstance(value, dt.datetime):
-		return format_datetime(value, locale=locale)
-	return format_date(value, locale=locale)
+		return format_datetime(value, locale=get_locale(locale))
+	return format_date(value, locale=get_locale(locale))
 
 
 def format_money(amount: float, currency_code: str = "USD", locale: str = "en") -> str:
-	return format_currency(amount, currency_code, locale=locale)
+	return format_currency(amount, currency_code, locale=get_locale(locale))
 
 
 def is_rtl(locale: str) -> bool:
@@ -43,7 +59,72 @@ def is_rtl(locale: str) -> bool:
 
 
 def parse_arabic_numerals(text: str) -> str:
-	rev = {v: k for k, v in AR_DIGITS.items()}
-	return "".join(rev.get(ch, ch) for ch in text)
+	return text.translate(_FROM_AR)
+
+
+# Bulk formatters: columns in dashboards and exports repeat values heavily (amounts,
+# dates, categories), so each distinct value is formatted once and mapped back.
+# Missing values stay missing (None) rather than becoming "nan".
+
+
+def _format_unique(values: pd.Series, fmt: Callable[[Hashable], str]) -> pd.Series:
+	codes, uniques = pd.factorize(values, use_na_sentinel=True)
+	formatted = np.array([fmt(u) for u in uniques] + [None], dtype=object)
+	# code -1 (missing) indexes the trailing None
+	return pd.Series(formatted[codes], index=values.index, name=values.name, dtype=object)
+
+
+def format_numbers(
+	values: pd.Series, locale: str = "en", format: Optional[str] = None
+) -> pd.Series:
+	loc = get_locale(locale)
+	ar = locale.startswith("ar")
+
+	def fmt(v: Hashable) -> str:
+		text = format_decimal(v, format=format, locale=loc)
+		return text.translate(_TO_AR) if ar else text
+
+	return _format_unique(values, fmt)
+
+
+def format_dates(values: pd.Series, locale: str = "en", format: str = "medium") -> pd.Series:
+	# Same rules as to_locale_date: datetimes keep their time, plain dates do not
+	loc = get_locale(locale)
+
+	def fmt(v: Hashable) -> str:
+		if isinstance(v, dt.datetime):
+			return format_datetime(v, format=format, locale=loc)
+		return format_date(v, format=format, locale=loc)
+
+	return _format_unique(values, fmt)
+
+
+def format_money_series(
+	amounts: pd.Series, currency_code: str | pd.Series = "USD", locale: str = "en"
+) -> pd.Series:
+	loc = get_locale(locale)
+	if isinstance(currency_code, str):
+		return _format_unique(amounts, lambda v: format_currency(v, currency_code, locale=loc))
+	# per-row currencies: factorize (amount, currency) pairs
+	pairs = pd.Series(list(zip(amounts, currency_code)), index=amounts.index, name=amounts.name)
+	pairs[amounts.isna() | currency_code.isna()] = None
+	return _format_unique(pairs, lambda p: format_currency(p[0], p[1], locale=loc))
 
 
+def localize_frame(
+	df: pd.DataFrame, locale: str = "en", money: Optional[Dict[str, str]] = None
+) -> pd.DataFrame:
+	# Formats numeric and datetime columns for display; `money` maps column -> currency code
+	money = money or {}
+	out = df.copy()
+	for col in df.columns:
+		s = df[col]
+		if col in money:
+			out[col] = format_money_series(s, money[col], locale)
+		elif pd.api.types.is_bool_dtype(s):
+			continue
+		elif pd.api.types.is_numeric_dtype(s):
+			out[col] = format_numbers(s, locale)
+		elif pd.api.types.is_datetime64_any_dtype(s):
+			out[col] = format_dates(s, locale)
+	return out
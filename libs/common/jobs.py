@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from .logging import get_logger
+
+
+log = get_logger("jobs")
+
+
+class QueueFullError(RuntimeError):
+	pass
+
+
+class DeadlineExceeded(TimeoutError):
+	pass
+
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+	"deadline", default=None
+)
+
+
+def remaining() -> Optional[float]:
+	# Seconds left before the current task's deadline, None when it has none
+	deadline = _deadline.get()
+	return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline() -> None:
+	# Running threads cannot be stopped from outside; long tasks call this between steps
+	left = remaining()
+	if left is not None and left <= 0:
+		raise DeadlineExceeded("deadline exceeded")
+
+
+def _with_deadline(deadline: Optional[float], fn: Callable[..., Any], *args: Any) -> Any:
+	_deadline.set(deadline)
+	check_deadline()
+	return fn(*args)
+
+
+class BoundedExecutor:
+	# Thread pool that refuses work instead of queueing without limit: at most
+	# max_workers tasks run and max_queue more wait; anything beyond raises QueueFullError.
+	def __init__(self, name: str, max_workers: int, max_queue: int):
+		self.name = name
+		self.max_workers = max(1, max_workers)
+		self.max_queue = max(0, max_queue)
+		self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+		self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+		self._lock = threading.Lock()
+		self._pending = 0
+		self._running = 0
+		self._rejected = 0
+		self._completed = 0
+		self._expired = 0
+		self._avg_seconds = 0.0  # moving average of run time, for retry_after()
+
+	def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+		if not self._slots.acquire(blocking=False):
+			with self._lock:
+				self._rejected += 1
+			raise QueueFullError(f"{self.name} queue is full")
+		ctx = contextvars.copy_context()
+
+		def run() -> Any:
+			with self._lock:
+				self._running += 1
+			start = time.monotonic()
+			try:
+				return ctx.run(fn, *args, **kwargs)
+			finally:
+				elapsed = time.monotonic() - start
+				with self._lock:
+					self._running -= 1
+					self._avg_seconds = (
+						elapsed if not self._avg_seconds else 0.8 * self._avg_seconds + 0.2 * elapsed
+					)
+
+		def done(_: Future) -> None:
+			with self._lock:
+				self._pending -= 1
+				self._completed += 1
+			self._slots.release()
+
+		with self._lock:
+			self._pending += 1
+		try:
+			fut = self._executor.submit(run)
+		except BaseException:
+			with self._lock:
+				self._pending -= 1
+			self._slots.release()
+			raise
+		fut.add_done_callback(done)
+		return fut
+
+	async def run(self, timeout: Optional[float], fn: Callable[..., Any], *args: Any) -> Any:
+		# Awaits fn(*args) on the pool with a deadline (None = no limit). On expiry or when
+		# the caller is cancelled a queued task is dropped; a running one is told through
+		# check_deadline() and keeps its slot until it returns, so expired work still counts
+		# against the queue.
+		deadline = time.monotonic() + timeout if timeout else None
+		fut = self.submit(_with_deadline, deadline, fn, *args)
+		try:
+			return await asyncio.wait_for(asyncio.wrap_future(fut), timeout or None)
+		except TimeoutError as e:  # asyncio's timeout or DeadlineExceeded from the task
+			with self._lock:
+				self._expired += 1
+			raise DeadlineExceeded(f"{self.name} deadline of {timeout}s exceeded") from e
+		finally:
+			if not fut.done():
+				fut.cancel()
+
+	def retry_after(self) -> int:
+		# Seconds until a slot is likely free, from the average run time and the backlog
+		with self._lock:
+			waiting = self._pending - self._running + 1
+			estimate = self._avg_seconds * waiting / self.max_workers
+		return max(1, math.ceil(estimate))
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			return {
+				"workers": self.max_workers,
+				"capacity": self.max_workers + self.max_queue,
+				"running": self._running,
+				"queued": self._pending - self._running,
+				"rejected": self._rejected,
+				"expired": self._expired,
+				"completed": self._completed,
+				"avg_seconds": round(self._avg_seconds, 3),
+			}
+
+	def shutdown(self, wait: bool = False) -> None:
+		self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class Job:
+	def __init__(self, job_id: str):
+		self.id = job_id
+		self.status = "queued"
+		self.result: Any = None
+		self.error: Optional[str] = None
+		self.created_at = datetime.utcnow()
+		self.finished_at: Optional[datetime] = None
+		self.expires: Optional[float] = None
+
+	def as_dict(self) -> Dict[str, Any]:
+		return {
+			"job_id": self.id,
+			"status": self.status,
+			"created_at": self.created_at.isoformat(),
+			"finished_at": self.finished_at.isoformat() if self.finished_at else None,
+			"result": self.result,
+			"error": self.error,
+		}
+
+
+class JobStore:
+	# In-process job table on top of a BoundedExecutor; finished jobs are kept for
+	# ttl_seconds and then dropped.
+	def __init__(self, executor: BoundedExecutor, ttl_seconds: int):
+		self.executor = executor
+		self.ttl_seconds = ttl_seconds
+		self._jobs: Dict[str, Job] = {}
+		self._lock = threading.Lock()
+
+	def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Job:
+		self._purge()
+		job = Job(uuid.uuid4().hex)
+		with self._lock:
+			self._jobs[job.id] = job
+		try:
+			self.executor.submit(self._run, job, fn, *args, **kwargs)
+		except QueueFullError:
+			with self._lock:
+				self._jobs.pop(job.id, None)
+			raise
+		return job
+
+	def _run(self, job: Job, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+		job.status = "running"
+		try:
+			job.result = fn(*args, **kwargs)
+			job.status = "succeeded"
+		except Exception as e:  # noqa: BLE001
+			log.warning("job_failed", job_id=job.id, error=str(e))
+			job.error = str(e)
+			job.status = "failed"
+		finally:
+			job.finished_at = datetime.utcnow()
+			job.expires = time.monotonic() + self.ttl_seconds
+
+	def get(self, job_id: str) -> Optional[Job]:
+		self._purge()
+		with self._lock:
+			return self._jobs.get(job_id)
+
+	def _purge(self) -> None:
+		now = time.monotonic()
+		with self._lock:
+			expired = [k for k, j in self._jobs.items() if j.expires is not None and j.expires <= now]
+			for k in expired:
+				del self._jobs[k]
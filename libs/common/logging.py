@@ -11,6 +11,8 @@ import structlog
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from .metrics import HTTP_SECONDS, start_request
+
 
 request_id_ctx: ContextVar[str | None] = ContextVar("request_id", default=None)
 
@@ -56,14 +58,20 @@ class RequestIdMiddleware(BaseHTTPMiddleware):
 		start = time.perf_counter()
 		req_id = request.headers.get("x-request-id", str(uuid.uuid4()))
 		request_id_ctx.set(req_id)
+		stages = start_request()
 		response = await call_next(request)
-		duration_ms = (time.perf_counter() - start) * 1000.0
+		duration = time.perf_counter() - start
+		# route template, not the raw path, so ids in URLs do not become label values
+		route = getattr(request.scope.get("route"), "path", "unmatched")
+		HTTP_SECONDS.observe(duration, request.method, route, str(response.status_code))
+		extra = {"stages_ms": {k: round(v * 1000.0, 2) for k, v in stages.items()}} if stages else {}
 		self.logger.info(
 			"request",
 			method=request.method,
 			path=request.url.path,
 			status_code=response.status_code,
-			duration_ms=round(duration_ms, 2),
+			duration_ms=round(duration * 1000.0, 2),
+			**extra,
 		)
 		response.headers["x-request-id"] = req_id
 		return response
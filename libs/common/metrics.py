@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import functools
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from fastapi.responses import Response
+
+
+# In-process counters and histograms rendered in the Prometheus text format, without a
+# client library. Recording is a lock, a bisect over the buckets and two additions, so
+# spans can wrap every pipeline stage. Each process (uvicorn worker) has its own values;
+# work done in pool processes is recorded by the parent from the timings they return.
+
+T = TypeVar("T")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# seconds; from cheap stages (field extraction) up to long OCR runs and model fits
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Stage durations of the current request, for its log line; see RequestIdMiddleware
+_request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+	"request_stages", default=None
+)
+
+
+def _escape(value: str) -> str:
+	return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+	parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+	if extra:
+		parts.append(extra)
+	return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+	if math.isinf(value):
+		return "+Inf"
+	return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+	kind = "counter"
+
+	def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+		self.name = name
+		self.help = help
+		self.labelnames = tuple(labelnames)
+		self._values: Dict[Tuple[str, ...], float] = {}
+		self._lock = threading.Lock()
+
+	def inc(self, *labels: str, amount: float = 1.0) -> None:
+		with self._lock:
+			self._values[labels] = self._values.get(labels, 0.0) + amount
+
+	def value(self, *labels: str) -> float:
+		with self._lock:
+			return self._values.get(labels, 0.0)
+
+	def samples(self) -> List[str]:
+		with self._lock:
+			items = sorted(self._values.items())
+		return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram:
+	kind = "histogram"
+
+	def __init__(
+		self,
+		name: str,
+		help: str,
+		labelnames: Sequence[str] = (),
+		buckets: Sequence[float] = DEFAULT_BUCKETS,
+	):
+		self.name = name
+		self.help = help
+		self.labelnames = tuple(labelnames)
+		self.buckets = tuple(sorted(buckets))
+		# labels -> [count per bucket (+Inf last, not cumulative), sum]
+		self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+		self._lock = threading.Lock()
+
+	def observe(self, value: float, *labels: str) -> None:
+		i = bisect_left(self.buckets, value)
+		with self._lock:
+			series = self._series.get(labels)
+			if series is None:
+				series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+			series[0][i] += 1
+			series[1][0] += value
+
+	def snapshot(self, *labels: str) -> Tuple[int, float]:
+		# (count, sum) for one label set
+		with self._lock:
+			series = self._series.get(labels)
+			return (sum(series[0]), series[1][0]) if series else (0, 0.0)
+
+	def samples(self) -> List[str]:
+		with self._lock:
+			items = sorted((k, list(c), s[0]) for k, (c, s) in self._series.items())
+		lines = []
+		for labels, counts, total in items:
+			running = 0
+			for bound, count in zip((*self.buckets, math.inf), counts):
+				running += count
+				le = _labels(self.labelnames, labels, f'le="{_number(bound)}"')
+				lines.append(f"{self.name}_bucket{le} {running}")
+			lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+			lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {running}")
+		return lines
+
+
+class Registry:
+	def __init__(self):
+		self._metrics: Dict[str, Any] = {}
+		self._lock = threading.Lock()
+
+	def _get(self, cls: type, name: str, *args: Any) -> Any:
+		with self._lock:
+			metric = self._metrics.get(name)
+			if metric is None:
+				metric = self._metrics[name] = cls(name, *args)
+			elif not isinstance(metric, cls):
+				raise ValueError(f"metric {name!r} is already a {metric.kind}")
+			return metric
+
+	def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+		return self._get(Counter, name, help, labelnames)
+
+	def histogram(
+		self,
+		name: str,
+		help: str,
+		labelnames: Sequence[str] = (),
+		buckets: Sequence[float] = DEFAULT_BUCKETS,
+	) -> Histogram:
+		return self._get(Histogram, name, help, labelnames, buckets)
+
+	def render(self) -> str:
+		with self._lock:
+			metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+		lines = []
+		for metric in metrics:
+			lines.append(f"# HELP {metric.name} {metric.help}")
+			lines.append(f"# TYPE {metric.name} {metric.kind}")
+			lines.extend(metric.samples())
+		return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+STAGE_SECONDS = registry.histogram(
+	"insight_stage_seconds", "Time spent in one pipeline stage", ("stage",)
+)
+HTTP_SECONDS = registry.histogram(
+	"insight_http_request_seconds", "HTTP request duration", ("method", "route", "status")
+)
+
+
+def record(stage: str, seconds: float) -> None:
+	STAGE_SECONDS.observe(seconds, stage)
+	stages = _request_stages.get()
+	if stages is not None:
+		stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+	# Times the block into insight_stage_seconds{stage=...}, also when it raises
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		record(stage, time.perf_counter() - start)
+
+
+def timed(stage: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+	def decorate(fn: Callable[..., T]) -> Callable[..., T]:
+		@functools.wraps(fn)
+		def wrapper(*args: Any, **kwargs: Any) -> T:
+			with span(stage):
+				return fn(*args, **kwargs)
+
+		return wrapper
+
+	return decorate
+
+
+def start_request() -> Dict[str, float]:
+	# Collects the spans of the current request (and of work it offloads with its
+	# context copied) into the returned dict
+	stages: Dict[str, float] = {}
+	_request_stages.set(stages)
+	return stages
+
+
+def metrics_response() -> Response:
+	return Response(registry.render(), media_type=CONTENT_TYPE)
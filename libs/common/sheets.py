@@ -1,65 +1,389 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
 
 import gspread
 from google.oauth2.service_account import Credentials
+from gspread.utils import a1_to_rowcol, rowcol_to_a1
 
 from .config import settings
+from .logging import get_logger
+from .metrics import span
+
+
+log = get_logger("sheets")
+T = TypeVar("T")
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+# rejected before anything was written, so safe to retry even for appends
+QUOTA_STATUS = {429}
+
+_client: Optional[gspread.Client] = None
+_client_key: Optional[str] = None
+_client_lock = threading.Lock()
 
 
 def _get_client() -> Optional[gspread.Client]:
+	# Authorized once per credentials value; gspread refreshes the token itself
+	global _client, _client_key
+	if _client_key == "injected":
+		return _client
 	creds_json = settings.GOOGLE_SHEETS_CREDS_JSON
 	if not creds_json:
 		return None
-	scopes = [
-		"https://www.googleapis.com/auth/spreadsheets",
-		"https://www.googleapis.com/auth/drive.file",
-	]
-	creds = Credentials.from_service_account_info(
-		_ensure_json(creds_json), scopes=scopes
-	)
-	return gspread.authorize(creds)
+	key = hashlib.sha256(str(creds_json).encode("utf-8")).hexdigest()
+	with _client_lock:
+		if _client is None or _client_key != key:
+			scopes = [
+				"https://www.googleapis.com/auth/spreadsheets",
+				"https://www.googleapis.com/auth/drive.file",
+			]
+			creds = Credentials.from_service_account_info(_ensure_json(creds_json), scopes=scopes)
+			_client = gspread.authorize(creds)
+			_client_key = key
+			_worksheets.clear()
+		return _client
+
+
+def set_client(client: Any) -> None:
+	# Use a prebuilt client (e.g. FakeSheetsClient) instead of the credentials in settings
+	global _client, _client_key
+	with _client_lock:
+		_client = client
+		_client_key = "injected" if client is not None else None
+		_worksheets.clear()
 
 
 def _ensure_json(text_or_json: Any) -> Dict[str, Any]:
 	if isinstance(text_or_json, dict):
 		return text_or_json
-	import json
-
 	return json.loads(text_or_json)
 
 
-def append_row(sheet_id: str, worksheet: str, row: List[Any]) -> bool:
+def _with_retry(fn: Callable[..., T], *args: Any, idempotent: bool = True, **kwargs: Any) -> T:
+	# Exponential backoff with full jitter on quota (429) and transient server errors.
+	# A timeout or 5xx may come after the write was applied, so calls that are not
+	# idempotent (appends) are only retried on quota errors.
+	retry_status = RETRY_STATUS if idempotent else QUOTA_STATUS
+	attempt = 0
+	while True:
+		try:
+			return fn(*args, **kwargs)
+		except gspread.exceptions.APIError as e:
+			if e.code not in retry_status or attempt >= settings.SHEETS_MAX_RETRIES:
+				raise
+		except (ConnectionError, TimeoutError):
+			if not idempotent or attempt >= settings.SHEETS_MAX_RETRIES:
+				raise
+		delay = min(
+			settings.SHEETS_BACKOFF_MAX_SECONDS, settings.SHEETS_BACKOFF_SECONDS * 2**attempt
+		)
+		attempt += 1
+		log.info("sheets_retry", attempt=attempt, delay=round(delay, 2))
+		time.sleep(random.uniform(0, delay))
+
+
+class _SheetState:
+	# Worksheet handle plus cached header row. Entries expire after SHEETS_CACHE_TTL_SECONDS
+	# so edits made directly in the sheet are picked up eventually. Key rows are not cached:
+	# other workers append to the same sheet, so upserts read the key column every time.
+	def __init__(self, ws: Any):
+		self.ws = ws
+		self.lock = threading.Lock()
+		self.loaded = time.monotonic()
+		self.headers: Optional[List[str]] = None
+
+	def fresh(self) -> bool:
+		return time.monotonic() - self.loaded < settings.SHEETS_CACHE_TTL_SECONDS
+
+	def get_headers(self) -> List[str]:
+		if self.headers is None:
+			self.headers = _with_retry(self.ws.row_values, 1)
+		return self.headers
+
+	def key_row(self, col_idx: int, key_val: str) -> Optional[int]:
+		# first occurrence wins, like Worksheet.find; one column is a lighter read than find
+		values = _with_retry(self.ws.col_values, col_idx)
+		for row, v in enumerate(values[1:], start=2):
+			if str(v) == key_val:
+				return row
+		return None
+
+
+_worksheets: "OrderedDict[Tuple[str, str], _SheetState]" = OrderedDict()
+_worksheets_lock = threading.Lock()
+
+
+def _sheet(client: Any, sheet_id: str, worksheet: str) -> _SheetState:
+	key = (sheet_id, worksheet)
+	with _worksheets_lock:
+		state = _worksheets.get(key)
+		if state is not None and state.fresh():
+			_worksheets.move_to_end(key)
+			return state
+	ws = _with_retry(lambda: client.open_by_key(sheet_id).worksheet(worksheet))
+	state = _SheetState(ws)
+	with _worksheets_lock:
+		_worksheets[key] = state
+		while len(_worksheets) > 64:
+			_worksheets.popitem(last=False)
+	return state
+
+
+def invalidate(sheet_id: str, worksheet: str) -> None:
+	with _worksheets_lock:
+		_worksheets.pop((sheet_id, worksheet), None)
+
+
+def append_rows(sheet_id: str, worksheet: str, rows: List[List[Any]]) -> bool:
 	client = _get_client()
 	if not client:
 		return False
-	sh = client.open_by_key(sheet_id)
-	ws = sh.worksheet(worksheet)
-	ws.append_row(row)
+	state = _sheet(client, sheet_id, worksheet)
+	with state.lock:
+		_with_retry(state.ws.append_rows, rows, table_range="A1", idempotent=False)
 	return True
 
 
+def append_row(sheet_id: str, worksheet: str, row: List[Any]) -> bool:
+	return append_rows(sheet_id, worksheet, [row])
+
+
 def upsert_by_key(sheet_id: str, worksheet: str, key_col: str, key_val: str, data: Dict[str, Any]) -> bool:
+	# Existing row: one batched values update covering any new headers and every changed
+	# cell. New row: one append (plus a header update if columns were added).
 	client = _get_client()
 	if not client:
 		return False
-	sh = client.open_by_key(sheet_id)
-	ws = sh.worksheet(worksheet)
-	headers = ws.row_values(1)
+	state = _sheet(client, sheet_id, worksheet)
+	try:
+		with state.lock:
+			_upsert(state, key_col, str(key_val), data)
+	except Exception:
+		invalidate(sheet_id, worksheet)
+		raise
+	return True
+
+
+def _upsert(state: _SheetState, key_col: str, key_val: str, data: Dict[str, Any]) -> None:
+	headers = list(state.get_headers())
 	key_idx = headers.index(key_col) + 1
-	cell = ws.find(key_val, in_column=key_idx)
-	if cell:
-		row_idx = cell.row
-	else:
-		row_idx = ws.row_count + 1
-		ws.add_rows(1)
-	for col_name, value in data.items():
+	updates: List[Dict[str, Any]] = []
+	for col_name in data:
 		if col_name not in headers:
 			headers.append(col_name)
-			ws.update_cell(1, len(headers), col_name)
-		col_idx = headers.index(col_name) + 1
-		ws.update_cell(row_idx, col_idx, value)
-	return True
+			cell = rowcol_to_a1(1, len(headers))
+			updates.append({"range": cell, "values": [[col_name]]})
+	row_idx = state.key_row(key_idx, key_val)
+
+	if row_idx is None:
+		values: List[Any] = [""] * len(headers)
+		values[key_idx - 1] = key_val
+		for col_name, value in data.items():
+			values[headers.index(col_name)] = value
+		if updates:
+			_with_retry(state.ws.batch_update, updates)
+		_with_retry(state.ws.append_rows, [values], table_range="A1", idempotent=False)
+		state.headers = headers
+		return
+
+	for col_name, value in data.items():
+		cell = rowcol_to_a1(row_idx, headers.index(col_name) + 1)
+		updates.append({"range": cell, "values": [[value]]})
+	if updates:
+		_with_retry(state.ws.batch_update, updates)
+	state.headers = headers
+
+
+class SheetsWriter:
+	# Coalesces appends from many requests: rows are queued and a background thread writes
+	# them every SHEETS_FLUSH_SECONDS (or once SHEETS_BATCH_ROWS are pending) with a single
+	# append_rows call per worksheet.
+	def __init__(
+		self,
+		flush_seconds: float,
+		batch_rows: int,
+		max_queue: int,
+		append: Callable[[str, str, List[List[Any]]], bool] = append_rows,
+	):
+		self.flush_seconds = flush_seconds
+		self.batch_rows = max(1, batch_rows)
+		self._append = append
+		self._queue: "queue.Queue[Tuple[str, str, List[Any]]]" = queue.Queue(maxsize=max_queue)
+		self._wake = threading.Event()
+		self._stop = threading.Event()
+		self._idle = threading.Condition()
+		self._inflight = 0
+		self._lock = threading.Lock()
+		self.written = 0
+		self.failed = 0
+		self.dropped = 0
+		self.flushes = 0
+		self._thread = threading.Thread(target=self._loop, name="sheets-writer", daemon=True)
+		self._thread.start()
+
+	def enqueue(self, sheet_id: str, worksheet: str, row: List[Any]) -> bool:
+		with self._idle:
+			self._inflight += 1
+		try:
+			self._queue.put_nowait((sheet_id, worksheet, row))
+		except queue.Full:
+			with self._idle:
+				self._inflight -= 1
+			with self._lock:
+				self.dropped += 1
+			log.warning("sheets_queue_full", sheet_id=sheet_id)
+			return False
+		if self._queue.qsize() >= self.batch_rows:
+			self._wake.set()
+		return True
+
+	def _drain(self) -> Dict[Tuple[str, str], List[List[Any]]]:
+		groups: Dict[Tuple[str, str], List[List[Any]]] = {}
+		while True:
+			try:
+				sheet_id, worksheet, row = self._queue.get_nowait()
+			except queue.Empty:
+				return groups
+			groups.setdefault((sheet_id, worksheet), []).append(row)
+
+	def _flush(self) -> None:
+		groups = self._drain()
+		for (sheet_id, worksheet), rows in groups.items():
+			try:
+				for start in range(0, len(rows), self.batch_rows):
+					with span("sheets.push"):
+						self._append(sheet_id, worksheet, rows[start : start + self.batch_rows])
+				with self._lock:
+					self.written += len(rows)
+					self.flushes += 1
+			except Exception as e:  # noqa: BLE001
+				with self._lock:
+					self.failed += len(rows)
+				log.warning("sheets_flush_failed", sheet_id=sheet_id, rows=len(rows), error=str(e))
+			finally:
+				with self._idle:
+					self._inflight -= len(rows)
+					self._idle.notify_all()
+
+	def _loop(self) -> None:
+		while not self._stop.is_set():
+			self._wake.wait(self.flush_seconds)
+			self._wake.clear()
+			self._flush()
+		self._flush()
+
+	def flush(self, timeout: Optional[float] = None) -> bool:
+		# Blocks until everything enqueued so far has been written (or has failed)
+		self._wake.set()
+		with self._idle:
+			return self._idle.wait_for(lambda: self._inflight == 0, timeout)
+
+	def stats(self) -> Dict[str, int]:
+		with self._lock:
+			return {
+				"queued": self._queue.qsize(),
+				"written": self.written,
+				"failed": self.failed,
+				"dropped": self.dropped,
+				"flushes": self.flushes,
+			}
+
+	def close(self, timeout: float = 10.0) -> None:
+		self._stop.set()
+		self._wake.set()
+		self._thread.join(timeout)
+
+
+_writer: Optional[SheetsWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> SheetsWriter:
+	global _writer
+	with _writer_lock:
+		if _writer is None:
+			_writer = SheetsWriter(
+				settings.SHEETS_FLUSH_SECONDS, settings.SHEETS_BATCH_ROWS, settings.SHEETS_QUEUE_SIZE
+			)
+		return _writer
+
+
+def enqueue_append(sheet_id: str, worksheet: str, row: List[Any]) -> bool:
+	# Non-blocking: returns False when Sheets is not configured or the queue is full
+	if _get_client() is None:
+		return False
+	return get_writer().enqueue(sheet_id, worksheet, row)
+
+
+def shutdown_writer() -> None:
+	global _writer
+	with _writer_lock:
+		writer, _writer = _writer, None
+	if writer is not None:
+		writer.close()
+
+
+class FakeWorksheet:
+	# In-memory stand-in for gspread.Worksheet covering the calls made above
+	def __init__(self, title: str, rows: Optional[List[List[Any]]] = None):
+		self.title = title
+		self.rows: List[List[Any]] = [list(r) for r in rows or []]
+		self.calls: List[str] = []
+
+	def _cell(self, row: int, col: int, value: Any) -> None:
+		while len(self.rows) < row:
+			self.rows.append([])
+		line = self.rows[row - 1]
+		while len(line) < col:
+			line.append("")
+		line[col - 1] = value
+
+	def row_values(self, row: int) -> List[Any]:
+		self.calls.append("row_values")
+		return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+	def col_values(self, col: int) -> List[Any]:
+		self.calls.append("col_values")
+		return [r[col - 1] if len(r) >= col else "" for r in self.rows]
+
+	def append_rows(self, values: List[List[Any]], **kwargs: Any) -> Dict[str, Any]:
+		self.calls.append("append_rows")
+		first = len(self.rows) + 1
+		self.rows.extend(list(v) for v in values)
+		last = len(self.rows)
+		return {"updates": {"updatedRange": f"{self.title}!A{first}:A{last}"}}
+
+	def batch_update(self, data: List[Dict[str, Any]], **kwargs: Any) -> Dict[str, Any]:
+		self.calls.append("batch_update")
+		for item in data:
+			row, col = a1_to_rowcol(item["range"])
+			for dr, line in enumerate(item["values"]):
+				for dc, value in enumerate(line):
+					self._cell(row + dr, col + dc, value)
+		return {}
+
+
+class FakeSpreadsheet:
+	def __init__(self, worksheets: Dict[str, FakeWorksheet]):
+		self.worksheets = worksheets
+
+	def worksheet(self, title: str) -> FakeWorksheet:
+		return self.worksheets.setdefault(title, FakeWorksheet(title))
+
 
+class FakeSheetsClient:
+	# Pass to set_client() to exercise the writer without Google credentials
+	def __init__(self) -> None:
+		self.sheets: Dict[str, FakeSpreadsheet] = {}
+		self.opens = 0
 
+	def open_by_key(self, sheet_id: str) -> FakeSpreadsheet:
+		self.opens += 1
+		return self.sheets.setdefault(sheet_id, FakeSpreadsheet({}))
@@ -1,19 +1,28 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import os
 import pathlib
+import re
+import uuid
 from datetime import datetime
-from typing import Tuple
+from typing import Any, Optional, Tuple
 
+from pydantic import BaseModel
 from slugify import slugify
 
+from .config import settings
+
 BASE_DIR = pathlib.Path(__file__).resolve().parents[2] / "data"
 UPLOADS_DIR = BASE_DIR / "uploads"
 OUTPUTS_DIR = BASE_DIR / "outputs"
 METRICS_DIR = BASE_DIR / "metrics"
+CACHE_DIR = BASE_DIR / "cache"
+MODELS_DIR = BASE_DIR / "models"
 
 
-for d in (UPLOADS_DIR, OUTPUTS_DIR, METRICS_DIR):
+for d in (UPLOADS_DIR, OUTPUTS_DIR, METRICS_DIR, CACHE_DIR, MODELS_DIR):
 	d.mkdir(parents=True, exist_ok=True)
 
 
@@ -21,14 +30,141 @@ def safe_filename(name: str) -> str:
 	return slugify(name, lowercase=False, separator="-")
 
 
-def save_upload(content: bytes, original_name: str) -> pathlib.Path:
+def _upload_path(original_name: str) -> pathlib.Path:
+	# Keep the extension (pipelines dispatch on it) and add a random token so two uploads
+	# with the same name in the same second cannot overwrite each other
+	name = pathlib.PurePath(original_name or "upload")
+	suffix = name.suffix.lower() if re.fullmatch(r"\.[A-Za-z0-9]{1,8}", name.suffix) else ""
 	stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
-	filename = f"{stamp}-{safe_filename(original_name)}"
-	path = UPLOADS_DIR / filename
+	token = uuid.uuid4().hex[:8]
+	return UPLOADS_DIR / f"{stamp}-{token}-{safe_filename(name.stem) or 'upload'}{suffix}"
+
+
+def save_upload(content: bytes, original_name: str) -> pathlib.Path:
+	path = _upload_path(original_name)
 	path.write_bytes(content)
 	return path
 
 
+class UploadTooLarge(ValueError):
+	def __init__(self, limit: int):
+		super().__init__(f"upload exceeds {limit} bytes")
+		self.limit = limit
+
+
+class StoredUpload(BaseModel):
+	path: pathlib.Path
+	sha256: str
+	size: int
+	data: Optional[bytes] = None  # the raw bytes, kept only for uploads <= keep_in_memory
+
+
+async def save_upload_stream(
+	upload: Any,
+	original_name: str,
+	max_bytes: Optional[int] = None,
+	keep_in_memory: int = 0,
+) -> StoredUpload:
+	# Copies an async-readable upload (e.g. fastapi.UploadFile) to disk chunk by chunk,
+	# hashing as it goes and aborting as soon as max_bytes is exceeded
+	limit = settings.MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+	declared = getattr(upload, "size", None)
+	if declared is not None and declared > limit:
+		raise UploadTooLarge(limit)
+
+	path = _upload_path(original_name)
+	part = path.with_name(path.name + ".part")
+	digest = hashlib.sha256()
+	size = 0
+	buf: Optional[bytearray] = bytearray() if keep_in_memory > 0 else None
+
+	def consume(fh: Any, chunk: bytes) -> None:
+		digest.update(chunk)
+		fh.write(chunk)
+
+	try:
+		with part.open("wb") as fh:
+			while True:
+				chunk = await upload.read(settings.UPLOAD_CHUNK_BYTES)
+				if not chunk:
+					break
+				size += len(chunk)
+				if size > limit:
+					raise UploadTooLarge(limit)
+				if buf is not None:
+					buf += chunk
+					if len(buf) > keep_in_memory:
+						buf = None
+				await asyncio.to_thread(consume, fh, chunk)
+		os.replace(part, path)
+	except BaseException:
+		part.unlink(missing_ok=True)
+		raise
+	return StoredUpload(
+		path=path,
+		sha256=digest.hexdigest(),
+		size=size,
+		data=bytes(buf) if buf is not None else None,
+	)
+
+
+class RequestSizeLimitMiddleware:
+	# Rejects request bodies over max_bytes with 413 before the multipart parser spools
+	# them: up front from Content-Length, or mid-stream for chunked bodies
+	def __init__(self, app: Any, max_bytes: Optional[int] = None):
+		self.app = app
+		self.max_bytes = max_bytes
+
+	async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+		limit = self.max_bytes or settings.MAX_REQUEST_BYTES
+		headers = dict(scope.get("headers") or [])
+		length = headers.get(b"content-length")
+		if length is not None and length.isdigit() and int(length) > limit:
+			await _send_413(send, limit)
+			return
+
+		received = 0
+		rejected = False
+
+		async def limited_receive() -> Any:
+			nonlocal received, rejected
+			if rejected:
+				return {"type": "http.disconnect"}
+			message = await receive()
+			if message["type"] == "http.request":
+				received += len(message.get("body", b""))
+				if received > limit:
+					# Answer now and make the app see a disconnect; whatever it sends is dropped
+					rejected = True
+					await _send_413(send, limit)
+					return {"type": "http.disconnect"}
+			return message
+
+		async def guarded_send(message: Any) -> None:
+			if not rejected:
+				await send(message)
+
+		await self.app(scope, limited_receive, guarded_send)
+
+
+async def _send_413(send: Any, limit: int) -> None:
+	body = f'{{"detail":"request body exceeds {limit} bytes"}}'.encode()
+	await send(
+		{
+			"type": "http.response.start",
+			"status": 413,
+			"headers": [
+				(b"content-type", b"application/json"),
+				(b"content-length", str(len(body)).encode()),
+			],
+		}
+	)
+	await send({"type": "http.response.body", "body": body})
+
+
 def output_path(stem: str, ext: str) -> pathlib.Path:
 	return OUTPUTS_DIR / f"{safe_filename(stem)}.{ext}"
 
@@ -3,13 +3,20 @@ from __future__ import annotations
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.libs.common.db import init_db
 from ai_insight_suite.libs.common.logging import RequestIdMiddleware, configure_logging
+from ai_insight_suite.libs.common.metrics import metrics_response
+from ai_insight_suite.libs.common.sheets import shutdown_writer
+from ai_insight_suite.libs.common.storage import RequestSizeLimitMiddleware
+from .pipelines.ocr import shutdown_pool
 from .routers import api
 
 
 configure_logging()
 app = FastAPI(title="AI Insight Suite - Doc Automation", version="0.1.0")
 
+app.add_middleware(RequestSizeLimitMiddleware)
 app.add_middleware(RequestIdMiddleware)
 app.add_middleware(
 	CORSMiddleware,
@@ -19,11 +26,30 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+def _create_tables() -> None:
+	if settings.PERSIST_RESULTS:
+		init_db()
+
+
+@app.on_event("shutdown")
+def _shutdown_workers() -> None:
+	api.jobs.executor.shutdown()
+	shutdown_pool()
+	shutdown_writer()
+
+
 @app.get("/healthz")
 async def healthz():
 	return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+	# Prometheus text format; stage and request timings of this process
+	return metrics_response()
+
+
 app.include_router(api.router, prefix="/v1")
 
 
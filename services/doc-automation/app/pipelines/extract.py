@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+import bisect
+import hashlib
 import re
-from typing import Iterable, List, Optional
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
-from pydantic import BaseModel
-from rapidfuzz import fuzz
+import numpy as np
+import yaml
+from pydantic import BaseModel, ValidationError, field_validator
+from rapidfuzz import fuzz, process
 
 from ai_insight_suite.libs.common.i18n import parse_arabic_numerals
+from ai_insight_suite.libs.common.metrics import timed
 
 
 PHONE_RE = re.compile(r"\b\+?\d[\d\s\-]{7,}\b")
@@ -15,6 +22,8 @@ DATE_RE = re.compile(r"\b(\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4})\b")
 CURRENCY_RE = re.compile(r"\b(USD|EUR|SAR|AED|EGP|QAR|KWD|OMR|GBP)\b", re.I)
 AMOUNT_RE = re.compile(r"\b\d{1,3}(?:[\,\s]\d{3})*(?:\.\d{1,2})?\b")
 TOTAL_LABELS = ["total", "amount", "grand total", "vat", "tax", "الاجمالي", "المجموع", "المبلغ"]
+BACKREF_RE = re.compile(r"\\[1-9]|\(\?P=")
+SCHEMA_CACHE_SIZE = 256
 
 
 class Field(BaseModel):
@@ -24,44 +33,271 @@ class Field(BaseModel):
 	source_page: int | None = None
 
 
-def _score(label: str, text: str) -> float:
-	return fuzz.partial_ratio(label.lower(), text.lower()) / 100.0
+class SchemaField(BaseModel):
+	key: str
+	pattern: str  # the first capture group is the value, or the whole match if it has none
+	confidence: float = 0.7
+	ignore_case: bool = True
+	multiple: bool = False  # one field per match instead of only the first
 
+	@field_validator("pattern")
+	@classmethod
+	def _check_pattern(cls, v: str) -> str:
+		try:
+			compiled = re.compile(v)
+		except re.error as e:
+			raise ValueError(f"invalid regex: {e}") from e
+		if BACKREF_RE.search(v):
+			# group numbers shift once patterns are combined
+			raise ValueError("backreferences are not supported")
+		if compiled.groupindex:
+			raise ValueError("use unnamed groups; the first group is the value")
+		return v
+
+
+class ExtractionSchema(BaseModel):
+	# fields:
+	#   - {key: vat_number, pattern: "VAT\\s*(?:No\\.?)?[:\\s]*([A-Z0-9]{8,15})", confidence: 0.9}
+	#   - {key: iban, pattern: "\\b([A-Z]{2}\\d{2}[A-Z0-9]{11,30})\\b", ignore_case: false}
+	# or the short form `fields: {po_number: "PO[-\\s#]*(\\d+)"}`.
+	# Schema fields replace built-in fields with the same key; builtins: false drops the rest.
+	fields: List[SchemaField]
+	builtins: bool = True
+
+
+class CompiledSchema:
+	# All schema patterns joined into one alternation, so the text is scanned once however
+	# many fields there are. Alternatives compete at each position, so a match for one field
+	# can consume text that another field's own pattern would have matched there; from the
+	# first such match on, the affected fields are rescanned with their own pattern. The
+	# result is the same as scanning every field separately.
+	def __init__(self, schema: ExtractionSchema):
+		self.schema = schema
+		parts = []
+		for i, f in enumerate(schema.fields):
+			flags = "(?i:" if f.ignore_case else "(?:"
+			parts.append(f"(?P<f{i}>{flags}{f.pattern}))")
+		self.regex = re.compile("|".join(parts))
+		# outer group name -> (field index, index of the group holding the value)
+		self._slots: Dict[str, Tuple[int, int]] = {}
+		self._own: List[Tuple[re.Pattern, int]] = []
+		for i, f in enumerate(schema.fields):
+			own = re.compile(f.pattern, re.I if f.ignore_case else 0)
+			outer = self.regex.groupindex[f"f{i}"]
+			self._slots[f"f{i}"] = (i, outer + 1 if own.groups else outer)
+			self._own.append((own, 1 if own.groups else 0))
+
+	@property
+	def keys(self) -> set:
+		return {f.key for f in self.schema.fields}
+
+	def extract(self, text: str, page_breaks: Optional[List[int]] = None) -> List[Field]:
+		breaks = _page_breaks(text) if page_breaks is None else page_breaks
+		fields = self.schema.fields
+		# field index -> [(match start, value start, value)]
+		hits: List[List[Tuple[int, int, str]]] = [[] for _ in fields]
+		single = {i for i, f in enumerate(fields) if not f.multiple}
+		seen: set = set()
+		for m in self.regex.finditer(text):
+			if m.start() == m.end() or m.lastgroup is None:
+				continue
+			i, group = self._slots[m.lastgroup]
+			if i in seen and i in single:
+				continue
+			val = m.group(group)
+			used = group if val is not None else m.lastgroup
+			if val is None:
+				val = m.group(used)
+			hits[i].append((m.start(), m.start(used), val))
+			seen.add(i)
+			if len(single) == len(fields) and single <= seen:
+				break
+
+		found: List[Tuple[int, Field]] = []
+		for i, f in enumerate(fields):
+			# where another field first took text this one might have needed
+			taken = min((h[0][0] for j, h in enumerate(hits) if j != i and h), default=None)
+			own = [h for h in hits[i] if taken is None or h[0] < taken]
+			if taken is not None and (f.multiple or not own):
+				own.extend(self._rescan(i, text, taken, f.multiple))
+			for start, value_start, val in own[: None if f.multiple else 1]:
+				field = Field(
+					key=f.key,
+					val=val.strip(),
+					confidence=f.confidence,
+					source_page=_page_at(breaks, value_start),
+				)
+				found.append((start, field))
+		found.sort(key=lambda item: item[0])
+		return [field for _, field in found]
+
+	def _rescan(
+		self, i: int, text: str, pos: int, multiple: bool
+	) -> Iterator[Tuple[int, int, str]]:
+		regex, group = self._own[i]
+		for m in regex.finditer(text, pos):
+			if m.start() == m.end():
+				continue
+			used = group if m.group(group) is not None else 0
+			yield m.start(), m.start(used), m.group(used)
+			if not multiple:
+				return
+
+
+_schema_cache: "OrderedDict[str, CompiledSchema]" = OrderedDict()
+_schema_lock = threading.Lock()
+
+
+def compile_schema(schema_yaml: str) -> CompiledSchema:
+	# Parsed, validated and compiled once per distinct schema (keyed by its SHA-256)
+	digest = hashlib.sha256(schema_yaml.encode("utf-8")).hexdigest()
+	with _schema_lock:
+		compiled = _schema_cache.get(digest)
+		if compiled is not None:
+			_schema_cache.move_to_end(digest)
+			return compiled
+	try:
+		raw: Any = yaml.safe_load(schema_yaml)
+	except yaml.YAMLError as e:
+		raise ValueError(f"schema is not valid YAML: {e}") from e
+	if isinstance(raw, dict) and isinstance(raw.get("fields"), dict):
+		raw = {
+			**raw,
+			"fields": [
+				{"key": k, **(v if isinstance(v, dict) else {"pattern": v})}
+				for k, v in raw["fields"].items()
+			],
+		}
+	try:
+		schema = ExtractionSchema.model_validate(raw)
+		compiled = CompiledSchema(schema)
+	except (ValidationError, re.error) as e:
+		raise ValueError(f"invalid extraction schema: {e}") from e
+	with _schema_lock:
+		_schema_cache[digest] = compiled
+		while len(_schema_cache) > SCHEMA_CACHE_SIZE:
+			_schema_cache.popitem(last=False)
+	return compiled
+
+
+PAGE_BREAK = "\f"
+LINE_RE = re.compile(r"[^\n\f]+")
 
-def extract_fields(text: str, schema_yaml: Optional[str] = None, locale: str = "en") -> List[Field]:
-	plain = parse_arabic_numerals(text)
-	fields: List[Field] = []
 
-	phones = PHONE_RE.findall(plain)
-	if phones:
-		fields.append(Field(key="phone", val=phones[0], confidence=0.8))
+class Window(BaseModel):
+	text: str
+	start: int
+	end: int
+	page: int
 
-	emails = EMAIL_RE.findall(plain)
-	if emails:
-		fields.append(Field(key="email", val=emails[0], confidence=0.9))
 
-	dates = DATE_RE.findall(plain)
-	if dates:
-		fields.append(Field(key="date", val=dates[0], confidence=0.7))
+class LabelMatch(BaseModel):
+	label: str
+	score: float
+	window: int  # index into the windows list
 
-	currency = CURRENCY_RE.search(plain)
-	if currency:
-		fields.append(Field(key="currency", val=currency.group(1), confidence=0.75))
 
-	amounts = AMOUNT_RE.findall(plain)
+def _page_breaks(text: str) -> List[int]:
+	# ocr_document joins pages with form feeds
+	return [m.start() for m in re.finditer(PAGE_BREAK, text)]
+
+
+def _page_at(breaks: List[int], pos: int) -> int:
+	return bisect.bisect_right(breaks, pos) + 1
+
+
+def split_windows(text: str) -> List[Window]:
+	breaks = _page_breaks(text)
+	return [
+		Window(text=m.group(), start=m.start(), end=m.end(), page=_page_at(breaks, m.start()))
+		for m in LINE_RE.finditer(text)
+		if not m.group().isspace()
+	]
+
+
+def locate_labels(labels: Sequence[str], windows: Sequence[Window]) -> Dict[str, LabelMatch]:
+	# Every label against every line in one batched rapidfuzz call instead of one
+	# partial_ratio per label over the whole document. A line shorter than the label
+	# would partial-match inside it ("total" in "grand total"), so those use plain ratio.
+	if not labels or not windows:
+		return {}
+	queries = [lab.lower() for lab in labels]
+	choices = [w.text.lower() for w in windows]
+	workers = -1 if len(choices) > 2000 else 1
+	# rapidfuzz wants the scalar type here; its stubs declare an np.dtype instance
+	uint8: Any = np.uint8
+	partial = process.cdist(queries, choices, scorer=fuzz.partial_ratio, dtype=uint8, workers=workers)
+	full = process.cdist(queries, choices, scorer=fuzz.ratio, dtype=uint8, workers=workers)
+	lengths = np.array([len(c) for c in choices])
+	short = lengths[None, :] < np.array([len(q) for q in queries])[:, None]
+	scores = np.where(short, full, partial)
+	# Totals sit at the bottom of invoices: on ties take the last line, not the first
+	last = scores.shape[1] - 1 - np.argmax(scores[:, ::-1], axis=1)
+	return {
+		lab: LabelMatch(label=lab, score=float(scores[i, last[i]]) / 100.0, window=int(last[i]))
+		for i, lab in enumerate(labels)
+	}
+
+
+def _nearest_amount(
+	amounts: List[re.Match], windows: Sequence[Window], idx: int
+) -> Optional[re.Match]:
+	# Prefer the label's own line (rightmost amount), then the next two lines (column
+	# layouts put the value underneath), then whatever amount is closest in the text
+	line = windows[idx]
+	for w in windows[idx : idx + 3]:
+		if w is not line and w.page != line.page:
+			break
+		inline = [m for m in amounts if w.start <= m.start() < w.end]
+		if inline:
+			return inline[-1]
+	if not amounts:
+		return None
+	return min(amounts, key=lambda m: abs(m.start() - line.start))
+
+
+@timed("extract")
+def extract_fields(text: str, schema_yaml: Optional[str] = None, locale: str = "en") -> List[Field]:
+	plain = parse_arabic_numerals(text)
+	breaks = _page_breaks(plain)
+	schema = compile_schema(schema_yaml) if schema_yaml else None
+	if schema is not None and not schema.schema.builtins:
+		return schema.extract(plain, breaks)
+	fields: List[Field] = []
+
+	for key, regex, group, confidence in (
+		("phone", PHONE_RE, 0, 0.8),
+		("email", EMAIL_RE, 0, 0.9),
+		("date", DATE_RE, 1, 0.7),
+		("currency", CURRENCY_RE, 1, 0.75),
+	):
+		m = regex.search(plain)
+		if m:
+			page = _page_at(breaks, m.start())
+			fields.append(Field(key=key, val=m.group(group), confidence=confidence, source_page=page))
+
+	amounts = list(AMOUNT_RE.finditer(plain))
 	if amounts:
-		fields.append(Field(key="amount", val=amounts[-1], confidence=0.6))
-
-	# total via fuzzy label search
-	best = (None, 0.0)
-	for lab in TOTAL_LABELS:
-		s = _score(lab, plain)
-		if s > best[1]:
-			best = (lab, s)
-	if best[0] and amounts:
-		fields.append(Field(key="total", val=amounts[-1], confidence=min(1.0, 0.5 + best[1] / 2)))
-
-	# TODO: support custom schema via YAML (regex pairs)
-	return fields
+		last = amounts[-1]
+		page = _page_at(breaks, last.start())
+		fields.append(Field(key="amount", val=last.group(), confidence=0.6, source_page=page))
 
+	# total via fuzzy label search; TOTAL_LABELS order breaks ties between labels
+	windows = split_windows(plain)
+	matches = locate_labels(TOTAL_LABELS, windows)
+	best = max(matches.values(), key=lambda m: m.score, default=None)
+	if best is not None and best.score > 0 and amounts:
+		hit = _nearest_amount(amounts, windows, best.window)
+		if hit is not None:
+			fields.append(
+				Field(
+					key="total",
+					val=hit.group(),
+					confidence=min(1.0, 0.5 + best.score / 2),
+					source_page=_page_at(breaks, hit.start()),
+				)
+			)
 
+	if schema is not None:
+		fields = [f for f in fields if f.key not in schema.keys] + schema.extract(plain, breaks)
+	return fields
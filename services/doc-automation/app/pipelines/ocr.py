@@ -1,39 +1,512 @@
 from __future__ import annotations
 
+import hashlib
+import multiprocessing
+import os
 import pathlib
-from typing import Dict, Tuple
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Optional, Sequence, Tuple
 
 import cv2
 import numpy as np
 import pytesseract
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
+from pydantic import BaseModel, Field, field_validator
 
+from ai_insight_suite.libs.common.cache import ResultCache
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.libs.common.metrics import record, registry, timed
 
-def _preprocess(image):
-	gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-	blur = cv2.medianBlur(gray, 3)
-	thr = cv2.adaptiveThreshold(blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 2)
+
+LANG_RE = re.compile(r"^(auto|[a-z_]+(\+[a-z_]+)*)$")
+# Tesseract OSD script name -> language model used for the page
+SCRIPT_LANGS = {"Latin": "eng", "Arabic": "ara"}
+FALLBACK_LANG = "ara+eng"
+PAGE_SEP = "\f"
+CACHE_VERSION = "2"  # bump when the cached text format changes
+_ROTATIONS = {
+	90: cv2.ROTATE_90_CLOCKWISE,
+	180: cv2.ROTATE_180,
+	270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+
+class OcrConfig(BaseModel):
+	# Everything that changes the OCR output; also part of the result cache key
+	lang: str = Field(default_factory=lambda: settings.OCR_LANG)  # "auto" detects per page
+	oem: int = 3
+	psm: int = 6
+	blur_ksize: int = 3
+	block_size: int = 31
+	threshold_c: int = 2
+	dpi: int = Field(default_factory=lambda: settings.OCR_PDF_DPI)
+	grayscale: bool = Field(default_factory=lambda: settings.OCR_PDF_GRAYSCALE)
+	max_pages: int = Field(default_factory=lambda: settings.OCR_MAX_PAGES)
+	text_layer: bool = Field(default_factory=lambda: settings.OCR_USE_TEXT_LAYER)
+	engine: Literal["auto", "tesserocr", "pytesseract"] = Field(
+		default_factory=lambda: settings.OCR_ENGINE
+	)
+
+	@field_validator("lang")
+	@classmethod
+	def _check_lang(cls, v: str) -> str:
+		if not LANG_RE.match(v):
+			raise ValueError("lang must be 'auto' or tesseract codes joined by '+', e.g. 'ara+eng'")
+		return v
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_slots: threading.BoundedSemaphore | None = None
+_pool_lock = threading.Lock()
+_DONE = object()
+_cache: ResultCache | None = None
+_engines: Dict[str, "OcrEngine"] = {}
+_engine_lock = threading.Lock()
+_cache_lock = threading.Lock()
+PAGES = registry.counter("insight_ocr_pages_total", "Document pages read, by method", ("method",))
+
+
+def _to_gray(image):
+	return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def _preprocess(image, cfg: OcrConfig):
+	gray = _to_gray(image)
+	blur = cv2.medianBlur(gray, cfg.blur_ksize)
+	thr = cv2.adaptiveThreshold(
+		blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, cfg.block_size, cfg.threshold_c
+	)
 	return thr
 
 
-def _image_from_file(path: pathlib.Path) -> list:
-	ext = path.suffix.lower()
-	if ext in [".pdf"]:
-		pages = convert_from_path(str(path))
-		return [cv2.cvtColor(np.array(p), cv2.COLOR_RGB2BGR) for p in pages]
-	img = cv2.imdecode(np.fromfile(str(path), dtype=np.uint8), cv2.IMREAD_COLOR)
-	return [img]
+def _pdf_page_numbers(
+	path: pathlib.Path,
+	first_page: Optional[int] = None,
+	last_page: Optional[int] = None,
+	max_pages: Optional[int] = None,
+) -> List[int]:
+	max_pages = settings.OCR_MAX_PAGES if max_pages is None else max_pages
+	total = int(pdfinfo_from_path(str(path))["Pages"])
+	first = max(1, first_page or 1)
+	last = min(total, last_page or total)
+	if max_pages > 0:
+		last = min(last, first + max_pages - 1)
+	return list(range(first, last + 1))
+
+
+def _page_windows(numbers: Sequence[int], window: int) -> Iterator[Tuple[int, int]]:
+	# Consecutive page runs, split so poppler never renders more than `window` pages at once
+	if not numbers:
+		return
+	run_start = prev = numbers[0]
+	for n in numbers[1:]:
+		if n == prev + 1 and n - run_start < window:
+			prev = n
+			continue
+		yield run_start, prev
+		run_start = prev = n
+	yield run_start, prev
+
+
+def iter_pages(
+	path: pathlib.Path,
+	dpi: Optional[int] = None,
+	grayscale: Optional[bool] = None,
+	first_page: Optional[int] = None,
+	last_page: Optional[int] = None,
+	max_pages: Optional[int] = None,
+	page_numbers: Optional[Sequence[int]] = None,
+	data: Optional[bytes] = None,
+) -> Iterator[np.ndarray]:
+	# Yields one page at a time so peak memory stays flat regardless of page count;
+	# poppler renders at most OCR_PDF_WINDOW pages per call.
+	dpi = dpi or settings.OCR_PDF_DPI
+	grayscale = settings.OCR_PDF_GRAYSCALE if grayscale is None else grayscale
+	if path.suffix.lower() != ".pdf":
+		# Decode straight from the upload buffer when the caller still holds it
+		start = time.perf_counter()
+		if data is not None:
+			raw = np.frombuffer(data, dtype=np.uint8)
+		else:
+			raw = np.fromfile(str(path), dtype=np.uint8)
+		flags = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+		image = cv2.imdecode(raw, flags)
+		record("ocr.rasterize", time.perf_counter() - start)
+		yield image
+		return
+
+	if page_numbers is None:
+		page_numbers = _pdf_page_numbers(path, first_page, last_page, max_pages)
+	for first, last in _page_windows(page_numbers, max(1, settings.OCR_PDF_WINDOW)):
+		start = time.perf_counter()
+		rendered = convert_from_path(
+			str(path),
+			dpi=dpi,
+			first_page=first,
+			last_page=last,
+			grayscale=grayscale,
+		)
+		record("ocr.rasterize", time.perf_counter() - start)
+		while rendered:
+			img = rendered.pop(0)
+			arr = np.asarray(img)
+			img.close()
+			yield arr if grayscale else cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
+
+
+def _pdf_text_layer(path: pathlib.Path, first: int, last: int) -> List[str]:
+	# Embedded text via poppler's pdftotext; pages come back separated by form feeds.
+	# Any failure just means every page goes through OCR.
+	try:
+		proc = subprocess.run(
+			["pdftotext", "-f", str(first), "-l", str(last), "-layout", "-enc", "UTF-8", str(path), "-"],
+			capture_output=True,
+			timeout=60,
+			check=True,
+		)
+	except (OSError, subprocess.SubprocessError):
+		return []
+	pages = proc.stdout.decode("utf-8", errors="replace").split("\f")
+	return pages[: last - first + 1]
+
+
+def _usable_text(text: str) -> bool:
+	# Scanned PDFs often carry an empty or garbage layer (broken font maps decode to
+	# U+FFFD or private-use glyphs), so demand real characters before trusting it.
+	alnum = sum(1 for ch in text if ch.isalnum())
+	if alnum < settings.OCR_TEXT_LAYER_MIN_CHARS:
+		return False
+	bad = sum(1 for ch in text if ch == "\ufffd" or "\ue000" <= ch <= "\uf8ff")
+	return bad <= alnum * 0.05
+
+
+class OcrEngine:
+	name = "base"
+
+	def image_to_string(self, image: np.ndarray, lang: str, oem: int, psm: int) -> str:
+		raise NotImplementedError
+
+	def detect_osd(self, image: np.ndarray) -> Optional[Dict[str, Any]]:
+		# {"script", "script_conf", "rotate", "orientation_conf"}, or None if undecidable
+		raise NotImplementedError
+
+
+class PytesseractEngine(OcrEngine):
+	# One tesseract subprocess (and one temp file round trip) per call
+	name = "pytesseract"
+
+	def image_to_string(self, image: np.ndarray, lang: str, oem: int, psm: int) -> str:
+		return str(pytesseract.image_to_string(image, config=f"-l {lang} --oem {oem} --psm {psm}"))
+
+	def detect_osd(self, image: np.ndarray) -> Optional[Dict[str, Any]]:
+		try:
+			osd = pytesseract.image_to_osd(image, config="--psm 0", output_type=pytesseract.Output.DICT)
+		except pytesseract.TesseractError:
+			return None
+		return {
+			"script": osd.get("script"),
+			"script_conf": float(osd.get("script_conf", 0.0)),
+			"rotate": int(osd.get("rotate", 0)),
+			"orientation_conf": float(osd.get("orientation_conf", 0.0)),
+		}
+
+
+class TesserocrEngine(OcrEngine):
+	# libtesseract in-process: each TessBaseAPI loads its traineddata once and is reused.
+	# APIs are not thread-safe, so they are checked out per call from an idle list per
+	# (lang, oem); the list only grows to the number of pages OCR'd concurrently.
+	name = "tesserocr"
+
+	def __init__(self):
+		import tesserocr
+
+		self._tesserocr = tesserocr
+		self._idle: Dict[Tuple[str, int], List[Any]] = {}
+		self._lock = threading.Lock()
+
+	def _checkout(self, lang: str, oem: int) -> Any:
+		with self._lock:
+			idle = self._idle.setdefault((lang, oem), [])
+			if idle:
+				return idle.pop()
+		return self._tesserocr.PyTessBaseAPI(lang=lang, oem=self._tesserocr.OEM(oem))
+
+	def _release(self, lang: str, oem: int, api: Any) -> None:
+		api.Clear()
+		with self._lock:
+			self._idle[(lang, oem)].append(api)
+
+	def _set_image(self, api: Any, image: np.ndarray) -> None:
+		gray = np.ascontiguousarray(_to_gray(image))
+		h, w = gray.shape
+		api.SetImageBytes(gray.tobytes(), w, h, 1, w)
+
+	def image_to_string(self, image: np.ndarray, lang: str, oem: int, psm: int) -> str:
+		api = self._checkout(lang, oem)
+		try:
+			api.SetPageSegMode(psm)
+			self._set_image(api, image)
+			return str(api.GetUTF8Text())
+		finally:
+			self._release(lang, oem, api)
+
+	def detect_osd(self, image: np.ndarray) -> Optional[Dict[str, Any]]:
+		api = self._checkout("osd", 0)
+		try:
+			api.SetPageSegMode(self._tesserocr.PSM.OSD_ONLY)
+			self._set_image(api, image)
+			res = api.DetectOrientationScript()
+		finally:
+			self._release("osd", 0, api)
+		if not res:
+			return None
+		return {
+			"script": res.get("script_name"),
+			"script_conf": float(res.get("script_conf", 0.0)),
+			"rotate": (360 - int(res.get("orient_deg", 0))) % 360,
+			"orientation_conf": float(res.get("orient_conf", 0.0)),
+		}
+
+
+def get_engine(name: Optional[str] = None) -> OcrEngine:
+	# One engine per process (pool workers build their own); "auto" prefers tesserocr
+	name = name or settings.OCR_ENGINE
+	with _engine_lock:
+		engine = _engines.get(name)
+		if engine is None:
+			if name == "pytesseract":
+				engine = PytesseractEngine()
+			else:
+				try:
+					engine = TesserocrEngine()
+				except ImportError:
+					if name == "tesserocr":
+						raise
+					engine = PytesseractEngine()
+			_engines[name] = engine
+		return engine
+
+
+def detect_script(gray, engine: Optional[OcrEngine] = None) -> Dict[str, Any]:
+	# OSD on a downscaled copy: a fraction of the cost of a full recognition pass
+	h, w = gray.shape[:2]
+	scale = settings.OCR_DETECT_MAX_SIDE / max(h, w)
+	small = gray
+	if scale < 1:
+		small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+	osd = (engine or get_engine()).detect_osd(small)
+	if osd is None:
+		# Too little text to decide; keep the dual model
+		return {"lang": FALLBACK_LANG, "script": None, "rotate": 0}
+	script = osd["script"]
+	confident = osd["script_conf"] >= settings.OCR_DETECT_MIN_CONF
+	lang = SCRIPT_LANGS.get(script, FALLBACK_LANG) if confident else FALLBACK_LANG
+	rotate = osd["rotate"] if osd["orientation_conf"] >= settings.OCR_DETECT_MIN_CONF else 0
+	return {"lang": lang, "script": script, "rotate": rotate}
+
+
+def _ocr_page(image, cfg: OcrConfig) -> Dict[str, Any]:
+	engine = get_engine(cfg.engine)
+	start = time.perf_counter()
+	out: Dict[str, Any] = {"lang": cfg.lang, "engine": engine.name}
+	if cfg.lang == "auto":
+		gray = _to_gray(image)
+		detected = detect_script(gray, engine)
+		if detected["rotate"] in _ROTATIONS:
+			gray = cv2.rotate(gray, _ROTATIONS[detected["rotate"]])
+		image = gray
+		out.update(detected)
+	detected_at = time.perf_counter()
+	proc = _preprocess(image, cfg)
+	mid = time.perf_counter()
+	out["text"] = engine.image_to_string(proc, out["lang"], cfg.oem, cfg.psm)
+	end = time.perf_counter()
+	out["detect_ms"] = round((detected_at - start) * 1000.0, 2)
+	out["preprocess_ms"] = round((mid - detected_at) * 1000.0, 2)
+	out["ocr_ms"] = round((end - mid) * 1000.0, 2)
+	return out
+
+
+def _init_worker() -> None:
+	# Each worker already owns a core; stop tesseract's OpenMP threads from oversubscribing it
+	os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _get_pool() -> Tuple[ProcessPoolExecutor, threading.BoundedSemaphore]:
+	global _pool, _pool_slots
+	with _pool_lock:
+		if _pool is None or _pool_slots is None:
+			workers = max(1, settings.OCR_WORKERS)
+			_pool = ProcessPoolExecutor(
+				max_workers=workers,
+				mp_context=multiprocessing.get_context("spawn"),
+				initializer=_init_worker,
+			)
+			_pool_slots = threading.BoundedSemaphore(settings.OCR_MAX_PENDING_PAGES or workers * 2)
+		return _pool, _pool_slots
+
+
+def shutdown_pool() -> None:
+	global _pool, _pool_slots
+	with _pool_lock:
+		if _pool is not None:
+			_pool.shutdown(wait=False, cancel_futures=True)
+		_pool, _pool_slots = None, None
+
+
+def _ocr_pages_parallel(pages: Iterable[np.ndarray], cfg: OcrConfig) -> List[Dict[str, Any]]:
+	pool, slots = _get_pool()
+	futures: List[Future] = []
+	try:
+		it = iter(pages)
+		while True:
+			# The semaphore is shared by every request in this process: a large upload waits
+			# for free slots instead of flooding the pool, and it is taken before the next
+			# page is rasterized so rendering never runs far ahead of OCR.
+			slots.acquire()
+			try:
+				page = next(it, _DONE)
+				if page is _DONE:
+					slots.release()
+					break
+				fut = pool.submit(_ocr_page, page, cfg)
+			except BaseException:
+				slots.release()
+				raise
+			del page
+			fut.add_done_callback(lambda _f: slots.release())
+			futures.append(fut)
+		return [f.result() for f in futures]
+	except BaseException:
+		for f in futures:
+			f.cancel()
+		raise
+
+
+@timed("ocr")
+def ocr_document(
+	path: pathlib.Path,
+	use_cloud: bool = False,
+	parallel: Optional[bool] = None,
+	first_page: Optional[int] = None,
+	last_page: Optional[int] = None,
+	config: Optional[OcrConfig] = None,
+	data: Optional[bytes] = None,
+) -> Tuple[str, Dict]:
+	# Local OCR via pytesseract; cloud backends are TODO hooks.
+	# PDF pages with a usable text layer are read directly and never rasterized.
+	cfg = config or OcrConfig()
+	is_pdf = path.suffix.lower() == ".pdf"
+	texts: Dict[int, str] = {}
+	details: Dict[int, Dict[str, Any]] = {}
+	text_layer_ms = 0.0
+	if is_pdf:
+		numbers = _pdf_page_numbers(path, first_page, last_page, cfg.max_pages)
+		if cfg.text_layer and numbers:
+			start = time.perf_counter()
+			layer = _pdf_text_layer(path, numbers[0], numbers[-1])
+			text_layer_ms = (time.perf_counter() - start) * 1000.0
+			record("ocr.text_layer", text_layer_ms / 1000.0)
+			for n, page_text in zip(numbers, layer):
+				if _usable_text(page_text):
+					texts[n] = page_text
+					details[n] = {"page": n, "method": "text"}
+		ocr_numbers = [n for n in numbers if n not in texts]
+	else:
+		ocr_numbers = [first_page or 1]
+
+	pages = iter_pages(
+		path,
+		dpi=cfg.dpi,
+		grayscale=cfg.grayscale,
+		page_numbers=ocr_numbers if is_pdf else None,
+		data=data,
+	)
+	if parallel is None:
+		parallel = settings.OCR_WORKERS > 1
+	parallel = parallel and is_pdf and len(ocr_numbers) > 1
+	if not ocr_numbers:
+		results = []
+	elif parallel:
+		results = _ocr_pages_parallel(pages, cfg)
+	else:
+		results = [_ocr_page(page, cfg) for page in pages]
+
+	for n, res in zip(ocr_numbers, results):
+		texts[n] = res.pop("text")
+		details[n] = {"page": n, "method": "ocr", **res}
+		# measured in the page's worker, recorded here where the registry lives
+		if cfg.lang == "auto":
+			record("ocr.detect", res["detect_ms"] / 1000.0)
+		record("ocr.preprocess", res["preprocess_ms"] / 1000.0)
+		record("ocr.tesseract", res["ocr_ms"] / 1000.0)
+	PAGES.inc("ocr", amount=len(results))
+	PAGES.inc("text", amount=len(texts) - len(results))
+
+	order = sorted(texts)
+	meta = {
+		"pages": len(order),
+		"mode": "parallel" if parallel else "serial",
+		"page_timings": [details[n] for n in order],
+		"text_layer_ms": round(text_layer_ms, 2),
+	}
+	# Pages are separated by form feeds so extraction can map offsets back to pages
+	return PAGE_SEP.join(texts[n] for n in order), meta
+
+
+def get_ocr_cache() -> Optional[ResultCache]:
+	global _cache
+	if not settings.OCR_CACHE_ENABLED:
+		return None
+	with _cache_lock:
+		if _cache is None:
+			_cache = ResultCache(
+				"ocr",
+				max_bytes=settings.OCR_CACHE_MAX_BYTES,
+				max_entries=settings.OCR_CACHE_MAX_ENTRIES,
+			)
+		return _cache
 
 
-def ocr_document(path: pathlib.Path, use_cloud: bool = False) -> Tuple[str, Dict]:
-	# Local OCR via pytesseract; cloud backends are TODO hooks
-	pages = _image_from_file(path)
-	texts = []
-	for idx, page in enumerate(pages, start=1):
-		proc = _preprocess(page)
-		config = "-l ara+eng --oem 3 --psm 6"
-		text = pytesseract.image_to_string(proc, config=config)
-		texts.append(text)
-	return "\n".join(texts), {"pages": len(pages)}
+def ocr_cache_key(
+	digest: str,
+	config: OcrConfig,
+	first_page: Optional[int] = None,
+	last_page: Optional[int] = None,
+) -> str:
+	parts = [CACHE_VERSION, digest, config.model_dump_json(), str(first_page), str(last_page)]
+	return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
 
 
+def ocr_document_cached(
+	path: pathlib.Path,
+	digest: str,
+	use_cloud: bool = False,
+	first_page: Optional[int] = None,
+	last_page: Optional[int] = None,
+	config: Optional[OcrConfig] = None,
+	data: Optional[bytes] = None,
+) -> Tuple[str, Dict]:
+	# digest is the SHA-256 of the uploaded bytes; a repeat upload skips OCR entirely
+	cfg = config or OcrConfig()
+	cache = get_ocr_cache()
+	key = ocr_cache_key(digest, cfg, first_page, last_page)
+	if cache is not None:
+		hit = cache.get(key)
+		if hit is not None:
+			return hit["text"], {**hit["meta"], "cache": "hit"}
+	text, meta = ocr_document(
+		path,
+		use_cloud=use_cloud,
+		first_page=first_page,
+		last_page=last_page,
+		config=cfg,
+		data=data,
+	)
+	if cache is not None:
+		cache.put(key, {"text": text, "meta": meta})
+	return text, {**meta, "cache": "miss" if cache is not None else "off"}
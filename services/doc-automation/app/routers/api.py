@@ -1,22 +1,45 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import io
 import json
-from typing import Any, Dict, List, Optional
+import pathlib
+import sqlite3
+import zipfile
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
 
 import pandas as pd
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from starlette.concurrency import run_in_threadpool
 
 from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.libs.common.jobs import BoundedExecutor, JobStore, QueueFullError
 from ai_insight_suite.libs.common.logging import get_logger
-from ai_insight_suite.libs.common.storage import output_path, save_upload
-from ..pipelines.ocr import ocr_document
-from ..pipelines.extract import extract_fields
+from ai_insight_suite.libs.common.metrics import span
+from ai_insight_suite.libs.common.storage import (
+	StoredUpload,
+	UploadTooLarge,
+	output_path,
+	save_upload,
+	save_upload_stream,
+)
+from ..pipelines.ocr import OcrConfig, get_ocr_cache, ocr_document_cached
+from ..pipelines.extract import Field, compile_schema, extract_fields
+from .. import store
+from ..search import get_search_index
 
 
 router = APIRouter()
 log = get_logger("doc.api")
+jobs = JobStore(
+	BoundedExecutor("extract-jobs", settings.JOB_WORKERS, settings.JOB_QUEUE_SIZE),
+	ttl_seconds=settings.JOB_RESULT_TTL_SECONDS,
+)
+BATCH_SUFFIXES = {".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp"}
 
 
 class FieldResult(BaseModel):
@@ -32,6 +55,7 @@ class ExtractResponse(BaseModel):
 	summary: Dict[str, Any]
 	csv_path: Optional[str]
 	json_path: Optional[str]
+	run_id: Optional[str] = None
 
 
 def _require_admin(key: str = Form(...)):
@@ -39,6 +63,120 @@ def _require_admin(key: str = Form(...)):
 		raise HTTPException(status_code=401, detail="invalid api key")
 
 
+def _check_schema(schema_yaml: Optional[str]) -> None:
+	# Compiling here reports a bad schema as 422 up front; the result is cached for the pipeline
+	if schema_yaml:
+		try:
+			compile_schema(schema_yaml)
+		except ValueError as e:
+			raise HTTPException(status_code=422, detail=str(e))
+
+
+def _ocr_config(lang: Optional[str]) -> Optional[OcrConfig]:
+	if not lang:
+		return None
+	try:
+		return OcrConfig(lang=lang)
+	except ValidationError as e:
+		raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+
+
+async def _store_upload(
+	file: UploadFile, keep_images: bool = True, max_bytes: Optional[int] = None
+) -> StoredUpload:
+	# Small images stay in memory so OCR decodes them without reading the file back
+	is_image = not (file.filename or "").lower().endswith((".pdf", ".zip"))
+	keep = settings.UPLOAD_MEMORY_BYTES if keep_images and is_image else 0
+	try:
+		with span("upload"):
+			return await save_upload_stream(
+				file, file.filename or "upload", max_bytes=max_bytes, keep_in_memory=keep
+			)
+	except UploadTooLarge as e:
+		raise HTTPException(status_code=413, detail=str(e))
+
+
+def _persist(
+	filename: str,
+	text: str,
+	fields: List[Field],
+	digest: Optional[str],
+	summary: Dict[str, Any],
+) -> Optional[str]:
+	# A database outage should not fail an extraction that already succeeded
+	if not settings.PERSIST_RESULTS:
+		return None
+	try:
+		run_id = store.save_run(filename, text, fields, sha256=digest, summary=summary)
+	except Exception as e:  # noqa: BLE001
+		log.warning("persist_failed", file=filename, error=str(e))
+		return None
+	index = get_search_index()
+	if index is not None:
+		try:
+			index.add(run_id, filename, text, fields)
+		except Exception as e:  # noqa: BLE001
+			log.warning("search_index_failed", run_id=run_id, error=str(e))
+	return run_id
+
+
+def _run_extraction(
+	stored: StoredUpload,
+	filename: str,
+	schema_yaml: Optional[str],
+	use_cloud: bool,
+	push_to_sheets: bool,
+	sheet_id: Optional[str],
+	first_page: Optional[int],
+	last_page: Optional[int],
+	config: Optional[OcrConfig] = None,
+) -> ExtractResponse:
+	# Blocking part of an extraction (OCR, exports, Sheets); never call it on the event loop
+	path = stored.path
+	text, ocr_meta = ocr_document_cached(
+		path,
+		stored.sha256,
+		use_cloud=use_cloud,
+		first_page=first_page,
+		last_page=last_page,
+		config=config,
+		data=stored.data,
+	)
+	fields = extract_fields(text, schema_yaml=schema_yaml, locale=settings.DEFAULT_LOCALE)
+
+	rows = [{"key": f.key, "val": f.val, "confidence": f.confidence} for f in fields]
+	csv_p = json_p = None
+	if settings.EXPORT_FILES:
+		with span("export"):
+			csv_p = output_path(path.stem + "-extracted", "csv")
+			json_p = output_path(path.stem + "-extracted", "json")
+			pd.DataFrame(rows).to_csv(csv_p, index=False)
+			json_p.write_text(json.dumps({"text": text, "fields": rows}, ensure_ascii=False))
+	summary = {
+		"pages": ocr_meta.get("pages", 1),
+		"page_timings": ocr_meta.get("page_timings", []),
+		"cache": ocr_meta.get("cache"),
+	}
+	with span("persist"):
+		run_id = _persist(filename, text, fields, stored.sha256, summary)
+
+	# Sheets push is a no-op unless creds provided; rows are queued and written in bulk
+	if push_to_sheets and sheet_id:
+		from ai_insight_suite.libs.common.sheets import enqueue_append
+
+		if not enqueue_append(sheet_id, "Sheet1", [filename] + [r.get("val") for r in rows]):
+			log.warning("sheets_push_skipped", sheet_id=sheet_id)
+
+	return ExtractResponse(
+		text=text,
+		fields=[FieldResult(**f.model_dump()) for f in fields],
+		summary=summary,
+		csv_path=str(csv_p) if csv_p else None,
+		json_path=str(json_p) if json_p else None,
+		run_id=run_id,
+	)
+
+
 @router.post("/extract", response_model=ExtractResponse)
 async def extract(
 	file: UploadFile = File(...),
@@ -46,47 +184,291 @@ async def extract(
 	use_cloud: bool = Form(False),
 	push_to_sheets: bool = Form(False),
 	sheet_id: Optional[str] = Form(None),
+	first_page: Optional[int] = Form(None),
+	last_page: Optional[int] = Form(None),
+	lang: Optional[str] = Form(None),
 ):
-	content = await file.read()
-	path = save_upload(content, file.filename)
-	text, ocr_meta = ocr_document(path, use_cloud=use_cloud)
-	fields = extract_fields(text, schema_yaml=schema_yaml, locale=settings.DEFAULT_LOCALE)
+	config = _ocr_config(lang)
+	_check_schema(schema_yaml)
+	stored = await _store_upload(file)
+	return await run_in_threadpool(
+		_run_extraction,
+		stored,
+		file.filename,
+		schema_yaml,
+		use_cloud,
+		push_to_sheets,
+		sheet_id,
+		first_page,
+		last_page,
+		config,
+	)
 
-	rows = [{"key": f.key, "val": f.val, "confidence": f.confidence} for f in fields]
-	df = pd.DataFrame(rows)
-	csv_p = output_path(path.stem + "-extracted", "csv")
-	json_p = output_path(path.stem + "-extracted", "json")
-	df.to_csv(csv_p, index=False)
-	json_p.write_text(json.dumps({"text": text, "fields": rows}, ensure_ascii=False))
 
-	# Sheets push is a no-op unless creds provided (handled inside client)
-	if push_to_sheets and sheet_id:
+def _batch_items(
+	saved: List[Tuple[str, pathlib.Path, Optional[str]]]
+) -> List[Tuple[str, pathlib.Path, Optional[str], Optional[str]]]:
+	# (name, path, digest, zip member) per document; only the zip directories are read
+	# here, members are extracted one at a time as they are processed
+	items: List[Tuple[str, pathlib.Path, Optional[str], Optional[str]]] = []
+	for name, path, digest in saved:
+		if not zipfile.is_zipfile(path):
+			items.append((name, path, digest, None))
+			continue
+		with zipfile.ZipFile(path) as zf:
+			members = [
+				m.filename
+				for m in zf.infolist()
+				if not m.is_dir()
+				and not m.filename.startswith("__MACOSX/")
+				and not pathlib.PurePosixPath(m.filename).name.startswith(".")
+				and pathlib.PurePosixPath(m.filename).suffix.lower() in BATCH_SUFFIXES
+			]
+		items.extend((member, path, None, member) for member in members)
+	return items
+
+
+def _extract_batch_item(
+	index: int,
+	name: str,
+	path: pathlib.Path,
+	digest: Optional[str],
+	member: Optional[str],
+	schema_yaml: Optional[str],
+	use_cloud: bool,
+	include_text: bool,
+	config: Optional[OcrConfig] = None,
+) -> Dict[str, Any]:
+	data: Optional[bytes] = None
+	limit = settings.MAX_UPLOAD_BYTES
+	try:
+		if member is not None:
+			# Read at most one byte past the limit so a lying zip header cannot balloon memory
+			with zipfile.ZipFile(path) as zf, zf.open(member) as fh:
+				data = fh.read(limit + 1)
+			if len(data) > limit:
+				raise UploadTooLarge(limit)
+			path = save_upload(data, pathlib.PurePosixPath(member).name)
+			digest = hashlib.sha256(data).hexdigest()
+		elif path.stat().st_size > limit:
+			# a ".zip" upload that is not an archive was stored under the archive limit
+			raise UploadTooLarge(limit)
+		elif digest is None:
+			with path.open("rb") as fh:
+				digest = hashlib.file_digest(fh, "sha256").hexdigest()
+		text, ocr_meta = ocr_document_cached(
+			path, digest, use_cloud=use_cloud, config=config, data=data
+		)
+		fields = extract_fields(text, schema_yaml=schema_yaml, locale=settings.DEFAULT_LOCALE)
+	except Exception as e:  # noqa: BLE001
+		log.warning("batch_item_failed", file=name, error=str(e))
+		return {"index": index, "file": name, "ok": False, "error": str(e)}
+	summary = {"pages": ocr_meta.get("pages", 1), "cache": ocr_meta.get("cache")}
+	out: Dict[str, Any] = {
+		"index": index,
+		"file": name,
+		"ok": True,
+		"fields": [f.model_dump() for f in fields],
+		"summary": summary,
+		"run_id": _persist(name, text, fields, digest, summary),
+	}
+	if include_text:
+		out["text"] = text
+	return out
+
+
+@router.post("/extract/batch")
+async def extract_batch(
+	files: List[UploadFile] = File(...),
+	schema_yaml: Optional[str] = Form(None),
+	use_cloud: bool = Form(False),
+	include_text: bool = Form(False),
+	lang: Optional[str] = Form(None),
+):
+	config = _ocr_config(lang)
+	_check_schema(schema_yaml)
+	# Uploads are closed once this handler returns, so persist them before streaming
+	saved: List[Tuple[str, pathlib.Path, Optional[str]]] = []
+	for f in files:
+		name = f.filename or "upload"
+		# archives get their own, larger limit; their members are checked one by one
+		is_zip = name.lower().endswith(".zip")
+		limit = settings.BATCH_MAX_ZIP_BYTES if is_zip else None
+		stored = await _store_upload(f, keep_images=False, max_bytes=limit)
+		saved.append((name, stored.path, stored.sha256))
+	batch = await run_in_threadpool(_batch_items, saved)
+	if len(batch) > settings.BATCH_MAX_FILES:
+		# refused whole rather than processing a prefix the client cannot tell apart
+		raise HTTPException(
+			status_code=413,
+			detail=f"batch has {len(batch)} documents; the limit is {settings.BATCH_MAX_FILES}",
+		)
+
+	async def stream() -> AsyncIterator[str]:
+		items = enumerate(batch)
+		pending: Set[asyncio.Future] = set()
+
+		def fill() -> None:
+			while len(pending) < max(1, settings.BATCH_CONCURRENCY):
+				nxt = next(items, None)
+				if nxt is None:
+					return
+				index, (name, path, digest, member) = nxt
+				pending.add(
+					asyncio.ensure_future(
+						run_in_threadpool(
+							_extract_batch_item,
+							index,
+							name,
+							path,
+							digest,
+							member,
+							schema_yaml,
+							use_cloud,
+							include_text,
+							config,
+						)
+					)
+				)
+
+		fill()
 		try:
-			from ai_insight_suite.libs.common.sheets import append_row
+			while pending:
+				done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+				for task in done:
+					yield json.dumps(task.result(), ensure_ascii=False) + "\n"
+				fill()
+		finally:
+			for task in pending:
+				task.cancel()
 
-			append_row(sheet_id, "Sheet1", [file.filename] + [r.get("val") for r in rows])
-		except Exception as e:  # noqa: BLE001
-			log.warning("sheets_push_failed", error=str(e))
+	return StreamingResponse(stream(), media_type="application/x-ndjson")
 
-	return ExtractResponse(
-		text=text,
-		fields=fields,
-		summary={"pages": ocr_meta.get("pages", 1)},
-		csv_path=str(csv_p),
-		json_path=str(json_p),
-	)
+
+class JobAccepted(BaseModel):
+	job_id: str
+	status: str
+
+
+@router.post("/jobs/extract", response_model=JobAccepted, status_code=202)
+async def submit_extract_job(
+	file: UploadFile = File(...),
+	schema_yaml: Optional[str] = Form(None),
+	use_cloud: bool = Form(False),
+	push_to_sheets: bool = Form(False),
+	sheet_id: Optional[str] = Form(None),
+	first_page: Optional[int] = Form(None),
+	last_page: Optional[int] = Form(None),
+	lang: Optional[str] = Form(None),
+):
+	config = _ocr_config(lang)
+	_check_schema(schema_yaml)
+	stored = await _store_upload(file)
+
+	def run() -> Dict[str, Any]:
+		return _run_extraction(
+			stored,
+			file.filename,
+			schema_yaml,
+			use_cloud,
+			push_to_sheets,
+			sheet_id,
+			first_page,
+			last_page,
+			config,
+		).model_dump()
+
+	try:
+		job = jobs.submit(run)
+	except QueueFullError:
+		raise HTTPException(status_code=429, detail="extraction queue is full")
+	return JobAccepted(job_id=job.id, status=job.status)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+	job = jobs.get(job_id)
+	if job is None:
+		raise HTTPException(status_code=404, detail="unknown or expired job")
+	return job.as_dict()
+
+
+@router.get("/jobs")
+async def job_queue_stats():
+	return jobs.executor.stats()
+
+
+@router.get("/runs")
+async def list_runs(
+	key: Optional[str] = None,
+	val: Optional[str] = None,
+	file_name: Optional[str] = None,
+	since: Optional[datetime] = None,
+	until: Optional[datetime] = None,
+	limit: int = Query(50, ge=1, le=500),
+	cursor: Optional[str] = None,
+):
+	if val is not None and key is None:
+		raise HTTPException(status_code=422, detail="val requires key")
+	try:
+		return await run_in_threadpool(
+			store.query_runs, key, val, file_name, since, until, limit, cursor
+		)
+	except ValueError as e:
+		raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.get("/runs/{run_id}")
+async def get_run(run_id: str):
+	run = await run_in_threadpool(store.get_run, run_id)
+	if run is None:
+		raise HTTPException(status_code=404, detail="unknown run")
+	return run
+
+
+@router.get("/search")
+async def search(
+	q: str = Query(..., min_length=1, max_length=256),
+	limit: int = Query(20, ge=1, le=100),
+	offset: int = Query(0, ge=0, le=10_000),
+):
+	index = get_search_index()
+	if index is None:
+		raise HTTPException(status_code=404, detail="search is disabled")
+	try:
+		hits = await run_in_threadpool(index.search, q, limit + 1, offset)
+	except sqlite3.OperationalError as e:
+		raise HTTPException(status_code=422, detail=f"bad query: {e}")
+	more = len(hits) > limit
+	return {"hits": hits[:limit], "next_offset": offset + limit if more else None}
+
+
+@router.get("/ocr/cache")
+async def ocr_cache_stats():
+	cache = get_ocr_cache()
+	if cache is None:
+		return {"enabled": False}
+	return {"enabled": True, **cache.stats()}
 
 
 class AdminValidateBody(BaseModel):
 	key: str
 	file_name: str
 	corrected_json: Dict[str, Any]
+	run_id: Optional[str] = None
 
 
 @router.post("/admin/validate")
 async def admin_validate(body: AdminValidateBody, _: Any = Depends(_require_admin)):
-	json_p = output_path(body.file_name + "-corrected", "json")
-	json_p.write_text(json.dumps(body.corrected_json, ensure_ascii=False))
-	return {"ok": True, "path": str(json_p)}
+	json_p = None
+	if settings.EXPORT_FILES:
+		json_p = output_path(body.file_name + "-corrected", "json")
+		json_p.write_text(json.dumps(body.corrected_json, ensure_ascii=False))
+	correction_id = None
+	if settings.PERSIST_RESULTS:
+		correction_id = await run_in_threadpool(
+			store.save_correction, body.file_name, body.corrected_json, body.run_id
+		)
+	return {"ok": True, "path": str(json_p) if json_p else None, "correction_id": correction_id}
 
 
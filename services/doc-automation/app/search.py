@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import pathlib
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence
+
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.libs.common.i18n import parse_arabic_numerals
+from ai_insight_suite.libs.common.storage import BASE_DIR
+
+from .pipelines.extract import Field
+
+INDEX_DIR = BASE_DIR / "search"
+PREFIX_MIN_CHARS = 3
+
+# harakat, superscript alef and tatweel carry no meaning for lookup
+_AR_MARKS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+# hamza/madda/wasla alef forms to bare alef, alef maqsura to ya, ta marbuta to ha
+_AR_FOLD = str.maketrans(
+	"\u0623\u0625\u0622\u0671\u0649\u0629", "\u0627\u0627\u0627\u0627\u064a\u0647"
+)
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(
+	run_id UNINDEXED,
+	page UNINDEXED,
+	file_name,
+	body,
+	fields,
+	tokenize = 'unicode61 remove_diacritics 2'
+);
+-- run_id is UNINDEXED in pages, so rows are found by run through this table
+CREATE TABLE IF NOT EXISTS page_runs (
+	page_rowid INTEGER PRIMARY KEY,
+	run_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS page_runs_run_id ON page_runs (run_id);
+"""
+
+
+def normalize(text: str) -> str:
+	# Applied to documents and queries alike: Arabic-Indic digits to ASCII, Arabic marks
+	# stripped and letter variants folded, Latin accents handled by the tokenizer
+	text = unicodedata.normalize("NFKC", parse_arabic_numerals(text))
+	return _AR_MARKS.sub("", text).translate(_AR_FOLD).casefold()
+
+
+def _match_query(query: str) -> str:
+	# Every word must appear; each is quoted so FTS5 operators in user input stay literal.
+	# The last word also matches as a prefix for search-as-you-type, once it is long enough
+	# not to expand to a large slice of the vocabulary.
+	tokens = _TOKEN_RE.findall(normalize(query))
+	if not tokens:
+		return ""
+	terms = [f'"{t}"' for t in tokens]
+	if len(tokens[-1]) >= PREFIX_MIN_CHARS:
+		terms[-1] += "*"
+	return " AND ".join(terms)
+
+
+# Full-text index of OCR text in its own SQLite FTS5 file, one row per page, so it works
+# whatever DATABASE_URL points at. Rows are added as extractions complete.
+class SearchIndex:
+	def __init__(self, path: pathlib.Path):
+		path.parent.mkdir(parents=True, exist_ok=True)
+		self.path = path
+		self._local = threading.local()
+		conn = self._conn()
+		conn.executescript(_SCHEMA)
+		if conn.execute("SELECT 1 FROM page_runs LIMIT 1").fetchone() is None:
+			# index files written before page_runs existed
+			conn.execute("INSERT INTO page_runs (page_rowid, run_id) SELECT rowid, run_id FROM pages")
+
+	def _conn(self) -> sqlite3.Connection:
+		conn = getattr(self._local, "conn", None)
+		if conn is None:
+			conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			self._local.conn = conn
+		return conn
+
+	def add(self, run_id: str, file_name: str, text: str, fields: Sequence[Field]) -> int:
+		pages = text.split("\f")
+		field_text = normalize(
+			"\n".join(f"{f.key} {f.val}" for f in fields if f.val is not None)
+		)
+		rows = [
+			# extracted fields are indexed with the first page so they rank the document once
+			(run_id, n, file_name, normalize(body), field_text if n == 1 else "")
+			for n, body in enumerate(pages, start=1)
+			if body.strip() or n == 1
+		]
+		conn = self._conn()
+		conn.execute("BEGIN IMMEDIATE")
+		try:
+			# re-indexing a run replaces its pages
+			self._delete(conn, run_id)
+			for row in rows:
+				cur = conn.execute(
+					"INSERT INTO pages (run_id, page, file_name, body, fields) VALUES (?, ?, ?, ?, ?)",
+					row,
+				)
+				conn.execute(
+					"INSERT INTO page_runs (page_rowid, run_id) VALUES (?, ?)", (cur.lastrowid, run_id)
+				)
+			conn.execute("COMMIT")
+		except BaseException:
+			conn.execute("ROLLBACK")
+			raise
+		return len(rows)
+
+	def _delete(self, conn: sqlite3.Connection, run_id: str) -> None:
+		# by rowid: a run_id filter on pages would scan the whole index
+		rowids = [
+			r[0]
+			for r in conn.execute("SELECT page_rowid FROM page_runs WHERE run_id = ?", (run_id,))
+		]
+		if rowids:
+			conn.executemany("DELETE FROM pages WHERE rowid = ?", [(i,) for i in rowids])
+			conn.execute("DELETE FROM page_runs WHERE run_id = ?", (run_id,))
+
+	def remove(self, run_id: str) -> None:
+		conn = self._conn()
+		conn.execute("BEGIN IMMEDIATE")
+		try:
+			self._delete(conn, run_id)
+			conn.execute("COMMIT")
+		except BaseException:
+			conn.execute("ROLLBACK")
+			raise
+
+	def search(self, query: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+		match = _match_query(query)
+		if not match:
+			return []
+		# bm25 weights follow column order: run_id, page, file_name, body, fields
+		rows = self._conn().execute(
+			"""
+			SELECT run_id, page, file_name, bm25(pages, 0, 0, 2.0, 1.0, 4.0) AS score,
+				snippet(pages, 3, '[', ']', ' … ', 12)
+			FROM pages WHERE pages MATCH ?
+			ORDER BY score LIMIT ? OFFSET ?
+			""",
+			(match, limit, offset),
+		).fetchall()
+		return [
+			{
+				"run_id": r[0],
+				"page": r[1],
+				"file_name": r[2],
+				"score": round(-r[3], 4),
+				"snippet": r[4],
+			}
+			for r in rows
+		]
+
+	def stats(self) -> Dict[str, int]:
+		conn = self._conn()
+		pages = conn.execute("SELECT count(*) FROM pages").fetchone()[0]
+		runs = conn.execute("SELECT count(DISTINCT run_id) FROM page_runs").fetchone()[0]
+		return {"pages": pages, "documents": runs}
+
+	def optimize(self) -> None:
+		# merges FTS5 segments; worth running after large backfills
+		self._conn().execute("INSERT INTO pages (pages) VALUES ('optimize')")
+
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> Optional[SearchIndex]:
+	global _index
+	if not settings.SEARCH_ENABLED:
+		return None
+	with _index_lock:
+		if _index is None:
+			_index = SearchIndex(INDEX_DIR / "pages.sqlite3")
+		return _index
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import base64
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import (
+	JSON,
+	DateTime,
+	Float,
+	ForeignKey,
+	Index,
+	Integer,
+	String,
+	Text,
+	and_,
+	insert,
+	or_,
+	select,
+)
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ai_insight_suite.libs.common.db import Base, session_scope
+
+from .pipelines.extract import Field
+
+VAL_MAX_CHARS = 1024  # longer values are truncated so (key, val) stays indexable
+
+
+class ExtractionRun(Base):
+	__tablename__ = "extraction_runs"
+
+	id: Mapped[str] = mapped_column(String(32), primary_key=True)
+	file_name: Mapped[str] = mapped_column(String(512))
+	sha256: Mapped[Optional[str]] = mapped_column(String(64), index=True)
+	pages: Mapped[int] = mapped_column(Integer, default=1)
+	text: Mapped[str] = mapped_column(Text)
+	summary: Mapped[Dict[str, Any]] = mapped_column(JSON, default=dict)
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+	__table_args__ = (Index("ix_runs_created_id", "created_at", "id"),)
+
+
+class ExtractedField(Base):
+	__tablename__ = "extracted_fields"
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+	run_id: Mapped[str] = mapped_column(ForeignKey("extraction_runs.id", ondelete="CASCADE"))
+	key: Mapped[str] = mapped_column(String(128))
+	val: Mapped[Optional[str]] = mapped_column(String(VAL_MAX_CHARS))
+	confidence: Mapped[float] = mapped_column(Float)
+	source_page: Mapped[Optional[int]] = mapped_column(Integer)
+	# copied from the run so key/value/date filters are answered from one index
+	created_at: Mapped[datetime] = mapped_column(DateTime)
+
+	__table_args__ = (
+		Index("ix_fields_key_val_created", "key", "val", "created_at"),
+		Index("ix_fields_key_created", "key", "created_at"),
+		Index("ix_fields_run", "run_id"),
+	)
+
+
+class Correction(Base):
+	__tablename__ = "corrections"
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+	run_id: Mapped[Optional[str]] = mapped_column(
+		ForeignKey("extraction_runs.id", ondelete="SET NULL"), index=True
+	)
+	file_name: Mapped[str] = mapped_column(String(512), index=True)
+	corrected: Mapped[Dict[str, Any]] = mapped_column(JSON)
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+
+def save_run(
+	file_name: str,
+	text: str,
+	fields: Sequence[Field],
+	sha256: Optional[str] = None,
+	summary: Optional[Dict[str, Any]] = None,
+) -> str:
+	run_id = uuid.uuid4().hex
+	now = datetime.utcnow()
+	rows = [
+		{
+			"run_id": run_id,
+			"key": f.key,
+			"val": f.val[:VAL_MAX_CHARS] if f.val is not None else None,
+			"confidence": f.confidence,
+			"source_page": f.source_page,
+			"created_at": now,
+		}
+		for f in fields
+	]
+	summary = summary or {}
+	with session_scope() as s:
+		s.add(
+			ExtractionRun(
+				id=run_id,
+				file_name=file_name,
+				sha256=sha256,
+				pages=int(summary.get("pages") or 1),
+				text=text,
+				summary=summary,
+				created_at=now,
+			)
+		)
+		s.flush()
+		if rows:
+			# one executemany for all fields instead of an INSERT per ORM object
+			s.execute(insert(ExtractedField), rows)
+	return run_id
+
+
+def save_correction(file_name: str, corrected: Dict[str, Any], run_id: Optional[str] = None) -> int:
+	with session_scope() as s:
+		row = Correction(run_id=run_id, file_name=file_name, corrected=corrected)
+		s.add(row)
+		s.flush()
+		return row.id
+
+
+def encode_cursor(created_at: datetime, run_id: str) -> str:
+	raw = f"{created_at.isoformat()}|{run_id}".encode("utf-8")
+	return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+	try:
+		stamp, run_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+		return datetime.fromisoformat(stamp), run_id
+	except ValueError as e:
+		raise ValueError("invalid cursor") from e
+
+
+def _field_dict(f: ExtractedField) -> Dict[str, Any]:
+	return {"key": f.key, "val": f.val, "confidence": f.confidence, "source_page": f.source_page}
+
+
+def query_runs(
+	key: Optional[str] = None,
+	val: Optional[str] = None,
+	file_name: Optional[str] = None,
+	since: Optional[datetime] = None,
+	until: Optional[datetime] = None,
+	limit: int = 50,
+	cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+	# Newest first, paginated by keyset on (created_at, id) so deep pages cost the same
+	# as the first one. key/val match a stored field exactly (val requires key).
+	q = select(ExtractionRun).order_by(ExtractionRun.created_at.desc(), ExtractionRun.id.desc())
+	if key is not None:
+		# driven by ix_fields_key_val_created: fields carry the run's timestamp
+		match = select(ExtractedField.run_id).where(ExtractedField.key == key)
+		if val is not None:
+			match = match.where(ExtractedField.val == val)
+		if since is not None:
+			match = match.where(ExtractedField.created_at >= since)
+		if until is not None:
+			match = match.where(ExtractedField.created_at < until)
+		q = q.where(ExtractionRun.id.in_(match))
+	if file_name is not None:
+		q = q.where(ExtractionRun.file_name == file_name)
+	if since is not None:
+		q = q.where(ExtractionRun.created_at >= since)
+	if until is not None:
+		q = q.where(ExtractionRun.created_at < until)
+	if cursor:
+		at, last_id = decode_cursor(cursor)
+		q = q.where(
+			or_(
+				ExtractionRun.created_at < at,
+				and_(ExtractionRun.created_at == at, ExtractionRun.id < last_id),
+			)
+		)
+
+	with session_scope() as s:
+		runs = list(s.scalars(q.limit(limit + 1)))
+		more = len(runs) > limit
+		runs = runs[:limit]
+		by_run: Dict[str, List[Dict[str, Any]]] = {r.id: [] for r in runs}
+		if runs:
+			# fields for the whole page in one query
+			fq = select(ExtractedField).where(ExtractedField.run_id.in_(list(by_run)))
+			for f in s.scalars(fq.order_by(ExtractedField.id)):
+				by_run[f.run_id].append(_field_dict(f))
+
+	items = [
+		{
+			"id": r.id,
+			"file_name": r.file_name,
+			"sha256": r.sha256,
+			"pages": r.pages,
+			"created_at": r.created_at.isoformat(),
+			"fields": by_run[r.id],
+		}
+		for r in runs
+	]
+	next_cursor = encode_cursor(runs[-1].created_at, runs[-1].id) if more else None
+	return {"items": items, "next_cursor": next_cursor}
+
+
+def get_run(run_id: str) -> Optional[Dict[str, Any]]:
+	with session_scope() as s:
+		run = s.get(ExtractionRun, run_id)
+		if run is None:
+			return None
+		fields = s.scalars(
+			select(ExtractedField).where(ExtractedField.run_id == run_id).order_by(ExtractedField.id)
+		)
+		return {
+			"id": run.id,
+			"file_name": run.file_name,
+			"sha256": run.sha256,
+			"pages": run.pages,
+			"created_at": run.created_at.isoformat(),
+			"summary": run.summary,
+			"text": run.text,
+			"fields": [_field_dict(f) for f in fields],
+		}
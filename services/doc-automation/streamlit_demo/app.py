@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import sys
 from pathlib import Path
@@ -12,7 +13,10 @@ project_root = Path(__file__).resolve().parents[3]
 sys.path.insert(0, str(project_root))
 
 from ai_insight_suite.libs.common.storage import output_path, save_upload
-from ai_insight_suite.services.doc_automation.app.pipelines.ocr import ocr_document
+from ai_insight_suite.services.doc_automation.app.pipelines.ocr import (
+	OcrConfig,
+	ocr_document_cached,
+)
 from ai_insight_suite.services.doc_automation.app.pipelines.extract import extract_fields
 
 
@@ -21,12 +25,18 @@ st.set_page_config(page_title="Doc Automation", layout="wide")
 st.title("Document Automation")
 locale = st.selectbox("Locale", ["en", "ar"], index=0)
 use_cloud = st.checkbox("Use Cloud OCR (if configured)", value=False)
+ocr_lang = st.selectbox("OCR language", ["auto", "eng", "ara", "ara+eng"], index=0)
 
 uploaded = st.file_uploader("Upload PDF/Image", type=["pdf", "png", "jpg", "jpeg"])
 if uploaded:
 	content = uploaded.read()
 	path = save_upload(content, uploaded.name)
-	text, meta = ocr_document(path, use_cloud=use_cloud)
+	text, meta = ocr_document_cached(
+		path,
+		hashlib.sha256(content).hexdigest(),
+		use_cloud=use_cloud,
+		config=OcrConfig(lang=ocr_lang),
+	)
 	fields = extract_fields(text, locale=locale)
 
 	st.subheader("Extracted Text")
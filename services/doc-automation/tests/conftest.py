@@ -0,0 +1,21 @@
+import pytest
+
+from ai_insight_suite.libs.common import db
+from ai_insight_suite.libs.common.config import settings
+
+
+@pytest.fixture(autouse=True)
+def _temp_database(monkeypatch, tmp_path):
+	# every test gets its own SQLite file instead of ./data/app.db
+	monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'app.db'}")
+	db.reset_engine()
+	yield
+	db.reset_engine()
+
+
+@pytest.fixture(autouse=True)
+def _temp_search_index(monkeypatch, tmp_path):
+	from ai_insight_suite.services.doc_automation.app import search
+
+	monkeypatch.setattr(search, "INDEX_DIR", tmp_path / "search")
+	monkeypatch.setattr(search, "_index", None)
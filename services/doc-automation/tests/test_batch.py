@@ -0,0 +1,90 @@
+import io
+import json
+import zipfile
+
+from fastapi.testclient import TestClient
+
+from ai_insight_suite.libs.common import storage
+from ai_insight_suite.services.doc_automation.app.main import app
+from ai_insight_suite.services.doc_automation.app.routers import api
+
+
+def _fake_ocr(path, digest, **kwargs):
+	if "broken" in path.name:
+		raise RuntimeError("cannot decode image")
+	return f"Total: 99.50 SAR\nfile {path.name}", {"pages": 1, "cache": "miss"}
+
+
+def test_batch_streams_one_line_per_document(monkeypatch, tmp_path):
+	monkeypatch.setattr(api, "ocr_document_cached", _fake_ocr)
+	monkeypatch.setattr(storage, "UPLOADS_DIR", tmp_path)
+
+	buf = io.BytesIO()
+	with zipfile.ZipFile(buf, "w") as zf:
+		zf.writestr("scans/a.png", b"a")
+		zf.writestr("scans/broken.png", b"b")
+		zf.writestr("scans/notes.txt", b"ignored")
+		zf.writestr("__MACOSX/scans/._a.png", b"junk")
+	files = [
+		("files", ("bundle.zip", buf.getvalue(), "application/zip")),
+		("files", ("c.jpg", b"c", "image/jpeg")),
+	]
+	client = TestClient(app)
+	r = client.post("/v1/extract/batch", files=files, data={"include_text": "true"})
+	assert r.status_code == 200
+	assert r.headers["content-type"].startswith("application/x-ndjson")
+
+	lines = [json.loads(line) for line in r.text.splitlines()]
+	by_file = {line["file"]: line for line in lines}
+	assert set(by_file) == {"scans/a.png", "scans/broken.png", "c.jpg"}
+	assert by_file["scans/broken.png"]["ok"] is False
+	assert by_file["c.jpg"]["ok"] is True
+	assert "text" in by_file["c.jpg"]
+	assert {f["key"] for f in by_file["scans/a.png"]["fields"]} >= {"currency", "total"}
+
+
+def test_oversized_upload_is_rejected(monkeypatch, tmp_path):
+	monkeypatch.setattr(storage, "UPLOADS_DIR", tmp_path)
+	monkeypatch.setattr(storage.settings, "MAX_UPLOAD_BYTES", 10)
+	client = TestClient(app)
+	r = client.post("/v1/extract", files={"file": ("big.png", b"x" * 11, "image/png")})
+	assert r.status_code == 413
+	assert list(tmp_path.iterdir()) == []
+
+
+def test_batch_over_file_limit_is_refused(monkeypatch, tmp_path):
+	monkeypatch.setattr(api, "ocr_document_cached", _fake_ocr)
+	monkeypatch.setattr(storage, "UPLOADS_DIR", tmp_path)
+	monkeypatch.setattr(api.settings, "BATCH_MAX_FILES", 2)
+	buf = io.BytesIO()
+	with zipfile.ZipFile(buf, "w") as zf:
+		zf.writestr("a.png", b"a")
+		zf.writestr("b.png", b"b")
+	files = [
+		("files", ("bundle.zip", buf.getvalue(), "application/zip")),
+		("files", ("c.jpg", b"c", "image/jpeg")),
+	]
+	r = TestClient(app).post("/v1/extract/batch", files=files)
+	assert r.status_code == 413
+	assert "limit is 2" in r.json()["detail"]
+
+
+def test_zip_archive_has_its_own_limit(monkeypatch, tmp_path):
+	monkeypatch.setattr(api, "ocr_document_cached", _fake_ocr)
+	monkeypatch.setattr(storage, "UPLOADS_DIR", tmp_path)
+	monkeypatch.setattr(api.settings, "MAX_UPLOAD_BYTES", 64)
+	buf = io.BytesIO()
+	with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+		zf.writestr("a.png", b"a" * 40)
+		zf.writestr("big.png", b"b" * 100)
+	assert len(buf.getvalue()) > 64
+	files = [("files", ("bundle.zip", buf.getvalue(), "application/zip"))]
+	r = TestClient(app).post("/v1/extract/batch", files=files)
+	assert r.status_code == 200
+	by_file = {line["file"]: line for line in map(json.loads, r.text.splitlines())}
+	assert by_file["a.png"]["ok"] is True
+	assert by_file["big.png"]["ok"] is False and "exceeds" in by_file["big.png"]["error"]
+
+	monkeypatch.setattr(api.settings, "BATCH_MAX_ZIP_BYTES", 64)
+	r = TestClient(app).post("/v1/extract/batch", files=files)
+	assert r.status_code == 413
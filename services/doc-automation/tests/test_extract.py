@@ -0,0 +1,108 @@
+import pytest
+
+from ai_insight_suite.services.doc_automation.app.pipelines.extract import (
+	compile_schema,
+	extract_fields,
+	locate_labels,
+	split_windows,
+)
+
+INVOICE = """INVOICE #INV-2024-001
+VAT No: GB123456789
+PO-4471 / PO 4472
+IBAN: SA0380000000608010167519
+Total: 2,700.00 USD
+"""
+
+SCHEMA = r"""
+fields:
+  - key: vat_number
+    pattern: 'VAT\s*(?:No\.?|Number)?[:\s]*([A-Z0-9]{8,15})'
+    confidence: 0.9
+  - key: po_number
+    pattern: 'PO[-\s#]*(\d+)'
+    multiple: true
+  - key: iban
+    pattern: '\b([A-Z]{2}\d{2}[A-Z0-9]{11,30})\b'
+    ignore_case: false
+"""
+
+
+def test_schema_fields_extracted_alongside_builtins():
+	fields = extract_fields(INVOICE, schema_yaml=SCHEMA)
+	by_key = {}
+	for f in fields:
+		by_key.setdefault(f.key, []).append(f.val)
+	assert by_key["vat_number"] == ["GB123456789"]
+	assert by_key["po_number"] == ["4471", "4472"]
+	assert by_key["iban"] == ["SA0380000000608010167519"]
+	assert by_key["currency"] == ["USD"]
+
+
+def test_schema_short_form_and_builtins_off():
+	schema = "builtins: false\nfields:\n  currency: 'Total:\\s*[\\d,.]+\\s*([A-Z]{3})'\n"
+	fields = extract_fields(INVOICE, schema_yaml=schema)
+	assert [(f.key, f.val) for f in fields] == [("currency", "USD")]
+
+
+def test_schema_compiled_once_and_validated():
+	assert compile_schema(SCHEMA) is compile_schema(SCHEMA)
+	with pytest.raises(ValueError):
+		compile_schema("fields:\n  - key: bad\n    pattern: '(unclosed'\n")
+	with pytest.raises(ValueError):
+		compile_schema("fields:\n  - key: bad\n    pattern: '(a)\\1'\n")
+	with pytest.raises(ValueError):
+		compile_schema("fields: [")
+
+
+def test_overlapping_schema_patterns_match_like_separate_scans():
+	schema = r"""
+fields:
+  - key: due_date
+    pattern: 'Due[:\s]*(\d{2}/\d{2}/\d{4})'
+  - key: date
+    pattern: '(\d{2}/\d{2}/\d{4})'
+  - key: ref
+    pattern: 'REF-(\d+)'
+    multiple: true
+  - key: code
+    pattern: '([A-Z]{3}-\d+)'
+    ignore_case: false
+    multiple: true
+builtins: false
+"""
+	text = "Due: 01/02/2024\nREF-7 ABC-1\nIssued 03/04/2024 REF-8"
+	got = {}
+	for f in extract_fields(text, schema_yaml=schema):
+		got.setdefault(f.key, []).append(f.val)
+	assert got == {
+		"due_date": ["01/02/2024"],
+		"date": ["01/02/2024"],
+		"ref": ["7", "8"],
+		"code": ["REF-7", "ABC-1", "REF-8"],
+	}
+
+
+def test_total_uses_amount_next_to_label_and_records_page():
+	pages = [
+		"ACME Ltd\nInvoice date 01/02/2024\nItem A  1,000.00",
+		"Item B  500.00\nTotal: 1,500.00 SAR\nPage 2 of 3",
+		"Thank you\nRef 44",
+	]
+	fields = {f.key: f for f in extract_fields("\f".join(pages))}
+	assert fields["total"].val == "1,500.00"
+	assert fields["total"].source_page == 2
+	assert fields["date"].source_page == 1
+	assert fields["amount"].source_page == 3
+
+
+def test_locator_reports_window_per_label():
+	windows = split_windows("Subtotal 10\n\fGrand Total\n25.00\n")
+	assert [w.page for w in windows] == [1, 2, 2]
+	matches = locate_labels(["grand total", "total"], windows)
+	assert windows[matches["grand total"].window].text == "Grand Total"
+	assert matches["grand total"].score == 1.0
+	# ties go to the later line
+	assert matches["total"].window == 1
+	fields = {f.key: f for f in extract_fields("Subtotal 10\n\fGrand Total\n25.00\n")}
+	assert fields["total"].val == "25.00"
@@ -1,6 +1,7 @@
 from fastapi.testclient import TestClient
 
 from ai_insight_suite.services.doc_automation.app.main import app
+from ai_insight_suite.services.doc_automation.app.pipelines.extract import extract_fields
 
 
 def test_health():
@@ -10,3 +11,9 @@ def test_health():
 	assert r.json()["status"] == "ok"
 
 
+def test_metrics_exposes_stage_timings():
+	extract_fields("Total 1,250.00 SAR")
+	r = TestClient(app).get("/metrics")
+	assert r.status_code == 200
+	assert 'insight_stage_seconds_count{stage="extract"}' in r.text
+	assert "insight_http_request_seconds_bucket" in r.text
@@ -0,0 +1,30 @@
+import datetime as dt
+
+import pandas as pd
+
+from ai_insight_suite.libs.common.i18n import (
+	format_dates,
+	format_money,
+	format_money_series,
+	format_numbers,
+	parse_arabic_numerals,
+	to_locale_date,
+	to_locale_number,
+)
+
+
+def test_bulk_formatters_match_per_value():
+	amounts = pd.Series([1234.5, 10.0, None, 1234.5], index=[3, 1, 2, 0])
+	out = format_numbers(amounts, "ar")
+	assert out.index.tolist() == [3, 1, 2, 0]
+	assert out.tolist() == [to_locale_number(1234.5, "ar"), to_locale_number(10.0, "ar"), None, out[3]]
+
+	dates = pd.Series([dt.date(2024, 1, 2), dt.date(2024, 3, 4)])
+	assert format_dates(dates, "en").tolist() == [to_locale_date(d, "en") for d in dates]
+
+	money = format_money_series(pd.Series([5.0, 5.0]), pd.Series(["USD", "EUR"]), "en")
+	assert money.tolist() == [format_money(5.0, "USD", "en"), format_money(5.0, "EUR", "en")]
+
+
+def test_parse_arabic_numerals():
+	assert parse_arabic_numerals("المبلغ ١٢٣٫٥ SAR") == "المبلغ 123٫5 SAR"
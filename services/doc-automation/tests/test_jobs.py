@@ -0,0 +1,47 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ai_insight_suite.libs.common.jobs import BoundedExecutor, JobStore, QueueFullError
+from ai_insight_suite.libs.common import storage
+from ai_insight_suite.services.doc_automation.app.main import app
+from ai_insight_suite.services.doc_automation.app.routers import api
+
+
+def _fake_ocr(path, digest, **kwargs):
+	return "Invoice total: 1,250.00 USD\ncontact: billing@example.com", {"pages": 1}
+
+
+def test_extract_job_roundtrip(monkeypatch, tmp_path):
+	monkeypatch.setattr(api, "ocr_document_cached", _fake_ocr)
+	monkeypatch.setattr(storage, "UPLOADS_DIR", tmp_path)
+	monkeypatch.setattr(api, "output_path", lambda stem, ext: tmp_path / f"{stem}.{ext}")
+	client = TestClient(app)
+	r = client.post("/v1/jobs/extract", files={"file": ("inv.png", b"not-an-image", "image/png")})
+	assert r.status_code == 202
+	job_id = r.json()["job_id"]
+
+	for _ in range(100):
+		body = client.get(f"/v1/jobs/{job_id}").json()
+		if body["status"] in ("succeeded", "failed"):
+			break
+		time.sleep(0.05)
+	assert body["status"] == "succeeded"
+	keys = {f["key"] for f in body["result"]["fields"]}
+	assert {"email", "currency", "total"} <= keys
+
+	assert client.get("/v1/jobs/unknown").status_code == 404
+
+
+def test_bounded_executor_rejects_when_full():
+	gate = threading.Event()
+	store = JobStore(BoundedExecutor("t", max_workers=1, max_queue=1), ttl_seconds=0)
+	store.submit(gate.wait)
+	store.submit(gate.wait)
+	with pytest.raises(QueueFullError):
+		store.submit(gate.wait)
+	assert store.executor.stats()["rejected"] == 1
+	gate.set()
+	store.executor.shutdown(wait=True)
@@ -0,0 +1,239 @@
+import pathlib
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from ai_insight_suite.services.doc_automation.app.pipelines import ocr
+
+
+class FakeEngine(ocr.OcrEngine):
+	# "Recognizes" a page from its height: page n is rendered 100 + n pixels tall
+	name = "fake"
+
+	def __init__(self, fail_page=None, delay=0.0):
+		self.fail_page = fail_page
+		self.delay = delay
+		self.done = 0
+		self._lock = threading.Lock()
+
+	def image_to_string(self, image, lang, oem, psm):
+		page = image.shape[0] - 100
+		# later pages finish first when parallel
+		time.sleep(self.delay / page if self.delay else 0)
+		with self._lock:
+			self.done += 1
+		if page == self.fail_page:
+			raise RuntimeError(f"page {page} failed")
+		return f"page {page}"
+
+	def detect_osd(self, image):
+		return None
+
+
+def _page(n: int) -> np.ndarray:
+	return np.full((100 + n, 64), 255, dtype=np.uint8)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+	fake = FakeEngine()
+	monkeypatch.setattr(ocr, "get_engine", lambda name=None: fake)
+	return fake
+
+
+@pytest.fixture
+def thread_pool(monkeypatch):
+	# threads instead of spawned processes, so the fake engine is visible to workers
+	pool = ThreadPoolExecutor(max_workers=2)
+	slots = threading.BoundedSemaphore(2)
+	monkeypatch.setattr(ocr, "_get_pool", lambda: (pool, slots))
+	yield pool
+	pool.shutdown(wait=True)
+
+
+@pytest.fixture
+def fake_pdf(monkeypatch):
+	# a 6 page "PDF": pdfinfo and poppler rendering are faked, page n is 100 + n px tall
+	calls = []
+
+	def convert(path, dpi, first_page, last_page, grayscale):
+		calls.append((first_page, last_page))
+		return [Image.fromarray(_page(n)) for n in range(first_page, last_page + 1)]
+
+	monkeypatch.setattr(ocr, "pdfinfo_from_path", lambda path: {"Pages": 6})
+	monkeypatch.setattr(ocr, "convert_from_path", convert)
+	return calls
+
+
+def test_parallel_results_keep_page_order(engine, thread_pool):
+	engine.delay = 0.05
+	cfg = ocr.OcrConfig(lang="eng", engine="pytesseract")
+	results = ocr._ocr_pages_parallel((_page(n) for n in range(1, 7)), cfg)
+	assert [r["text"] for r in results] == [f"page {n}" for n in range(1, 7)]
+
+
+def test_parallel_pages_in_flight_are_bounded(engine, thread_pool):
+	engine.delay = 0.02
+	produced = []
+
+	def pages():
+		for n in range(1, 9):
+			# pages handed out minus pages OCR'd never exceeds the 2 slots
+			produced.append(n - engine.done)
+			yield _page(n)
+
+	cfg = ocr.OcrConfig(lang="eng", engine="pytesseract")
+	assert len(ocr._ocr_pages_parallel(pages(), cfg)) == 8
+	assert max(produced) <= 2
+
+
+def test_parallel_page_failure_is_raised(engine, thread_pool):
+	engine.fail_page = 3
+	cfg = ocr.OcrConfig(lang="eng", engine="pytesseract")
+	with pytest.raises(RuntimeError, match="page 3 failed"):
+		ocr._ocr_pages_parallel((_page(n) for n in range(1, 6)), cfg)
+
+
+def test_ocr_document_parallel_pdf(engine, thread_pool, fake_pdf):
+	cfg = ocr.OcrConfig(lang="eng", engine="pytesseract", text_layer=False)
+	text, meta = ocr.ocr_document(pathlib.Path("scan.pdf"), parallel=True, config=cfg)
+	assert text.split(ocr.PAGE_SEP) == [f"page {n}" for n in range(1, 7)]
+	assert meta["mode"] == "parallel"
+	assert [p["page"] for p in meta["page_timings"]] == list(range(1, 7))
+
+
+def test_page_windows_split_runs_and_gaps():
+	assert list(ocr._page_windows([], 3)) == []
+	assert list(ocr._page_windows([4], 3)) == [(4, 4)]
+	assert list(ocr._page_windows([1, 2, 3, 4, 5, 6, 7], 3)) == [(1, 3), (4, 6), (7, 7)]
+	assert list(ocr._page_windows([1, 2, 5, 6, 7, 9], 2)) == [(1, 2), (5, 6), (7, 7), (9, 9)]
+	assert list(ocr._page_windows([2, 3, 4], 1)) == [(2, 2), (3, 3), (4, 4)]
+
+
+def test_pdf_page_range_and_limit(fake_pdf):
+	path = pathlib.Path("scan.pdf")
+	assert ocr._pdf_page_numbers(path, max_pages=0) == [1, 2, 3, 4, 5, 6]
+	assert ocr._pdf_page_numbers(path, first_page=2, last_page=10, max_pages=0) == [2, 3, 4, 5, 6]
+	assert ocr._pdf_page_numbers(path, first_page=3, max_pages=2) == [3, 4]
+
+
+def test_iter_pages_renders_window_at_a_time(monkeypatch, fake_pdf):
+	monkeypatch.setattr(ocr.settings, "OCR_PDF_WINDOW", 4)
+	pages = list(ocr.iter_pages(pathlib.Path("scan.pdf"), page_numbers=[1, 2, 3, 4, 5, 6]))
+	assert [p.shape[0] - 100 for p in pages] == [1, 2, 3, 4, 5, 6]
+	assert fake_pdf == [(1, 4), (5, 6)]
+	fake_pdf.clear()
+	list(ocr.iter_pages(pathlib.Path("scan.pdf"), page_numbers=[2, 5, 6]))
+	assert fake_pdf == [(2, 2), (5, 6)]
+
+
+LAYER_PAGE = "Invoice 1042 issued 2024-03-01 to Acme Corporation, total due 1,250.00 EUR"
+
+
+def _pdftotext(monkeypatch, stdout=None, error=None):
+	calls = []
+
+	def run(cmd, **kwargs):
+		calls.append(cmd)
+		if error is not None:
+			raise error
+		return subprocess.CompletedProcess(cmd, 0, stdout=stdout.encode("utf-8"), stderr=b"")
+
+	monkeypatch.setattr(ocr.subprocess, "run", run)
+	return calls
+
+
+def test_usable_text_layer_skips_ocr(monkeypatch, engine, fake_pdf):
+	# pages 1-3 carry text, 4 is garbage from a broken font map, 5-6 are bare scans
+	garbage = "\ufffd" * 40 + " ab12 cd34 ef56 gh78 ij90 kl12 mn34 op56"
+	layer = [LAYER_PAGE] * 3 + [garbage, " ", "12"]
+	calls = _pdftotext(monkeypatch, "\f".join(layer) + "\f")
+	cfg = ocr.OcrConfig(lang="eng", engine="pytesseract")
+	text, meta = ocr.ocr_document(pathlib.Path("scan.pdf"), parallel=False, config=cfg)
+	assert calls[0][:5] == ["pdftotext", "-f", "1", "-l", "6"]
+	assert [p["method"] for p in meta["page_timings"]] == ["text"] * 3 + ["ocr"] * 3
+	assert text.split(ocr.PAGE_SEP) == [LAYER_PAGE] * 3 + ["page 4", "page 5", "page 6"]
+	# only the pages without a usable layer were rendered
+	assert fake_pdf == [(4, 4), (5, 5), (6, 6)]
+
+
+def test_usable_text_thresholds():
+	assert ocr._usable_text(LAYER_PAGE)
+	assert not ocr._usable_text("Page 1 of 2")
+	assert not ocr._usable_text("")
+	assert not ocr._usable_text("\ue000\ue001" * 20 + LAYER_PAGE)
+
+
+@pytest.mark.parametrize("error", [
+	FileNotFoundError("pdftotext"),
+	subprocess.CalledProcessError(1, "pdftotext"),
+	subprocess.TimeoutExpired("pdftotext", 60),
+])
+def test_text_layer_failure_falls_back_to_ocr(monkeypatch, engine, fake_pdf, error):
+	_pdftotext(monkeypatch, error=error)
+	assert ocr._pdf_text_layer(pathlib.Path("scan.pdf"), 1, 6) == []
+	cfg = ocr.OcrConfig(lang="eng", engine="pytesseract")
+	text, meta = ocr.ocr_document(pathlib.Path("scan.pdf"), parallel=False, config=cfg)
+	assert text.split(ocr.PAGE_SEP) == [f"page {n}" for n in range(1, 7)]
+	assert {p["method"] for p in meta["page_timings"]} == {"ocr"}
+
+
+class OsdEngine(FakeEngine):
+	def __init__(self, osd=None):
+		super().__init__()
+		self.osd = osd
+		self.seen = None
+
+	def detect_osd(self, image):
+		self.seen = image.shape
+		return self.osd
+
+
+def _osd(script="Latin", script_conf=5.0, rotate=90, orientation_conf=5.0):
+	return {
+		"script": script,
+		"script_conf": script_conf,
+		"rotate": rotate,
+		"orientation_conf": orientation_conf,
+	}
+
+
+def test_detect_script_without_osd_keeps_dual_model():
+	detected = ocr.detect_script(_page(1), OsdEngine(None))
+	assert detected == {"lang": ocr.FALLBACK_LANG, "script": None, "rotate": 0}
+
+
+def test_detect_script_confidence_threshold(monkeypatch):
+	monkeypatch.setattr(ocr.settings, "OCR_DETECT_MIN_CONF", 1.5)
+	detected = ocr.detect_script(_page(1), OsdEngine(_osd("Arabic")))
+	assert detected == {"lang": "ara", "script": "Arabic", "rotate": 90}
+	# a weak script guess keeps the dual model; a weak orientation is not applied
+	detected = ocr.detect_script(_page(1), OsdEngine(_osd(script_conf=1.0, orientation_conf=0.5)))
+	assert detected == {"lang": ocr.FALLBACK_LANG, "script": "Latin", "rotate": 0}
+	# scripts without a model of their own also fall back
+	detected = ocr.detect_script(_page(1), OsdEngine(_osd("Cyrillic")))
+	assert detected["lang"] == ocr.FALLBACK_LANG
+
+
+def test_detect_script_runs_on_downscaled_copy(monkeypatch):
+	monkeypatch.setattr(ocr.settings, "OCR_DETECT_MAX_SIDE", 512)
+	engine = OsdEngine(_osd())
+	ocr.detect_script(np.full((2048, 1024), 255, dtype=np.uint8), engine)
+	assert engine.seen == (512, 256)
+
+
+def test_auto_engine_falls_back_without_tesserocr(monkeypatch):
+	# a None entry in sys.modules makes "import tesserocr" raise ImportError
+	monkeypatch.setitem(sys.modules, "tesserocr", None)
+	monkeypatch.setattr(ocr, "_engines", {})
+	engine = ocr.get_engine("auto")
+	assert isinstance(engine, ocr.PytesseractEngine)
+	assert ocr.get_engine("auto") is engine
+	with pytest.raises(ImportError):
+		ocr.get_engine("tesserocr")
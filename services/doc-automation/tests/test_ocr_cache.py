@@ -0,0 +1,38 @@
+from ai_insight_suite.libs.common.cache import ResultCache
+from ai_insight_suite.services.doc_automation.app.pipelines.ocr import OcrConfig, ocr_cache_key
+
+
+def test_cache_hit_miss_counters(tmp_path):
+	cache = ResultCache("t", max_bytes=1_000_000, max_entries=10, directory=tmp_path)
+	assert cache.get("a") is None
+	cache.put("a", {"text": "hello", "meta": {"pages": 1}})
+	assert cache.get("a") == {"text": "hello", "meta": {"pages": 1}}
+	stats = cache.stats()
+	assert stats["hits"] == 1
+	assert stats["misses"] == 1
+	assert stats["entries"] == 1
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+	cache = ResultCache("t", max_bytes=1_000_000, max_entries=2, directory=tmp_path)
+	cache.put("a", 1)
+	cache.put("b", 2)
+	cache.get("a")
+	cache.put("c", 3)
+	assert cache.get("b") is None
+	assert cache.get("a") == 1
+	assert cache.get("c") == 3
+
+	small = ResultCache("s", max_bytes=20, max_entries=100, directory=tmp_path)
+	small.put("x", "0123456789")
+	small.put("y", "0123456789")
+	assert small.get("x") is None
+	assert small.stats()["bytes"] <= 20
+
+
+def test_cache_key_depends_on_config():
+	base = ocr_cache_key("abc", OcrConfig())
+	assert base == ocr_cache_key("abc", OcrConfig())
+	assert base != ocr_cache_key("abc", OcrConfig(psm=4))
+	assert base != ocr_cache_key("abc", OcrConfig(), first_page=2)
+	assert base != ocr_cache_key("abd", OcrConfig())
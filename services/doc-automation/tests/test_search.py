@@ -0,0 +1,38 @@
+from fastapi.testclient import TestClient
+
+from ai_insight_suite.services.doc_automation.app.main import app
+from ai_insight_suite.services.doc_automation.app.pipelines.extract import Field
+from ai_insight_suite.services.doc_automation.app.search import SearchIndex, normalize
+
+
+def test_normalize_arabic_and_digits():
+	assert normalize("الإجمَاليّ ١٢٣") == normalize("الاجمالي 123")
+	assert normalize("فاتورة") == normalize("فاتوره")
+
+
+def test_index_ranks_pages_and_fields(tmp_path):
+	index = SearchIndex(tmp_path / "pages.sqlite3")
+	index.add("r1", "a.pdf", "Cover page\fBill to: Nour Trading\nالإجمالي ٥٠٠", [])
+	index.add("r2", "b.pdf", "Nothing here", [Field(key="vendor", val="Nour Trading", confidence=1)])
+	index.add("r3", "c.pdf", "unrelated", [])
+
+	hits = index.search("nour trading")
+	assert {(h["run_id"], h["page"]) for h in hits} == {("r1", 2), ("r2", 1)}
+	assert index.search("الاجمالي 500")[0]["page"] == 2
+	assert index.search("trad")  # prefix on the last word
+	assert index.search('"OR ( NEAR') == []
+
+	# re-adding a run replaces its pages
+	index.add("r1", "a.pdf", "gone", [])
+	assert [h["run_id"] for h in index.search("nour")] == ["r2"]
+	assert index.stats() == {"pages": 3, "documents": 3}
+
+
+def test_search_endpoint_indexes_extractions():
+	from ai_insight_suite.services.doc_automation.app.routers import api
+
+	client = TestClient(app)
+	assert api._persist("inv.pdf", "page one\fAcme Holdings total 10", [], None, {}) is not None
+	body = client.get("/v1/search", params={"q": "acme", "limit": 1}).json()
+	assert body["hits"][0]["page"] == 2
+	assert body["next_offset"] is None
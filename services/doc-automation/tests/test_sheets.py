@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+from ai_insight_suite.libs.common import sheets
+from ai_insight_suite.libs.common.sheets import FakeSheetsClient, FakeWorksheet, SheetsWriter
+
+
+@pytest.fixture
+def fake_client():
+	client = FakeSheetsClient()
+	sheets.set_client(client)
+	yield client
+	sheets.set_client(None)
+
+
+def test_upsert_is_one_batched_update(fake_client):
+	ws = FakeWorksheet("Sheet1", [["id", "vendor", "total"], ["a1", "acme", "10"]])
+	fake_client.open_by_key("s").worksheets["Sheet1"] = ws
+
+	sheets.upsert_by_key("s", "Sheet1", "id", "a1", {"vendor": "acme", "total": "12", "vat": "2"})
+	assert ws.rows == [["id", "vendor", "total", "vat"], ["a1", "acme", "12", "2"]]
+	assert ws.calls == ["row_values", "col_values", "batch_update"]
+
+	# headers are cached; the key column is read again for every upsert
+	ws.calls.clear()
+	sheets.upsert_by_key("s", "Sheet1", "id", "a1", {"total": "13"})
+	sheets.upsert_by_key("s", "Sheet1", "id", "b2", {"vendor": "beta"})
+	sheets.upsert_by_key("s", "Sheet1", "id", "b2", {"total": "5"})
+	assert ws.calls == [
+		"col_values", "batch_update", "col_values", "append_rows", "col_values", "batch_update"
+	]
+	assert ws.rows[2] == ["b2", "beta", "5", ""]
+
+
+def test_upsert_sees_rows_written_elsewhere(fake_client):
+	ws = FakeWorksheet("Sheet1", [["id", "total"], ["a1", "10"]])
+	fake_client.open_by_key("s").worksheets["Sheet1"] = ws
+	sheets.upsert_by_key("s", "Sheet1", "id", "a1", {"total": "11"})
+	# another worker appends b2 and deletes a1 behind this process's back
+	ws.rows = [["id", "total"], ["b2", "1"]]
+	sheets.upsert_by_key("s", "Sheet1", "id", "b2", {"total": "2"})
+	sheets.upsert_by_key("s", "Sheet1", "id", "a1", {"total": "12"})
+	assert ws.rows == [["id", "total"], ["b2", "2"], ["a1", "12"]]
+
+
+def test_writer_coalesces_appends():
+	calls = []
+	lock = threading.Lock()
+
+	def append(sheet_id, worksheet, rows):
+		with lock:
+			calls.append((sheet_id, worksheet, len(rows)))
+		return True
+
+	writer = SheetsWriter(flush_seconds=60, batch_rows=1000, max_queue=1000, append=append)
+	for i in range(50):
+		assert writer.enqueue("s", "Sheet1" if i % 2 else "Other", [i])
+	assert writer.flush(timeout=5)
+	writer.close()
+	assert sorted(calls) == [("s", "Other", 25), ("s", "Sheet1", 25)]
+	assert writer.stats()["written"] == 50
+
+
+def test_retry_backs_off_on_quota_errors(monkeypatch):
+	class Quota(sheets.gspread.exceptions.APIError):
+		def __init__(self):
+			self.code = 429
+
+	monkeypatch.setattr(sheets.time, "sleep", lambda _: None)
+	attempts = []
+
+	def flaky():
+		attempts.append(1)
+		if len(attempts) < 3:
+			raise Quota()
+		return "ok"
+
+	assert sheets._with_retry(flaky) == "ok"
+	assert len(attempts) == 3
+
+
+def test_appends_are_only_retried_on_quota_errors(monkeypatch):
+	class ApiError(sheets.gspread.exceptions.APIError):
+		def __init__(self, code):
+			self.code = code
+
+	monkeypatch.setattr(sheets.time, "sleep", lambda _: None)
+	attempts = []
+
+	def append(error):
+		attempts.append(1)
+		if len(attempts) < 2:
+			raise error
+		return "ok"
+
+	assert sheets._with_retry(append, ApiError(429), idempotent=False) == "ok"
+	for error in (ApiError(503), TimeoutError()):
+		attempts.clear()
+		# the append may have landed before the error: retrying could duplicate rows
+		with pytest.raises(type(error)):
+			sheets._with_retry(append, error, idempotent=False)
+		assert len(attempts) == 1
+	attempts.clear()
+	assert sheets._with_retry(append, ApiError(503)) == "ok"
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from ai_insight_suite.services.doc_automation.app import store
+from ai_insight_suite.services.doc_automation.app.main import app
+from ai_insight_suite.services.doc_automation.app.pipelines.extract import Field
+
+
+def _fields(vendor: str):
+	return [
+		Field(key="vendor", val=vendor, confidence=0.9, source_page=1),
+		Field(key="total", val="10.00", confidence=0.8, source_page=2),
+	]
+
+
+def test_runs_filter_and_paginate():
+	for i in range(5):
+		store.save_run(f"inv-{i}.pdf", "text", _fields("acme" if i % 2 == 0 else "other"))
+	client = TestClient(app)
+
+	r = client.get("/v1/runs", params={"key": "vendor", "val": "acme", "limit": 2})
+	body = r.json()
+	assert r.status_code == 200
+	assert [i["file_name"] for i in body["items"]] == ["inv-4.pdf", "inv-2.pdf"]
+	assert body["items"][0]["fields"][1] == {
+		"key": "total",
+		"val": "10.00",
+		"confidence": 0.8,
+		"source_page": 2,
+	}
+	page2 = client.get(
+		"/v1/runs", params={"key": "vendor", "val": "acme", "limit": 2, "cursor": body["next_cursor"]}
+	).json()
+	assert [i["file_name"] for i in page2["items"]] == ["inv-0.pdf"]
+	assert page2["next_cursor"] is None
+
+	future = (datetime.utcnow() + timedelta(days=1)).isoformat()
+	assert client.get("/v1/runs", params={"since": future}).json()["items"] == []
+	assert client.get("/v1/runs", params={"val": "acme"}).status_code == 422
+	assert client.get("/v1/runs", params={"cursor": "bogus"}).status_code == 422
+
+	run_id = body["items"][0]["id"]
+	detail = client.get(f"/v1/runs/{run_id}").json()
+	assert detail["text"] == "text" and len(detail["fields"]) == 2
+	assert client.get("/v1/runs/missing").status_code == 404
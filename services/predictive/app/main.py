@@ -4,12 +4,17 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from ai_insight_suite.libs.common.logging import RequestIdMiddleware, configure_logging
+from ai_insight_suite.libs.common.metrics import metrics_response
+from ai_insight_suite.libs.common.storage import RequestSizeLimitMiddleware
+from .pipelines.churn_registry import churn_registry
+from .pipelines.forecast import shutdown_pool
 from .routers import api
 
 
 configure_logging()
 app = FastAPI(title="AI Insight Suite - Predictive", version="0.1.0")
 
+app.add_middleware(RequestSizeLimitMiddleware)
 app.add_middleware(RequestIdMiddleware)
 app.add_middleware(
 	CORSMiddleware,
@@ -19,11 +24,29 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+def _warm_models() -> None:
+	# deserialize trained churn models once, not on the first request
+	churn_registry.warm()
+
+
+@app.on_event("shutdown")
+def _shutdown_workers() -> None:
+	api.executor.shutdown()
+	shutdown_pool()
+
+
 @app.get("/healthz")
 async def healthz():
 	return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+	# Prometheus text format; stage and request timings of this process
+	return metrics_response()
+
+
 app.include_router(api.router, prefix="/v1")
 
 
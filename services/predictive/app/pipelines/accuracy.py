@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+import numpy as np
+
+
+def mape(actual: np.ndarray, pred: np.ndarray) -> Optional[float]:
+	# Percent; periods where the actual is zero are left out
+	mask = actual != 0
+	if not mask.any():
+		return None
+	return float(np.mean(np.abs((actual[mask] - pred[mask]) / actual[mask])) * 100)
+
+
+def smape(actual: np.ndarray, pred: np.ndarray) -> Optional[float]:
+	denom = np.abs(actual) + np.abs(pred)
+	mask = denom != 0
+	if not mask.any():
+		return None
+	return float(np.mean(2 * np.abs(actual[mask] - pred[mask]) / denom[mask]) * 100)
+
+
+def mase(actual: np.ndarray, pred: np.ndarray, train: np.ndarray, m: int) -> Optional[float]:
+	# Scaled by the in-sample MAE of the seasonal naive forecast (naive when too short)
+	lag = m if m > 1 and len(train) > m else 1
+	if len(train) <= lag:
+		return None
+	scale = float(np.mean(np.abs(train[lag:] - train[:-lag])))
+	if scale == 0:
+		return None
+	return float(np.mean(np.abs(actual - pred)) / scale)
+
+
+def score(
+	actual: np.ndarray, pred: np.ndarray, train: np.ndarray, m: int
+) -> Dict[str, Optional[float]]:
+	return {
+		"mape": mape(actual, pred),
+		"smape": smape(actual, pred),
+		"mase": mase(actual, pred, train, m),
+	}
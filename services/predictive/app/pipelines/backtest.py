@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ai_insight_suite.libs.common.config import settings
+from .accuracy import score
+from .baselines import BASELINES
+from .forecast import (
+	_fit_sarimax,
+	_seasonal_period,
+	_time_limit,
+	regular_series,
+	run_series_chunks,
+	select_model,
+	series_timeout,
+	split_series,
+)
+
+BACKTEST_MODELS = ("auto", "sarimax", *BASELINES)
+
+
+def origins(n: int, horizon: int, folds: int, step: int, min_train: int) -> List[int]:
+	# Training lengths of each fold, oldest first; the last fold ends at the last point
+	out = [n - horizon - step * (folds - 1 - i) for i in range(folds)]
+	return [o for o in out if o >= min_train]
+
+
+def _mean(values: List[Optional[float]]) -> Optional[float]:
+	vals = [v for v in values if v is not None]
+	return round(float(np.mean(vals)), 4) if vals else None
+
+
+def backtest_model(
+	y: pd.Series, model: str, horizon: int, freq: str, cuts: Sequence[int]
+) -> Dict[str, Any]:
+	# SARIMAX is fitted once, at the first origin; later folds append the observations since
+	# the previous origin with the same parameters (Kalman filtering, no refit). Baselines
+	# are cheap enough to refit per fold.
+	m = _seasonal_period(freq)
+	values = y.to_numpy(dtype=float)
+	name = model
+	if model == "auto":
+		name = select_model(values[: cuts[0]], m, horizon)[0]
+	folds: List[Dict[str, Any]] = []
+	res = None
+	for i, cut in enumerate(cuts):
+		start = time.perf_counter()
+		if name == "sarimax":
+			if res is None:
+				res = _fit_sarimax(y.iloc[:cut], (1, 1, 1), (1, 1, 1, m))
+			else:
+				res = res.append(y.iloc[cuts[i - 1] : cut], refit=False)
+			pred = np.asarray(res.forecast(horizon), dtype=float)
+		else:
+			pred = BASELINES[name](values[:cut], m, horizon).mean
+		ms = (time.perf_counter() - start) * 1000.0
+		actual = values[cut : cut + horizon]
+		metrics = score(actual, pred[: len(actual)], values[:cut], m)
+		folds.append({
+			"origin": y.index[cut - 1].isoformat(),
+			**{k: (round(v, 4) if v is not None else None) for k, v in metrics.items()},
+			"ms": round(ms, 2),
+		})
+	return {
+		"model": name,
+		"requested": model,
+		"folds": folds,
+		**{k: _mean([f[k] for f in folds]) for k in ("mape", "smape", "mase")},
+		"ms": round(sum(f["ms"] for f in folds), 2),
+	}
+
+
+def _backtest_chunk(
+	items: Sequence[Tuple[str, np.ndarray, np.ndarray]],
+	models: Sequence[str],
+	horizon: int,
+	freq: str,
+	folds: int,
+	step: int,
+	timeout: float,
+) -> List[Dict[str, Any]]:
+	# Pool task: every requested model for each series in the chunk, errors kept per model
+	out: List[Dict[str, Any]] = []
+	for sid, ds, y in items:
+		start = time.perf_counter()
+		try:
+			series = regular_series(ds, y, freq)
+			cuts = origins(len(series), horizon, folds, step, min_train=max(4, horizon))
+			if not cuts:
+				raise ValueError(f"series too short for {folds} folds of horizon {horizon}")
+			runs = []
+			for model in models:
+				try:
+					with _time_limit(timeout):
+						runs.append(backtest_model(series, model, horizon, freq, cuts))
+				except Exception as e:  # noqa: BLE001
+					runs.append({"requested": model, "error": f"{type(e).__name__}: {e}"})
+			out.append({"series_id": sid, "ok": True, "models": runs})
+		except Exception as e:  # noqa: BLE001
+			out.append({"series_id": sid, "ok": False, "error": f"{type(e).__name__}: {e}"})
+		out[-1]["ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+	return out
+
+
+def backtest_dataframe(
+	df: pd.DataFrame,
+	models: Sequence[str] = ("auto",),
+	horizon: int = 8,
+	freq: str = "W",
+	folds: int = 3,
+	step: Optional[int] = None,
+	series_cols: Sequence[str] = (),
+	timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+	# Rolling-origin evaluation: each fold trains on everything before its origin and
+	# scores the next `horizon` points. Series (with all their models) run in parallel on
+	# the forecast process pool.
+	unknown = [m for m in models if m not in BACKTEST_MODELS]
+	if unknown:
+		raise ValueError(f"unknown model(s) {', '.join(unknown)}; expected {', '.join(BACKTEST_MODELS)}")
+	if folds < 1 or horizon < 1:
+		raise ValueError("folds and horizon must be positive")
+	started = time.perf_counter()
+	if series_cols:
+		items = split_series(df, series_cols)
+	else:
+		work = df.assign(_series="all")
+		items = split_series(work, ["_series"])
+	if len(items) > settings.FORECAST_MAX_SERIES:
+		raise ValueError(f"too many series ({len(items)} > {settings.FORECAST_MAX_SERIES})")
+	timeout = series_timeout(timeout)
+	results, workers = run_series_chunks(
+		_backtest_chunk, items, list(models), horizon, freq, folds, step or horizon, timeout
+	)
+
+	# best model per series by mean MASE (scale-free, so comparable across series)
+	wins: Dict[str, int] = {}
+	for r in results:
+		scored = [run for run in r.get("models", []) if run.get("mase") is not None]
+		if scored:
+			best = min(scored, key=lambda run: run["mase"])
+			r["best"] = best["requested"]
+			wins[best["requested"]] = wins.get(best["requested"], 0) + 1
+	ok = sum(1 for r in results if r["ok"])
+	return {
+		"series": results,
+		"summary": {
+			"series": len(results),
+			"ok": ok,
+			"failed": len(results) - ok,
+			"wins": wins,
+			"workers": workers,
+			"wall_ms": round((time.perf_counter() - started) * 1000.0, 1),
+		},
+	}
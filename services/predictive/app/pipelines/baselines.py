@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict
+
+# Plain NumPy forecasters. Each fits in milliseconds: smoothing parameters are chosen by
+# evaluating a whole grid at once (one vectorised recursion over time, all candidate
+# parameter sets side by side) instead of running an optimiser per series.
+
+Z_80 = 1.2815515655446004  # two-sided 80% interval, same width as SARIMAX conf_int(alpha=0.2)
+ALPHAS = np.linspace(0.05, 0.95, 19)
+HW_ALPHAS = np.array([0.05, 0.1, 0.2, 0.35, 0.5, 0.7, 0.9])
+HW_BETAS = np.array([0.01, 0.05, 0.1, 0.2])
+HW_GAMMAS = np.array([0.01, 0.05, 0.1, 0.2, 0.4])
+SEASONAL_ACF = 0.3  # lag-m autocorrelation above which a series is treated as seasonal
+
+
+class BaselineForecast(BaseModel):
+	model_config = ConfigDict(arbitrary_types_allowed=True)
+
+	model: str
+	mean: np.ndarray
+	lower: np.ndarray
+	upper: np.ndarray
+	params: Dict[str, Any] = {}
+
+
+def _interval(
+	model: str, mean: np.ndarray, se: np.ndarray, params: Dict[str, Any]
+) -> BaselineForecast:
+	return BaselineForecast(
+		model=model, mean=mean, lower=mean - Z_80 * se, upper=mean + Z_80 * se, params=params
+	)
+
+
+def _sigma(errors: np.ndarray) -> float:
+	errors = errors[np.isfinite(errors)]
+	return float(np.sqrt(np.mean(errors**2))) if errors.size else 0.0
+
+
+def seasonal_naive(y: np.ndarray, m: int, h: int) -> BaselineForecast:
+	# Repeats the last full season (the last value when m <= 1 or the history is shorter)
+	n = len(y)
+	if m <= 1 or n < m:
+		errors = np.diff(y)
+		mean = np.full(h, y[-1], dtype=float)
+		se = _sigma(errors) * np.sqrt(np.arange(1, h + 1))
+		return _interval("naive", mean, se, {})
+	errors = y[m:] - y[:-m]
+	steps = np.arange(h)
+	mean = y[n - m + steps % m].astype(float)
+	se = _sigma(errors) * np.sqrt(steps // m + 1)
+	return _interval("seasonal_naive", mean, se, {"m": m})
+
+
+def _ses_grid(y: np.ndarray, alphas: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+	# Returns final levels and one-step SSE for every alpha
+	level = np.full(alphas.shape, y[0], dtype=float)
+	sse = np.zeros(alphas.shape)
+	for t in range(1, len(y)):
+		err = y[t] - level
+		sse += err**2
+		level += alphas * err
+	return level, sse
+
+
+def ses(y: np.ndarray, h: int) -> BaselineForecast:
+	level, sse = _ses_grid(y, ALPHAS)
+	best = int(np.argmin(sse))
+	alpha = float(ALPHAS[best])
+	sigma = float(np.sqrt(sse[best] / max(1, len(y) - 1)))
+	steps = np.arange(h)
+	se = sigma * np.sqrt(1 + steps * alpha**2)
+	return _interval("ses", np.full(h, level[best]), se, {"alpha": round(alpha, 3)})
+
+
+def holt_winters(y: np.ndarray, m: int, h: int) -> BaselineForecast:
+	# Additive trend and seasonality, grid search over (alpha, beta, gamma); needs 2 seasons
+	n = len(y)
+	if m <= 1 or n < 2 * m:
+		raise ValueError(f"holt_winters needs at least {2 * max(m, 2)} observations")
+	a, b, g = (x.ravel() for x in np.meshgrid(HW_ALPHAS, HW_BETAS, HW_GAMMAS, indexing="ij"))
+	k = a.size
+	first, second = y[:m].mean(), y[m : 2 * m].mean()
+	level = np.full(k, first, dtype=float)
+	trend = np.full(k, (second - first) / m, dtype=float)
+	season = np.tile((y[:m] - first).astype(float), (k, 1))  # k x m
+	sse = np.zeros(k)
+	for t in range(m, n):
+		s = season[:, t % m]
+		err = y[t] - (level + trend + s)
+		sse += err**2
+		new_level = level + trend + a * err
+		trend = trend + a * b * err
+		season[:, t % m] = s + g * (1 - a) * err
+		level = new_level
+	best = int(np.argmin(sse))
+	steps = np.arange(1, h + 1)
+	idx = (n + steps - 1) % m
+	mean = level[best] + steps * trend[best] + season[best, idx]
+	sigma = float(np.sqrt(sse[best] / max(1, n - m)))
+	# approximate: interval grows like a random walk rather than the exact HW variance
+	se = sigma * np.sqrt(steps)
+	params = {"alpha": float(a[best]), "beta": float(b[best]), "gamma": float(g[best]), "m": m}
+	return _interval("holt_winters", mean, se, params)
+
+
+def _seasonal_indices(y: np.ndarray, m: int) -> Optional[np.ndarray]:
+	# Classical multiplicative decomposition indices, or None when it does not apply
+	n = len(y)
+	if m <= 1 or n < 2 * m or np.any(y <= 0):
+		return None
+	kernel = np.ones(m) / m
+	if m % 2 == 0:
+		kernel = np.convolve(kernel, [0.5, 0.5])
+	trend = np.convolve(y, kernel, mode="valid")
+	offset = (len(kernel) - 1) // 2
+	ratios = y[offset : offset + len(trend)] / trend
+	positions = (np.arange(len(ratios)) + offset) % m
+	idx = np.array([ratios[positions == p].mean() for p in range(m)])
+	return idx / idx.mean()
+
+
+def theta(y: np.ndarray, m: int, h: int) -> BaselineForecast:
+	# Theta method (SES with drift equal to half the linear trend slope), applied to the
+	# seasonally adjusted series when a multiplicative season is present
+	n = len(y)
+	idx = _seasonal_indices(y, m) if seasonal_strength(y, m) >= SEASONAL_ACF else None
+	adj = y / idx[np.arange(n) % m] if idx is not None else y.astype(float)
+	level, sse = _ses_grid(adj, ALPHAS)
+	best = int(np.argmin(sse))
+	alpha = float(ALPHAS[best])
+	slope = float(np.polyfit(np.arange(n), adj, 1)[0]) if n > 1 else 0.0
+	steps = np.arange(1, h + 1)
+	drift = 0.5 * slope * (steps - 1 + 1 / alpha - (1 - alpha) ** n / alpha)
+	mean = level[best] + drift
+	if idx is not None:
+		mean = mean * idx[(n + steps - 1) % m]
+	sigma = float(np.sqrt(sse[best] / max(1, n - 1)))
+	se = sigma * np.sqrt(1 + (steps - 1) * alpha**2)
+	params = {"alpha": round(alpha, 3), "seasonal": idx is not None}
+	return _interval("theta", mean, se, params)
+
+
+def seasonal_strength(y: np.ndarray, m: int) -> float:
+	# Autocorrelation at the seasonal lag of the first differences (trend removed)
+	if m <= 1 or len(y) < 2 * m + 1:
+		return 0.0
+	d = np.diff(y.astype(float))
+	d = d - d.mean()
+	denom = float(np.dot(d, d))
+	return float(np.dot(d[m:], d[:-m]) / denom) if denom > 0 else 0.0
+
+
+BASELINES: Dict[str, Callable[[np.ndarray, int, int], BaselineForecast]] = {
+	"naive": lambda y, m, h: seasonal_naive(y, 1, h),
+	"seasonal_naive": seasonal_naive,
+	"ses": lambda y, m, h: ses(y, h),
+	"holt_winters": holt_winters,
+	"theta": theta,
+}
@@ -1,34 +1,123 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional
 
 import numpy as np
 import pandas as pd
 
+from ai_insight_suite.libs.common.metrics import span, timed
+from .ingest import Source, iter_transactions, transaction_columns
 
-def score_churn(df: pd.DataFrame) -> List[Dict[str, Any]]:
+
+# Per-customer partial aggregates: mergeable by min/max/sum, so history can be folded in
+# chunk by chunk or day by day and scored without going back to the transactions
+AGG_COLS = ("first_date", "last_date", "frequency", "monetary")
+MERGE_EVERY = 8  # chunk aggregates held before they are merged into one frame
+
+
+def aggregate(df: pd.DataFrame) -> pd.DataFrame:
+	# One row per customer; built-in reductions only, no Python callback per group
+	_, date_col, amount_col = transaction_columns(df.columns)
+	dates = pd.to_datetime(df[date_col])
+	return (
+		pd.DataFrame({
+			"customer_id": df["customer_id"].to_numpy(),
+			"date": dates.to_numpy(),
+			"amount": pd.to_numeric(df[amount_col]).to_numpy(),
+		})
+		.groupby("customer_id")
+		.agg(
+			first_date=("date", "min"),
+			last_date=("date", "max"),
+			frequency=("date", "count"),
+			monetary=("amount", "sum"),
+		)
+		.reset_index()
+	)
+
+
+def merge_aggregates(parts: List[pd.DataFrame]) -> pd.DataFrame:
+	parts = [p for p in parts if len(p)]
+	if not parts:
+		return pd.DataFrame({"customer_id": [], **{c: [] for c in AGG_COLS}})
+	if len({p["customer_id"].dtype for p in parts}) > 1:
+		# e.g. numeric ids in one chunk and "A-17" in another: compare them as text
+		parts = [p.assign(customer_id=p["customer_id"].astype(str)) for p in parts]
+	if len(parts) == 1:
+		return parts[0]
+	return (
+		pd.concat(parts, ignore_index=True)
+		.groupby("customer_id")
+		.agg(
+			first_date=("first_date", "min"),
+			last_date=("last_date", "max"),
+			frequency=("frequency", "sum"),
+			monetary=("monetary", "sum"),
+		)
+		.reset_index()
+	)
+
+
+def merge_chunks(parts: Iterable[pd.DataFrame]) -> pd.DataFrame:
+	# Merges a stream of per-customer aggregates, MERGE_EVERY at a time
+	merged: List[pd.DataFrame] = []
+	pending: List[pd.DataFrame] = []
+	for part in parts:
+		pending.append(part)
+		if len(pending) >= MERGE_EVERY:
+			merged = [merge_aggregates(merged + pending)]
+			pending = []
+	return merge_aggregates(merged + pending)
+
+
+@timed("churn.aggregate")
+def aggregate_file(source: Source, fmt: str, batch_rows: Optional[int] = None) -> pd.DataFrame:
+	# Streams the upload in batches of rows, reading only the three needed columns, so
+	# memory is bounded by the number of customers rather than the number of transactions
+	return merge_chunks(aggregate(b) for b in iter_transactions(source, fmt, batch_rows))
+
+
+def score_aggregates(
+	agg: pd.DataFrame, ref_date: Optional[pd.Timestamp] = None
+) -> List[Dict[str, Any]]:
+	records: List[Dict[str, Any]] = score_frame(agg, ref_date).to_dict(orient="records")
+	return records
+
+
+@timed("churn.score")
+def score_frame(agg: pd.DataFrame, ref_date: Optional[pd.Timestamp] = None) -> pd.DataFrame:
 	# Simple RFM-based heuristic scorer for demo purposes
-	if "customer_id" not in df.columns:
-		raise ValueError("customer_id column required for churn scoring")
-	date_col = next((c for c in df.columns if c.lower() in ("date", "txn_date")), None)
-	amount_col = next((c for c in df.columns if c.lower() in ("amount", "revenue", "value")), None)
-	if not date_col or not amount_col:
-		raise ValueError("need date and amount columns")
-	data = df.copy()
-	data[date_col] = pd.to_datetime(data[date_col])
-	ref_date = data[date_col].max() + pd.Timedelta(days=1)
-	grp = data.groupby("customer_id").agg(
-		recency=(date_col, lambda s: (ref_date - s.max()).days),
-		frequency=(date_col, "count"),
-		monetary=(amount_col, "sum"),
-	).reset_index()
-
-	# Normalize
-	for col in ("recency", "frequency", "monetary"):
-		grp[col] = (grp[col] - grp[col].min()) / (grp[col].max() - grp[col].min() + 1e-6)
+	if agg.empty:
+		return churn_frame(np.array([], dtype=object), np.array([], dtype=float))
+	if ref_date is None:
+		ref_date = agg["last_date"].max() + pd.Timedelta(days=1)
+	recency = (ref_date - agg["last_date"]).dt.days.to_numpy(dtype=float)
+	frequency = agg["frequency"].to_numpy(dtype=float)
+	monetary = agg["monetary"].to_numpy(dtype=float)
+
+	def norm(x: np.ndarray) -> np.ndarray:
+		return np.asarray((x - x.min()) / (x.max() - x.min() + 1e-6), dtype=float)
+
 	# Higher recency means more days since last purchase → higher churn risk
-	grp["churn_score"] = (grp["recency"] * 0.5) + ((1 - grp["frequency"]) * 0.25) + ((1 - grp["monetary"]) * 0.25)
-	grp["bucket"] = pd.cut(grp["churn_score"], bins=[-0.01, 0.33, 0.66, 1.0], labels=["low", "medium", "high"]).astype(str)
-	return grp[["customer_id", "churn_score", "bucket"]].to_dict(orient="records")
+	score = norm(recency) * 0.5 + (1 - norm(frequency)) * 0.25 + (1 - norm(monetary)) * 0.25
+	return churn_frame(agg["customer_id"].to_numpy(), score)
 
 
+def churn_frame(customer_ids: np.ndarray, score: np.ndarray) -> pd.DataFrame:
+	bucket = pd.cut(score, bins=[-0.01, 0.33, 0.66, 1.0], labels=["low", "medium", "high"])
+	return pd.DataFrame({
+		"customer_id": customer_ids,
+		"churn_score": score,
+		"bucket": np.asarray(bucket).astype(str),
+	})
+
+
+def churn_records(customer_ids: np.ndarray, score: np.ndarray) -> List[Dict[str, Any]]:
+	records: List[Dict[str, Any]] = churn_frame(customer_ids, score).to_dict(orient="records")
+	return records
+
+
+def score_churn(df: pd.DataFrame) -> List[Dict[str, Any]]:
+	with span("churn.aggregate"):
+		agg = aggregate(df)
+	return score_aggregates(agg)
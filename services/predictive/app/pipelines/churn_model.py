@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.libs.common.logging import get_logger
+from ai_insight_suite.libs.common.metrics import span
+from .churn import aggregate, churn_frame, merge_chunks
+from .churn_registry import ChurnModel, LoadedModel, churn_registry
+from .ingest import (
+	Source,
+	detect_format,
+	iter_frames,
+	iter_transactions,
+	read_header,
+	rewind,
+	transaction_columns,
+)
+
+
+log = get_logger("pred.churn_model")
+ALGORITHMS = ("auto", "xgboost", "lightgbm", "sklearn")
+FEATURES = ("recency_days", "tenure_days", "frequency", "monetary", "avg_value", "monthly_rate")
+TEST_SHARE = 0.2
+
+
+def features(agg: pd.DataFrame, ref_date: Optional[pd.Timestamp] = None) -> np.ndarray:
+	# RFM aggregates (churn.AGG_COLS) as a float32 matrix with FEATURES as columns
+	if ref_date is None:
+		ref_date = agg["last_date"].max() + pd.Timedelta(days=1)
+	day = np.timedelta64(1, "D")
+	ref = np.datetime64(ref_date, "ns")
+	recency = (ref - agg["last_date"].to_numpy(dtype="datetime64[ns]")) / day
+	tenure = (ref - agg["first_date"].to_numpy(dtype="datetime64[ns]")) / day
+	frequency = agg["frequency"].to_numpy(dtype=float)
+	monetary = agg["monetary"].to_numpy(dtype=float)
+	return np.column_stack([
+		recency,
+		tenure,
+		frequency,
+		monetary,
+		monetary / np.maximum(frequency, 1),
+		frequency / np.maximum(tenure, 1) * 30,
+	]).astype(np.float32)
+
+
+def _split_at(
+	chunks: Iterable[pd.DataFrame], cutoff: pd.Timestamp, label_days: int
+) -> Tuple[pd.DataFrame, np.ndarray]:
+	# History aggregates up to cutoff and the ids of customers who bought in the label
+	# window (cutoff, cutoff + label_days]; later purchases are ignored
+	active: List[np.ndarray] = []
+	window_end = cutoff + pd.Timedelta(days=label_days)
+
+	def split() -> Iterable[pd.DataFrame]:
+		for chunk in chunks:
+			_, date_col, _ = transaction_columns(chunk.columns)
+			dates = pd.to_datetime(chunk[date_col])
+			after = (dates > cutoff).to_numpy()
+			in_window = after & (dates <= window_end).to_numpy()
+			active.append(chunk["customer_id"].to_numpy()[in_window])
+			yield aggregate(chunk[~after])
+
+	history = merge_chunks(split())
+	return history, np.unique(np.concatenate(active)) if active else np.array([])
+
+
+def labelled(
+	chunks: Iterable[pd.DataFrame], cutoff: pd.Timestamp, label_days: int
+) -> Tuple[pd.DataFrame, np.ndarray]:
+	# A customer seen up to cutoff has churned (1) when they did not buy again within
+	# label_days after it
+	history, active = _split_at(chunks, cutoff, label_days)
+	ids = history["customer_id"].to_numpy()
+	if history["customer_id"].dtype == object:
+		active = active.astype(str)
+	return history, (~np.isin(ids, active)).astype(np.int8)
+
+
+def _estimator(algorithm: str) -> Tuple[str, Any]:
+	# XGBoost, else LightGBM, else scikit-learn's histogram gradient boosting
+	if algorithm not in ALGORITHMS:
+		raise ValueError(f"unknown algorithm {algorithm!r}; expected {', '.join(ALGORITHMS)}")
+	if algorithm in ("auto", "xgboost"):
+		try:
+			from xgboost import XGBClassifier
+
+			return "xgboost", XGBClassifier(
+				n_estimators=300, max_depth=5, learning_rate=0.05, subsample=0.8, tree_method="hist"
+			)
+		except ImportError:
+			if algorithm == "xgboost":
+				raise ValueError("xgboost is not installed")
+	if algorithm in ("auto", "lightgbm"):
+		try:
+			from lightgbm import LGBMClassifier
+
+			return "lightgbm", LGBMClassifier(n_estimators=300, learning_rate=0.05, verbose=-1)
+		except ImportError:
+			if algorithm == "lightgbm":
+				raise ValueError("lightgbm is not installed")
+	from sklearn.ensemble import HistGradientBoostingClassifier
+
+	return "sklearn", HistGradientBoostingClassifier(max_iter=300, learning_rate=0.05)
+
+
+def train(
+	chunks: Iterable[pd.DataFrame],
+	name: str,
+	cutoff: pd.Timestamp,
+	label_days: Optional[int] = None,
+	algorithm: Optional[str] = None,
+) -> ChurnModel:
+	# Features as of cutoff, label = no purchase in the label_days after it. Fitted on 80%
+	# of customers and scored on the rest, then saved as the next version of `name` and
+	# made live in the registry.
+	from sklearn.metrics import log_loss, roc_auc_score
+	from sklearn.model_selection import train_test_split
+
+	label_days = label_days or settings.CHURN_LABEL_DAYS
+	history, y = labelled(chunks, cutoff, label_days)
+	if len(history) < 50 or y.min() == y.max():
+		raise ValueError("need at least 50 customers before the cutoff, churned and retained")
+	X = features(history, cutoff + pd.Timedelta(days=1))
+	X_train, X_test, y_train, y_test = train_test_split(
+		X, y, test_size=TEST_SHARE, random_state=0, stratify=y
+	)
+	algo, model = _estimator(algorithm or settings.CHURN_MODEL_ALGORITHM)
+	start = time.perf_counter()
+	model.fit(X_train, y_train)
+	fit_s = time.perf_counter() - start
+	proba = model.predict_proba(X_test)[:, 1]
+	meta = ChurnModel(
+		name=name,
+		algorithm=algo,
+		features=list(FEATURES),
+		label_days=label_days,
+		cutoff=cutoff,
+		customers=len(history),
+		churn_rate=round(float(y.mean()), 4),
+		metrics={
+			"auc": round(float(roc_auc_score(y_test, proba)), 4),
+			"log_loss": round(float(log_loss(y_test, proba, labels=[0, 1])), 4),
+			"fit_seconds": round(fit_s, 3),
+		},
+	)
+	meta = churn_registry.save(meta, model)
+	log.info("churn_model_trained", name=name, version=meta.version, **meta.metrics)
+	return meta
+
+
+def predict(
+	loaded: LoadedModel, agg: pd.DataFrame, ref_date: Optional[pd.Timestamp] = None
+) -> np.ndarray:
+	# Churn probability per customer, in batches so the feature matrix stays bounded
+	batch = settings.CHURN_SCORE_BATCH
+	out = np.empty(len(agg), dtype=np.float32)
+	if ref_date is None and len(agg):
+		ref_date = agg["last_date"].max() + pd.Timedelta(days=1)
+	for start in range(0, len(agg), batch):
+		part = features(agg.iloc[start : start + batch], ref_date)
+		out[start : start + len(part)] = loaded.estimator.predict_proba(part)[:, 1]
+	return out
+
+
+def score_with_model(
+	name: str, agg: pd.DataFrame, ref_date: Optional[pd.Timestamp] = None
+) -> Tuple[pd.DataFrame, ChurnModel]:
+	loaded = churn_registry.get(name)
+	with span("churn.predict"):
+		proba = predict(loaded, agg, ref_date)
+	return churn_frame(agg["customer_id"].to_numpy(), proba.astype(float)), loaded.meta
+
+
+def _last_date(source: Source, fmt: str) -> pd.Timestamp:
+	# One pass over the date column only
+	date_col = transaction_columns(read_header(source, fmt))[1]
+	last = None
+	for frame in iter_frames(source, fmt, [date_col], dates=[date_col]):
+		top = frame[date_col].max()
+		last = top if last is None or top > last else last
+	rewind(source)
+	if last is None or pd.isna(last):
+		raise ValueError("no transactions")
+	return last
+
+
+def train_file(
+	source: Source,
+	name: str,
+	label_days: Optional[int] = None,
+	algorithm: Optional[str] = None,
+	cutoff: Optional[pd.Timestamp] = None,
+	fmt: str = "csv",
+) -> ChurnModel:
+	# The upload is streamed; without a cutoff (label_days before the last transaction)
+	# it is read twice, the first time for the dates only
+	label_days = label_days or settings.CHURN_LABEL_DAYS
+	if cutoff is None:
+		cutoff = _last_date(source, fmt) - pd.Timedelta(days=label_days)
+	return train(iter_transactions(source, fmt), name, cutoff, label_days, algorithm)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Train a churn model from a transactions file")
+	parser.add_argument("path", help="CSV, Excel, Parquet or Arrow file of transactions")
+	parser.add_argument("--name", default="default")
+	parser.add_argument("--label-days", type=int, default=None)
+	parser.add_argument("--algorithm", choices=ALGORITHMS, default=None)
+	parser.add_argument("--cutoff", default=None, help="default: label-days before the end")
+	args = parser.parse_args()
+	meta = train_file(
+		args.path,
+		args.name,
+		args.label_days,
+		args.algorithm,
+		pd.Timestamp(args.cutoff) if args.cutoff else None,
+		detect_format(args.path),
+	)
+	print(meta.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+	main()
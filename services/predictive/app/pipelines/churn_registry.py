@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from ai_insight_suite.libs.common import storage
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.libs.common.logging import get_logger
+from .rfm_store import DATASET_RE
+
+
+log = get_logger("pred.churn_registry")
+
+
+class ChurnModel(BaseModel):
+	name: str
+	version: int = 0
+	algorithm: str
+	features: List[str]
+	label_days: int
+	cutoff: datetime
+	customers: int
+	churn_rate: float
+	metrics: Dict[str, float] = {}
+	trained_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class LoadedModel(BaseModel):
+	model_config = ConfigDict(arbitrary_types_allowed=True)
+
+	meta: ChurnModel
+	estimator: Any
+
+
+# Versioned artifacts under <root>/<name>/v<version>.{pkl,json}, never overwritten, and an
+# in-process LRU of unpickled estimators so requests do not deserialize on every call.
+# "Latest" is re-resolved only when the model directory changes (its mtime), which also
+# picks up versions trained by other workers or the CLI.
+class ChurnRegistry:
+	def __init__(self, directory: Optional[pathlib.Path] = None, capacity: Optional[int] = None):
+		self.directory = directory
+		self.capacity = capacity or settings.CHURN_REGISTRY_SIZE
+		self._models: "OrderedDict[Tuple[str, int], LoadedModel]" = OrderedDict()
+		self._latest: Dict[str, Tuple[int, int]] = {}  # name -> (dir mtime_ns, version)
+		self._lock = threading.Lock()
+		self.loads = 0
+
+	@property
+	def root(self) -> pathlib.Path:
+		return self.directory or storage.MODELS_DIR / "churn"
+
+	def _dir(self, name: str) -> pathlib.Path:
+		if not DATASET_RE.match(name):
+			raise ValueError("model name must be 1-64 letters, digits, '.', '_' or '-'")
+		return self.root / name
+
+	def versions(self, name: str) -> List[int]:
+		folder = self._dir(name)
+		if not folder.exists():
+			return []
+		return sorted(int(p.stem[1:]) for p in folder.glob("v*.json") if p.stem[1:].isdigit())
+
+	def latest(self, name: str) -> Optional[int]:
+		folder = self._dir(name)
+		try:
+			mtime = folder.stat().st_mtime_ns
+		except FileNotFoundError:
+			return None
+		with self._lock:
+			cached = self._latest.get(name)
+		if cached is not None and cached[0] == mtime:
+			return cached[1]
+		versions = self.versions(name)
+		version = versions[-1] if versions else None
+		if version is not None:
+			with self._lock:
+				self._latest[name] = (mtime, version)
+		return version
+
+	def names(self) -> List[str]:
+		if not self.root.exists():
+			return []
+		return sorted(p.name for p in self.root.iterdir() if p.is_dir() and self.versions(p.name))
+
+	def meta(self, name: str, version: int) -> ChurnModel:
+		path = self._dir(name) / f"v{version}.json"
+		return ChurnModel.model_validate_json(path.read_text())
+
+	def save(self, meta: ChurnModel, estimator: Any) -> ChurnModel:
+		folder = self._dir(meta.name)
+		folder.mkdir(parents=True, exist_ok=True)
+		with self._lock:
+			version = max(self.versions(meta.name), default=0) + 1
+			meta = meta.model_copy(update={"version": version})
+			# the estimator first: a version exists once its json is there
+			for suffix, payload in (
+				(".pkl", pickle.dumps(estimator, protocol=pickle.HIGHEST_PROTOCOL)),
+				(".json", meta.model_dump_json(indent=2).encode("utf-8")),
+			):
+				final = folder / f"v{version}{suffix}"
+				tmp = final.with_name(final.name + f".{os.getpid()}.tmp")
+				tmp.write_bytes(payload)
+				os.replace(tmp, final)
+			self._put((meta.name, version), LoadedModel(meta=meta, estimator=estimator))
+		return meta
+
+	def _put(self, key: Tuple[str, int], loaded: LoadedModel) -> None:
+		self._models[key] = loaded
+		self._models.move_to_end(key)
+		while len(self._models) > self.capacity:
+			self._models.popitem(last=False)
+
+	def get(self, name: str, version: Optional[int] = None) -> LoadedModel:
+		if version is None:
+			version = self.latest(name)
+			if version is None:
+				raise KeyError(f"no churn model named {name!r}")
+		key = (name, version)
+		with self._lock:
+			loaded = self._models.get(key)
+			if loaded is not None:
+				self._models.move_to_end(key)
+				return loaded
+		path = self._dir(name) / f"v{version}.pkl"
+		if not path.exists():
+			raise KeyError(f"no version {version} of churn model {name!r}")
+		with path.open("rb") as fh:
+			estimator = pickle.load(fh)
+		loaded = LoadedModel(meta=self.meta(name, version), estimator=estimator)
+		with self._lock:
+			self.loads += 1
+			self._put(key, loaded)
+		return loaded
+
+	def warm(self) -> List[str]:
+		# Loads the latest version of every model, e.g. at startup
+		warmed = []
+		for name in self.names():
+			try:
+				self.get(name)
+				warmed.append(name)
+			except Exception as e:  # noqa: BLE001
+				log.warning("churn_model_unloadable", name=name, error=str(e))
+		return warmed
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			return {
+				"loaded": [f"{n}:v{v}" for n, v in self._models],
+				"capacity": self.capacity,
+				"loads": self.loads,
+			}
+
+
+churn_registry = ChurnRegistry()
@@ -1,55 +1,549 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import functools
+import hashlib
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.libs.common.jobs import DeadlineExceeded, check_deadline, remaining
+from ai_insight_suite.libs.common.logging import get_logger
+from ai_insight_suite.libs.common.metrics import span, timed
+from .accuracy import score
+from .baselines import BASELINES, SEASONAL_ACF, seasonal_strength
+from .ingest import FORECAST_DATE_COLS, FORECAST_VALUE_COLS, find_column
+from .model_store import ModelState, model_store, state_key
+
+
+log = get_logger("pred.forecast")
+TAIL_CHECK = 8  # stored observations that a new upload must reproduce to be appended
+SERIES_SEP = "|"  # joins the values of several series columns into one series id
+MODELS = ("auto", "sarimax", "prophet", *BASELINES)
+SARIMAX_MAX_PERIOD = 12  # auto never picks SARIMAX for longer seasons (s=52 fits take seconds)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_limits: Any = None
+
 
 def _prep(df: pd.DataFrame) -> pd.DataFrame:
 	df = df.copy()
-	date_col = next((c for c in df.columns if c.lower() in ("date", "ds")), None)
-	metric_col = next((c for c in df.columns if c.lower() in ("metric", "y", "revenue", "count")), None)
+	date_col = find_column(df.columns, FORECAST_DATE_COLS)
+	metric_col = find_column(df.columns, FORECAST_VALUE_COLS)
 	if not date_col or not metric_col:
 		raise ValueError("input must contain 'date' and 'metric' (or 'revenue'/'count') columns")
 	df[date_col] = pd.to_datetime(df[date_col])
 	return df.rename(columns={date_col: "ds", metric_col: "y"}).sort_values("ds")
 
 
-def forecast_dataframe(df: pd.DataFrame, horizon: int = 8, freq: str = "W", model: str = "sarimax") -> Dict[str, Any]:
-	df = _prep(df)
-	df = df.set_index("ds").asfreq(freq)
-	df["y"] = df["y"].interpolate()
-
-	# Minimal SARIMAX fallback that works everywhere; Prophet optional via settings
-	order = (1, 1, 1)
-	seasonal_order = (1, 1, 1, 12 if freq.upper().startswith("M") else 52 if freq.upper().startswith("W") else 7)
-	model = SARIMAX(df["y"], order=order, seasonal_order=seasonal_order, enforce_stationarity=False, enforce_invertibility=False)
-	res = model.fit(disp=False)
-	fc = res.get_forecast(steps=horizon)
-	pred = fc.predicted_mean
-	ci = fc.conf_int(alpha=0.2)
-
-	index = pd.date_range(start=df.index[-1], periods=horizon + 1, freq=freq)[1:]
-	pred.index = index
-	ci.index = index
+def _seasonal_period(freq: str) -> int:
+	return 12 if freq.upper().startswith("M") else 52 if freq.upper().startswith("W") else 7
+
+
+def _fit_sarimax(
+	y: pd.Series, order: Tuple[int, int, int], seasonal_order: Tuple[int, ...]
+) -> Any:
+	model = SARIMAX(
+		y,
+		order=order,
+		seasonal_order=seasonal_order,
+		enforce_stationarity=False,
+		enforce_invertibility=False,
+	)
+	return model.fit(disp=False)
+
+
+def _sarimax_forecast(
+	y: pd.Series, order: Tuple[int, int, int], seasonal_order: Tuple[int, ...], n: int, h: int
+) -> Any:
+	# refit on the history before the holdout, so its points do not inform the parameters
+	# (as the baselines, which are refit on values[:n])
+	return _fit_sarimax(y.iloc[:n], order, seasonal_order).forecast(h)
+
+
+def _sarimax_holdout(
+	y: pd.Series, horizon: int, order: Tuple[int, int, int], seasonal_order: Tuple[int, ...]
+) -> Dict[str, float]:
+	check_deadline()
+	predict = functools.partial(_sarimax_forecast, y, order, seasonal_order)
+	with span("forecast.holdout"):
+		return _holdout(y, horizon, seasonal_order[-1], predict)
+
+
+def _series_id(y: pd.Series, freq: str) -> str:
+	# Without an explicit id a series is recognised by where it starts and its first values
+	head = y.head(TAIL_CHECK)
+	raw = f"{freq}|{y.index[0].isoformat()}|{np.round(head.to_numpy(dtype=float), 6).tolist()}"
+	return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _extends(state: ModelState, y: pd.Series) -> bool:
+	# True when y starts where the stored series started and still holds its last values
+	if y.index[0] != pd.Timestamp(state.first_ds) or y.index[-1] < pd.Timestamp(state.last_ds):
+		return False
+	known = y[: pd.Timestamp(state.last_ds)]
+	if len(known) != state.n_obs:
+		return False
+	return bool(np.allclose(known.tail(len(state.tail)).to_numpy(dtype=float), state.tail, rtol=1e-9))
+
+
+def _drifted(results: Any, new_obs: int) -> Optional[float]:
+	# Mean absolute one-step standardized forecast error over the appended points
+	errors = results.filter_results.standardized_forecasts_error[0, -new_obs:]
+	score = float(np.nanmean(np.abs(errors)))
+	return score if score > settings.FORECAST_DRIFT_Z else None
 
+
+def _sarimax_results(
+	y: pd.Series,
+	order: Tuple[int, int, int],
+	seasonal_order: Tuple[int, ...],
+	freq: str,
+	series_id: Optional[str],
+	horizon: Optional[int] = None,
+) -> Tuple[Any, Dict[str, Any]]:
+	# Fitted state is reused per (series, config): unchanged data reuses it, new trailing
+	# observations are appended with the stored parameters (a Kalman filter pass, no
+	# optimisation), and a full refit happens after FORECAST_REFIT_EVERY appended points,
+	# FORECAST_REFIT_MAX_AGE_DAYS, or when the new points do not fit the model (drift).
+	# With a horizon, info["metrics"] holds the holdout accuracy; it costs a second fit, so
+	# it is stored with the state and reused until the next full refit.
+	if not settings.FORECAST_STATE_ENABLED:
+		results = _fit_sarimax(y, order, seasonal_order)
+		info: Dict[str, Any] = {"state": "fit"}
+		if horizon is not None:
+			info["metrics"] = _sarimax_holdout(y, horizon, order, seasonal_order)
+		return results, info
+	sid = series_id or _series_id(y, freq)
+	config = {"model": "sarimax", "order": order, "seasonal_order": seasonal_order, "freq": freq}
+	key = state_key(sid, config)
+	info = {"series_id": sid}
+	with model_store.lock(key):
+		loaded = model_store.load(key)
+		results = None
+		reason = "new"
+		if loaded is not None:
+			state, stored = loaded
+			new_obs = len(y) - state.n_obs
+			age = datetime.utcnow() - state.fitted_at
+			if not _extends(state, y):
+				reason = "history_changed"
+			elif new_obs == 0:
+				results = stored
+				info["state"] = "reused"
+			elif state.appended_since_fit + new_obs > settings.FORECAST_REFIT_EVERY:
+				reason = "scheduled"
+			elif age > timedelta(days=settings.FORECAST_REFIT_MAX_AGE_DAYS):
+				reason = "max_age"
+			else:
+				appended = stored.append(y.iloc[state.n_obs :], refit=False)
+				drift = _drifted(appended, new_obs)
+				if drift is None:
+					results = appended
+					state.appended_since_fit += new_obs
+					info.update(state="appended", appended=new_obs)
+				else:
+					reason = "drift"
+					info["drift_z"] = round(drift, 3)
+		if results is None:
+			results = _fit_sarimax(y, order, seasonal_order)
+			state = ModelState(
+				key=key,
+				first_ds=y.index[0].to_pydatetime(),
+				last_ds=y.index[-1].to_pydatetime(),
+				n_obs=len(y),
+				tail=[],
+				fitted_at=datetime.utcnow(),
+			)
+			info.update(state="fit", reason=reason)
+		changed = info["state"] != "reused"
+		if changed:
+			state.last_ds = y.index[-1].to_pydatetime()
+			state.n_obs = len(y)
+			state.tail = y.tail(TAIL_CHECK).to_numpy(dtype=float).tolist()
+		if horizon is not None:
+			metrics = state.metrics.get(str(horizon))
+			if metrics is None:
+				metrics = _sarimax_holdout(y, horizon, order, seasonal_order)
+				state.metrics[str(horizon)] = metrics
+				changed = True
+			info["metrics"] = metrics
+		if changed:
+			try:
+				model_store.save(state, results)
+			except OSError as e:
+				log.warning("model_state_save_failed", key=key, error=str(e))
+	return results, info
+
+
+def select_model(y: np.ndarray, m: int, horizon: int) -> Tuple[str, str]:
+	# SARIMAX only for clearly seasonal, long enough series with a short season; otherwise
+	# the fast model with the lowest error on a holdout of the last points
+	n = len(y)
+	if n < 8:
+		return "naive", "short_history"
+	seasonal = seasonal_strength(y, m) >= SEASONAL_ACF
+	if seasonal and n >= 3 * m and m <= SARIMAX_MAX_PERIOD:
+		return "sarimax", "seasonal"
+	candidates = ["naive", "ses", "theta"]
+	if seasonal:
+		candidates += ["seasonal_naive", "holt_winters"]
+	holdout = min(horizon, max(1, n // 5))
+	train, test = y[:-holdout], y[-holdout:]
+	scores: Dict[str, float] = {}
+	for name in candidates:
+		try:
+			fc = BASELINES[name](train, m, holdout)
+		except ValueError:
+			continue
+		scores[name] = float(np.mean(np.abs(fc.mean - test)))
+	return min(scores, key=scores.get), "holdout_mae"
+
+
+def _prophet(y: pd.Series, horizon: int, freq: str) -> pd.DataFrame:
+	from prophet import Prophet
+
+	m = Prophet(interval_width=0.8)
+	m.fit(pd.DataFrame({"ds": y.index, "y": y.to_numpy()}))
+	future = m.make_future_dataframe(periods=horizon, freq=freq, include_history=False)
+	fc = m.predict(future)
+	return fc[["ds", "yhat", "yhat_lower", "yhat_upper"]].reset_index(drop=True)
+
+
+def _forecast_series(
+	y: pd.Series,
+	horizon: int,
+	freq: str,
+	model: str,
+	series_id: Optional[str],
+	evaluate: bool = False,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+	# evaluate=True adds info["metrics"]: accuracy of the chosen model on the last points
+	requested = (model or "auto").lower()
+	if requested not in MODELS:
+		raise ValueError(f"unknown model {model!r}; expected one of {', '.join(MODELS)}")
+	m = _seasonal_period(freq)
+	index = pd.date_range(start=y.index[-1], periods=horizon + 1, freq=freq)[1:]
+	info: Dict[str, Any] = {"requested": requested}
+	name = requested
+
+	if name == "prophet":
+		# Only when enabled and installed; otherwise say so and fall back to auto
+		try:
+			if not settings.USE_PROPHET:
+				raise RuntimeError("USE_PROPHET is disabled")
+			out_df = _prophet(y, horizon, freq)
+			return out_df, {**info, "model": "prophet"}
+		except (ImportError, RuntimeError) as e:
+			info["fallback"] = str(e) if isinstance(e, RuntimeError) else "prophet is not installed"
+			name = "auto"
+	if name == "auto":
+		name, info["selected_by"] = select_model(y.to_numpy(dtype=float), m, horizon)
+
+	if name == "sarimax":
+		# Minimal SARIMAX fallback that works everywhere; Prophet optional via settings
+		order = (1, 1, 1)
+		seasonal_order = (1, 1, 1, m)
+		res, state_info = _sarimax_results(
+			y, order, seasonal_order, freq, series_id, horizon if evaluate else None
+		)
+		fc = res.get_forecast(steps=horizon)
+		ci = fc.conf_int(alpha=0.2)
+		out_df = pd.DataFrame({
+			"ds": index,
+			"yhat": np.asarray(fc.predicted_mean),
+			"yhat_lower": ci.iloc[:, 0].to_numpy(),
+			"yhat_upper": ci.iloc[:, 1].to_numpy(),
+		})
+		info.update(model="sarimax", order=order, seasonal_order=seasonal_order, **state_info)
+		return out_df, info
+
+	fc = BASELINES[name](y.to_numpy(dtype=float), m, horizon)
 	out_df = pd.DataFrame({
 		"ds": index,
-		"yhat": pred.values,
-		"yhat_lower": ci.iloc[:, 0].values,
-		"yhat_upper": ci.iloc[:, 1].values,
+		"yhat": fc.mean,
+		"yhat_lower": fc.lower,
+		"yhat_upper": fc.upper,
 	})
+	info.update(model=fc.model, params=fc.params)
+	if evaluate:
+		values = y.to_numpy(dtype=float)
+		with span("forecast.holdout"):
+			info["metrics"] = _holdout(
+				y, horizon, m, lambda n, h: BASELINES[name](values[:n], m, h).mean
+			)
+	return out_df, info
 
-	# naive metrics for demo
-	last_hist = df["y"].tail(min(10, len(df)))
-	mape = float(np.mean(np.abs((last_hist - last_hist.mean()) / (last_hist + 1e-6))) * 100)
 
-	return {
-		"predictions": out_df.to_dict(orient="records"),
-		"metrics": {"mape": round(mape, 2)},
-		"model_info": {"model": "sarimax", "order": order, "seasonal_order": seasonal_order},
-	}
+def _holdout(
+	y: pd.Series, horizon: int, m: int, predict: Callable[[int, int], Any]
+) -> Dict[str, float]:
+	# Forecasts the last min(horizon, n/4) points from the history before them and scores
+	# them; metrics that are undefined for the series (e.g. MAPE on zeros) are left out
+	h = min(horizon, len(y) // 4)
+	if h < 1:
+		return {}
+	values = y.to_numpy(dtype=float)
+	n = len(values) - h
+	pred = np.asarray(predict(n, h), dtype=float)
+	metrics = score(values[n:], pred, values[:n], m)
+	return {k: round(v, 4) for k, v in metrics.items() if v is not None and np.isfinite(v)}
+
+
+def forecast_dataframe(
+	df: pd.DataFrame,
+	horizon: int = 8,
+	freq: str = "W",
+	model: str = "auto",
+	series_id: Optional[str] = None,
+) -> Dict[str, Any]:
+	out_df, metrics, model_info = forecast_frame(df, horizon, freq, model, series_id)
+	with span("forecast.serialize"):
+		predictions = out_df.to_dict(orient="records")
+	return {"predictions": predictions, "metrics": metrics, "model_info": model_info}
+
+
+def forecast_frame(
+	df: pd.DataFrame,
+	horizon: int = 8,
+	freq: str = "W",
+	model: str = "auto",
+	series_id: Optional[str] = None,
+) -> Tuple[pd.DataFrame, Dict[str, float], Dict[str, Any]]:
+	# forecast_dataframe without the per-row dicts: (predictions, metrics, model_info)
+	with span("forecast.prepare"):
+		df = _prep(df)
+		df = df.set_index("ds").asfreq(freq)
+		df["y"] = df["y"].interpolate()
+	check_deadline()
 
+	# forecast.fit includes the forecast.holdout evaluation below it
+	with span("forecast.fit"):
+		out_df, model_info = _forecast_series(
+			df["y"], horizon, freq, model, series_id, evaluate=True
+		)
+	# holdout accuracy of the model used; /forecast/backtest evaluates over several origins
+	metrics = model_info.pop("metrics", {})
+	return out_df, metrics, model_info
 
+
+def regular_series(ds: np.ndarray, y: np.ndarray, freq: str) -> pd.Series:
+	series = pd.Series(y, index=pd.DatetimeIndex(ds), name="y").sort_index()
+	return series.asfreq(freq).interpolate()
+
+
+class SeriesTimeout(Exception):
+	pass
+
+
+@contextmanager
+def _time_limit(seconds: float) -> Iterator[None]:
+	# SIGALRM based, so only enforced on a process's main thread (i.e. in pool workers)
+	usable = (
+		seconds > 0
+		and hasattr(signal, "setitimer")
+		and threading.current_thread() is threading.main_thread()
+	)
+	if not usable:
+		yield
+		return
+
+	def _expired(signum: int, frame: Any) -> None:
+		raise SeriesTimeout(f"exceeded {seconds:g}s")
+
+	previous = signal.signal(signal.SIGALRM, _expired)
+	signal.setitimer(signal.ITIMER_REAL, seconds)
+	try:
+		yield
+	finally:
+		signal.setitimer(signal.ITIMER_REAL, 0)
+		signal.signal(signal.SIGALRM, previous)
+
+
+def _forecast_chunk(
+	items: Sequence[Tuple[str, np.ndarray, np.ndarray]],
+	horizon: int,
+	freq: str,
+	model: str,
+	timeout: float,
+) -> List[Dict[str, Any]]:
+	# Runs in a pool worker; one failing or slow series never takes its neighbours down
+	out: List[Dict[str, Any]] = []
+	for sid, ds, y in items:
+		start = time.perf_counter()
+		try:
+			with _time_limit(timeout):
+				pred, info = _forecast_series(regular_series(ds, y, freq), horizon, freq, model, sid)
+			out.append({"series_id": sid, "ok": True, "pred": pred, "model_info": info})
+		except Exception as e:  # noqa: BLE001
+			out.append({"series_id": sid, "ok": False, "error": f"{type(e).__name__}: {e}"})
+		out[-1]["ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+	return out
+
+
+def _init_worker() -> None:
+	# One process per core: keep BLAS/OpenMP from starting a thread per core in each of them
+	global _limits
+	os.environ["OMP_NUM_THREADS"] = "1"
+	try:
+		from threadpoolctl import threadpool_limits
+
+		_limits = threadpool_limits(limits=1)
+	except ImportError:
+		pass
+
+
+def series_timeout(timeout: Optional[float]) -> float:
+	# Per-series limit in pool workers, never longer than what is left of the request deadline
+	timeout = settings.FORECAST_SERIES_TIMEOUT_SECONDS if timeout is None else timeout
+	left = remaining()
+	if left is None:
+		return timeout
+	return max(0.001, min(timeout, left) if timeout > 0 else left)
+
+
+def _workers() -> int:
+	return settings.FORECAST_WORKERS or os.cpu_count() or 1
+
+
+def _get_pool() -> ProcessPoolExecutor:
+	global _pool
+	with _pool_lock:
+		if _pool is None:
+			_pool = ProcessPoolExecutor(
+				max_workers=_workers(),
+				mp_context=multiprocessing.get_context("spawn"),
+				initializer=_init_worker,
+			)
+		return _pool
+
+
+def shutdown_pool() -> None:
+	global _pool
+	with _pool_lock:
+		if _pool is not None:
+			_pool.shutdown(wait=False, cancel_futures=True)
+		_pool = None
+
+
+def split_series(
+	df: pd.DataFrame, series_cols: Sequence[str]
+) -> List[Tuple[str, np.ndarray, np.ndarray]]:
+	# Long format (one row per series and date) to (series_id, dates, values) arrays
+	missing = [c for c in series_cols if c not in df.columns]
+	if missing:
+		raise ValueError(f"series column(s) not found: {', '.join(missing)}")
+	df = _prep(df)
+	ds = df["ds"].to_numpy()
+	y = df["y"].to_numpy(dtype=float)
+	groups = df.groupby(list(series_cols), sort=True).indices
+	out = []
+	for key, pos in groups.items():
+		parts = key if isinstance(key, tuple) else (key,)
+		out.append((SERIES_SEP.join(str(p) for p in parts), ds[pos], y[pos]))
+	return out
+
+
+def run_series_chunks(
+	fn: Callable[..., List[Dict[str, Any]]],
+	items: Sequence[Tuple[str, np.ndarray, np.ndarray]],
+	*args: Any,
+) -> Tuple[List[Dict[str, Any]], int]:
+	# Runs fn(chunk, *args) over chunks of series, on the process pool when there is more
+	# than one worker; fn must be a module-level function returning one dict per series.
+	# Series are sent in small chunks so IPC stays cheap for thousands of short series.
+	workers = _workers()
+	# smaller chunks when there are fewer series than workers x chunk size, so every core gets work
+	size = max(1, min(settings.FORECAST_CHUNK_SERIES, -(-len(items) // workers)))
+	chunks = [items[i : i + size] for i in range(0, len(items), size)]
+
+	results: List[Dict[str, Any]] = []
+	if workers == 1 or len(chunks) <= 1:
+		for chunk in chunks:
+			check_deadline()
+			results.extend(fn(chunk, *args))
+		return results, 1
+	pool = _get_pool()
+	futures: List[Tuple[Future, Sequence[Tuple[str, np.ndarray, np.ndarray]]]] = [
+		(pool.submit(fn, chunk, *args), chunk) for chunk in chunks
+	]
+	for fut, chunk in futures:
+		try:
+			left = remaining()
+			results.extend(fut.result(timeout=None if left is None else max(0.0, left)))
+		except TimeoutError:
+			# request deadline: drop the chunks that have not started; running ones stop at
+			# their per-series limit (series_timeout)
+			for other, _ in futures:
+				other.cancel()
+			raise DeadlineExceeded("deadline exceeded") from None
+		except Exception as e:  # noqa: BLE001
+			# the worker died (e.g. out of memory); the pool cannot be reused after that
+			log.warning("forecast_chunk_failed", series=len(chunk), error=str(e))
+			results.extend(
+				{"series_id": sid, "ok": False, "error": f"worker failed: {e}", "ms": None}
+				for sid, _, _ in chunk
+			)
+			shutdown_pool()
+	return results, workers
+
+
+@timed("forecast.batch")
+def forecast_many(
+	df: pd.DataFrame,
+	series_cols: Sequence[str],
+	horizon: int = 8,
+	freq: str = "W",
+	model: str = "auto",
+	timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+	# Fits every series independently (see run_series_chunks). The result is long format
+	# and columnar: one entry per (series, step).
+	started = time.perf_counter()
+	items = split_series(df, series_cols)
+	if len(items) > settings.FORECAST_MAX_SERIES:
+		raise ValueError(f"too many series ({len(items)} > {settings.FORECAST_MAX_SERIES})")
+	timeout = series_timeout(timeout)
+	results, workers = run_series_chunks(_forecast_chunk, items, horizon, freq, model, timeout)
+
+	columns: Dict[str, List[Any]] = {
+		k: [] for k in ("series_id", "ds", "yhat", "yhat_lower", "yhat_upper")
+	}
+	series: List[Dict[str, Any]] = []
+	for r in results:
+		entry = {"series_id": r["series_id"], "ok": r["ok"], "ms": r["ms"]}
+		if r["ok"]:
+			pred = r["pred"]
+			columns["series_id"].extend([r["series_id"]] * len(pred))
+			columns["ds"].extend(t.isoformat() for t in pred["ds"])
+			for col in ("yhat", "yhat_lower", "yhat_upper"):
+				columns[col].extend(np.round(pred[col].to_numpy(dtype=float), 6).tolist())
+			entry["model"] = r["model_info"]["model"]
+			entry["state"] = r["model_info"].get("state")
+		else:
+			entry["error"] = r["error"]
+		series.append(entry)
+
+	ok = sum(1 for r in results if r["ok"])
+	return {
+		"forecast": columns,
+		"series": series,
+		"summary": {
+			"series": len(results),
+			"ok": ok,
+			"failed": len(results) - ok,
+			"workers": workers,
+			"wall_ms": round((time.perf_counter() - started) * 1000.0, 1),
+		},
+	}
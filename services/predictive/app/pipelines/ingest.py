@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import io
+import pathlib
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import pandas as pd
+
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.libs.common.jobs import check_deadline
+
+try:
+	import pyarrow as pa
+	import pyarrow.csv as pa_csv
+	import pyarrow.ipc as pa_ipc
+	import pyarrow.parquet as pq
+except ImportError:  # CSV and Excel still work through pandas' own readers
+	pa = None
+
+# Uploads are read through here so that only the columns a pipeline uses are parsed, with
+# fixed types instead of per-file (or, when streaming, per-block) inference. CSV goes
+# through pyarrow's multithreaded reader; Parquet and Arrow IPC are read natively.
+
+Source = Union[str, pathlib.Path, io.BytesIO]
+
+# Column names the pipelines recognise, compared case-insensitively
+FORECAST_DATE_COLS = ("date", "ds")
+FORECAST_VALUE_COLS = ("metric", "y", "revenue", "count")
+CUSTOMER_COL = "customer_id"
+TXN_DATE_COLS = ("date", "txn_date")
+TXN_AMOUNT_COLS = ("amount", "revenue", "value")
+
+FORMATS = {
+	".csv": "csv",
+	".xlsx": "excel",
+	".xls": "excel",
+	".parquet": "parquet",
+	".pq": "parquet",
+	".arrow": "arrow",
+	".feather": "arrow",
+	".ipc": "arrow",
+}
+UPLOAD_TYPES = sorted(s.lstrip(".") for s in FORMATS)
+
+
+def detect_format(filename: str) -> str:
+	fmt = FORMATS.get(pathlib.PurePath(filename or "").suffix.lower())
+	if fmt is None:
+		raise ValueError(f"unsupported file type; expected one of {', '.join(sorted(FORMATS))}")
+	if fmt in ("parquet", "arrow") and pa is None:
+		raise ValueError(f"{fmt} uploads need pyarrow, which is not installed")
+	return fmt
+
+
+def find_column(columns: Iterable[str], candidates: Sequence[str]) -> Optional[str]:
+	return next((c for c in columns if c.lower() in candidates), None)
+
+
+def rewind(source: Source) -> None:
+	if isinstance(source, io.IOBase):
+		source.seek(0)
+
+
+def _ipc_reader(source: Source):
+	# Arrow IPC file format (Feather v2), or the streaming format
+	try:
+		return pa_ipc.open_file(source)
+	except pa.ArrowInvalid:
+		rewind(source)
+		return pa_ipc.open_stream(source)
+
+
+def read_header(source: Source, fmt: str) -> List[str]:
+	try:
+		if fmt == "parquet":
+			return list(pq.read_schema(source).names)
+		if fmt == "arrow":
+			return list(_ipc_reader(source).schema.names)
+		if fmt == "excel":
+			return [str(c) for c in pd.read_excel(source, nrows=0).columns]
+		return [str(c) for c in pd.read_csv(source, nrows=0).columns]
+	finally:
+		rewind(source)
+
+
+def _arrow_types(dtypes: Dict[str, str], dates: Sequence[str]) -> Dict[str, "pa.DataType"]:
+	# dates are read as text and converted once per table/batch, see _to_pandas
+	types = {"string": pa.string(), "float": pa.float64()}
+	out = {c: types[t] for c, t in dtypes.items()}
+	out.update({c: pa.string() for c in dates})
+	return out
+
+
+def _to_pandas(table: "pa.Table", dates: Sequence[str]) -> pd.DataFrame:
+	# ISO dates and Arrow date/timestamp columns are converted by Arrow; anything else
+	# falls back to pandas' format inference
+	fallback = []
+	for name in dates:
+		i = table.schema.get_field_index(name)
+		try:
+			table = table.set_column(i, name, table.column(i).cast(pa.timestamp("ns")))
+		except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+			fallback.append(name)
+	df = table.to_pandas(date_as_object=False)
+	for name in fallback:
+		df[name] = pd.to_datetime(df[name])
+	return df
+
+
+def _pandas_dates(df: pd.DataFrame, dates: Sequence[str]) -> pd.DataFrame:
+	for name in dates:
+		df[name] = pd.to_datetime(df[name])
+	return df
+
+
+def _rebatch(
+	tables: Iterable["pa.Table"], rows: int, dates: Sequence[str]
+) -> Iterator[pd.DataFrame]:
+	# Arrow reads in blocks of bytes; re-slice them into frames of `rows` rows
+	pending: List["pa.Table"] = []
+	count = 0
+	for table in tables:
+		pending.append(table)
+		count += table.num_rows
+		while count >= rows:
+			merged = pa.concat_tables(pending)
+			yield _to_pandas(merged.slice(0, rows), dates)
+			rest = merged.slice(rows)
+			pending, count = [rest], rest.num_rows
+	if count:
+		yield _to_pandas(pa.concat_tables(pending), dates)
+
+
+def _csv_options(columns: Sequence[str], dtypes: Dict[str, str], dates: Sequence[str]):
+	convert = pa_csv.ConvertOptions(
+		include_columns=list(columns), column_types=_arrow_types(dtypes, dates)
+	)
+	read = pa_csv.ReadOptions(use_threads=True, block_size=settings.INGEST_BLOCK_BYTES)
+	return read, convert
+
+
+def read_frame(
+	source: Source,
+	fmt: str,
+	columns: Sequence[str],
+	dtypes: Optional[Dict[str, str]] = None,
+	dates: Sequence[str] = (),
+) -> pd.DataFrame:
+	# Whole file, only `columns`; dtypes values are "string" or "float"
+	dtypes = dtypes or {}
+	columns = list(columns)
+	if fmt == "excel":
+		frame = pd.read_excel(source, usecols=columns, dtype=_pandas_types(dtypes))
+		return _pandas_dates(frame, dates)
+	if pa is None:
+		frame = pd.read_csv(source, usecols=columns, dtype=_pandas_types(dtypes))
+		return _pandas_dates(frame, dates)
+	try:
+		if fmt == "parquet":
+			table = pq.read_table(source, columns=columns)
+		elif fmt == "arrow":
+			table = _ipc_reader(source).read_all().select(columns)
+		else:
+			read, convert = _csv_options(columns, dtypes, dates)
+			table = pa_csv.read_csv(source, read_options=read, convert_options=convert)
+		return _to_pandas(_cast(table, dtypes), dates)
+	except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+		raise ValueError(f"could not read {fmt} upload: {e}") from e
+
+
+def iter_frames(
+	source: Source,
+	fmt: str,
+	columns: Sequence[str],
+	dtypes: Optional[Dict[str, str]] = None,
+	dates: Sequence[str] = (),
+	batch_rows: Optional[int] = None,
+) -> Iterator[pd.DataFrame]:
+	# Same as read_frame, as frames of at most batch_rows rows; memory stays bounded by
+	# the batch rather than the file (Excel has no streaming reader and is read whole)
+	dtypes = dtypes or {}
+	columns = list(columns)
+	rows = batch_rows or settings.INGEST_BATCH_ROWS
+	if fmt == "excel":
+		yield read_frame(source, fmt, columns, dtypes, dates)
+		return
+	if pa is None:
+		with pd.read_csv(
+			source, usecols=columns, dtype=_pandas_types(dtypes), chunksize=rows
+		) as reader:
+			for chunk in reader:
+				check_deadline()
+				yield _pandas_dates(chunk, dates)
+		return
+	try:
+		if fmt == "parquet":
+			batches = pq.ParquetFile(source).iter_batches(batch_size=rows, columns=columns)
+			tables = (pa.Table.from_batches([b]) for b in batches)
+		elif fmt == "arrow":
+			reader = _ipc_reader(source)
+			if isinstance(reader, pa_ipc.RecordBatchFileReader):
+				batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+			else:
+				batches = iter(reader)
+			tables = (pa.Table.from_batches([b]).select(columns) for b in batches)
+		else:
+			read, convert = _csv_options(columns, dtypes, dates)
+			reader = pa_csv.open_csv(source, read_options=read, convert_options=convert)
+			tables = (pa.Table.from_batches([b]) for b in reader)
+		for frame in _rebatch((_cast(t, dtypes) for t in tables), rows, dates):
+			check_deadline()
+			yield frame
+	except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+		raise ValueError(f"could not read {fmt} upload: {e}") from e
+
+
+def _cast(table: "pa.Table", dtypes: Dict[str, str]) -> "pa.Table":
+	# Parquet/Arrow columns come typed; bring them to the requested types too
+	types = _arrow_types(dtypes, ())
+	for name, target in types.items():
+		i = table.schema.get_field_index(name)
+		if i >= 0 and table.schema.field(i).type != target:
+			table = table.set_column(i, name, table.column(i).cast(target))
+	return table
+
+
+def _pandas_types(dtypes: Dict[str, str]) -> Dict[str, str]:
+	return {c: {"string": "str", "float": "float64"}[t] for c, t in dtypes.items()}
+
+
+def forecast_columns(header: Sequence[str], series_cols: Sequence[str] = ()) -> List[str]:
+	date_col = find_column(header, FORECAST_DATE_COLS)
+	metric_col = find_column(header, FORECAST_VALUE_COLS)
+	if not date_col or not metric_col:
+		raise ValueError("input must contain 'date' and 'metric' (or 'revenue'/'count') columns")
+	missing = [c for c in series_cols if c not in header]
+	if missing:
+		raise ValueError(f"series column(s) not found: {', '.join(missing)}")
+	return [date_col, metric_col, *series_cols]
+
+
+def read_forecast_input(
+	source: Source, fmt: str, series_cols: Sequence[str] = ()
+) -> pd.DataFrame:
+	# Date, value and series columns only; series ids are text
+	columns = forecast_columns(read_header(source, fmt), series_cols)
+	dtypes = {columns[1]: "float", **{c: "string" for c in series_cols}}
+	return read_frame(source, fmt, columns, dtypes, dates=[columns[0]])
+
+
+def transaction_columns(header: Iterable[str]) -> List[str]:
+	header = list(header)
+	if CUSTOMER_COL not in header:
+		raise ValueError("customer_id column required for churn scoring")
+	date_col = find_column(header, TXN_DATE_COLS)
+	amount_col = find_column(header, TXN_AMOUNT_COLS)
+	if not date_col or not amount_col:
+		raise ValueError("need date and amount columns")
+	return [CUSTOMER_COL, date_col, amount_col]
+
+
+def iter_transactions(
+	source: Source, fmt: str, batch_rows: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+	# customer_id is always text so ids compare the same across batches, files and deltas
+	columns = transaction_columns(read_header(source, fmt))
+	dtypes = {CUSTOMER_COL: "string", columns[2]: "float"}
+	return iter_frames(source, fmt, columns, dtypes, dates=[columns[1]], batch_rows=batch_rows)
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import pickle
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from ai_insight_suite.libs.common import storage
+from ai_insight_suite.libs.common.logging import get_logger
+
+
+log = get_logger("pred.models")
+
+
+class ModelState(BaseModel):
+	key: str
+	first_ds: datetime
+	last_ds: datetime
+	n_obs: int
+	tail: List[float]  # last observations, to check new uploads extend the same history
+	fitted_at: datetime
+	appended_since_fit: int = 0
+	# holdout metrics per horizon; computing them refits, so they are kept until the next fit
+	metrics: Dict[str, Dict[str, float]] = {}
+
+
+def state_key(series_id: str, config: Dict[str, Any]) -> str:
+	raw = json.dumps({"series": series_id, "config": config}, sort_keys=True, default=str)
+	return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+# Fitted model results pickled next to a small JSON description, one pair per
+# (series, model config). Writes go through a temp file and os.replace so readers in
+# other workers never see a half-written model.
+class ModelStore:
+	def __init__(self, directory: Optional[pathlib.Path] = None):
+		self.directory = directory
+		self._locks: Dict[str, threading.Lock] = {}
+		self._guard = threading.Lock()
+
+	@property
+	def root(self) -> pathlib.Path:
+		return self.directory or storage.MODELS_DIR
+
+	def lock(self, key: str) -> threading.Lock:
+		with self._guard:
+			return self._locks.setdefault(key, threading.Lock())
+
+	def load(self, key: str) -> Optional[Tuple[ModelState, Any]]:
+		meta_p = self.root / f"{key}.json"
+		model_p = self.root / f"{key}.pkl"
+		if not meta_p.exists() or not model_p.exists():
+			return None
+		try:
+			state = ModelState.model_validate_json(meta_p.read_text())
+			with model_p.open("rb") as fh:
+				results = pickle.load(fh)
+		except Exception as e:  # noqa: BLE001
+			log.warning("model_state_unreadable", key=key, error=str(e))
+			return None
+		if getattr(results, "nobs", state.n_obs) != state.n_obs:
+			return None  # caught between the two writes of a concurrent save
+		return state, results
+
+	def save(self, state: ModelState, results: Any) -> None:
+		self.root.mkdir(parents=True, exist_ok=True)
+		for suffix, payload in (
+			(".pkl", pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL)),
+			(".json", state.model_dump_json().encode("utf-8")),
+		):
+			final = self.root / f"{state.key}{suffix}"
+			tmp = final.with_name(final.name + f".{os.getpid()}.tmp")
+			tmp.write_bytes(payload)
+			os.replace(tmp, final)
+
+	def delete(self, key: str) -> None:
+		for suffix in (".pkl", ".json"):
+			(self.root / f"{key}{suffix}").unlink(missing_ok=True)
+
+
+model_store = ModelStore()
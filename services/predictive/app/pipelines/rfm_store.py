@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import pickle
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from types import ModuleType
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from pydantic import BaseModel
+
+from ai_insight_suite.libs.common import storage
+from ai_insight_suite.libs.common.logging import get_logger
+from .churn import merge_aggregates
+
+fcntl: Optional[ModuleType]
+try:
+	import fcntl
+except ImportError:  # Windows: the per-process lock only
+	fcntl = None
+
+
+log = get_logger("pred.rfm")
+DATASET_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+MAX_BATCH_IDS = 10_000  # applied delta ids remembered per dataset
+
+
+class RfmStateError(RuntimeError):
+	pass
+
+
+class RfmState(BaseModel):
+	dataset: str
+	customers: int = 0
+	transactions: int = 0
+	last_date: Optional[datetime] = None
+	updated_at: Optional[datetime] = None
+	batches: List[str] = []  # ids of the deltas folded in, oldest first
+
+
+def check_dataset(dataset: str) -> str:
+	if not DATASET_RE.match(dataset):
+		raise ValueError("dataset must be 1-64 letters, digits, '.', '_' or '-'")
+	return dataset
+
+
+# Per-customer RFM aggregates (see churn.AGG_COLS) of one dataset, pickled together with
+# the list of applied batch ids in a single file, so a delta and its id are recorded
+# atomically: replaying a batch after a crash or a client retry is a no-op. Updates hold a
+# lock file (flock) as well as a thread lock, so uvicorn workers do not lose each other's.
+# The RfmState is also written to a small JSON sidecar, so reading it skips the aggregates.
+class RfmStore:
+	def __init__(self, directory: Optional[pathlib.Path] = None):
+		self.directory = directory
+		self._locks: Dict[str, threading.Lock] = {}
+		self._guard = threading.Lock()
+
+	@property
+	def root(self) -> pathlib.Path:
+		return self.directory or storage.MODELS_DIR / "rfm"
+
+	def _path(self, dataset: str) -> pathlib.Path:
+		return self.root / f"{check_dataset(dataset)}.pkl"
+
+	def _meta_path(self, dataset: str) -> pathlib.Path:
+		return self._path(dataset).with_suffix(".json")
+
+	def lock(self, dataset: str) -> threading.Lock:
+		with self._guard:
+			return self._locks.setdefault(dataset, threading.Lock())
+
+	@contextmanager
+	def _exclusive(self, dataset: str) -> Iterator[None]:
+		path = self._path(dataset).with_suffix(".lock")
+		with self.lock(dataset):
+			if fcntl is None:
+				yield
+				return
+			self.root.mkdir(parents=True, exist_ok=True)
+			with path.open("a") as fh:
+				fcntl.flock(fh, fcntl.LOCK_EX)
+				try:
+					yield
+				finally:
+					fcntl.flock(fh, fcntl.LOCK_UN)
+
+	def load(self, dataset: str) -> Optional[Tuple[RfmState, pd.DataFrame]]:
+		path = self._path(dataset)
+		if not path.exists():
+			return None
+		try:
+			with path.open("rb") as fh:
+				payload = pickle.load(fh)
+			return RfmState.model_validate(payload["state"]), payload["aggregates"]
+		except Exception as e:  # noqa: BLE001
+			# never treated as a new dataset: the next delta would replace the history
+			log.error("rfm_state_unreadable", dataset=dataset, error=str(e))
+			raise RfmStateError(f"stored state of {dataset!r} is unreadable") from e
+
+	def state(self, dataset: str) -> Optional[RfmState]:
+		# From the sidecar; the pickle stays the source of truth when the sidecar is
+		# missing (written before it existed) or unreadable
+		meta = self._meta_path(dataset)
+		try:
+			return RfmState.model_validate_json(meta.read_bytes())
+		except FileNotFoundError:
+			pass
+		except Exception as e:  # noqa: BLE001
+			log.warning("rfm_meta_unreadable", dataset=dataset, error=str(e))
+		loaded = self.load(dataset)
+		return loaded[0] if loaded is not None else None
+
+	def save(self, state: RfmState, aggregates: pd.DataFrame) -> None:
+		# The pickle first: a sidecar is never newer than the aggregates it describes
+		self.root.mkdir(parents=True, exist_ok=True)
+		payload = {"state": state.model_dump(), "aggregates": aggregates}
+		for final, data in (
+			(self._path(state.dataset), pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)),
+			(self._meta_path(state.dataset), state.model_dump_json().encode("utf-8")),
+		):
+			tmp = final.with_name(final.name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+			tmp.write_bytes(data)
+			os.replace(tmp, final)
+
+	def apply(
+		self, dataset: str, delta: pd.DataFrame, batch_id: str
+	) -> Tuple[RfmState, pd.DataFrame, bool]:
+		# Folds one batch of per-customer aggregates into the stored state; False when
+		# batch_id was already applied
+		with self._exclusive(dataset):
+			loaded = self.load(dataset)
+			state, current = loaded if loaded is not None else (RfmState(dataset=dataset), None)
+			if batch_id in state.batches:
+				return state, current, False
+			merged = merge_aggregates([current, delta] if current is not None else [delta])
+			state = state.model_copy(
+				update={
+					"customers": len(merged),
+					"transactions": int(merged["frequency"].sum()),
+					"last_date": merged["last_date"].max() if len(merged) else None,
+					"updated_at": datetime.utcnow(),
+					"batches": (state.batches + [batch_id])[-MAX_BATCH_IDS:],
+				}
+			)
+			self.save(state, merged)
+			return state, merged, True
+
+	def delete(self, dataset: str) -> bool:
+		path = self._path(dataset)
+		with self._exclusive(dataset):
+			existed = path.exists()
+			path.unlink(missing_ok=True)
+			self._meta_path(dataset).unlink(missing_ok=True)
+		return existed
+
+
+rfm_store = RfmStore()
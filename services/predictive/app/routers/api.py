@@ -1,19 +1,80 @@
 from __future__ import annotations
 
 import io
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 import pandas as pd
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, File, Form, Header, HTTPException, Query, UploadFile
 from pydantic import BaseModel
 
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.libs.common.jobs import BoundedExecutor, DeadlineExceeded, QueueFullError
 from ai_insight_suite.libs.common.logging import get_logger
-from ..pipelines.forecast import forecast_dataframe
-from ..pipelines.churn import score_churn
+from ai_insight_suite.libs.common.metrics import span
+from ai_insight_suite.libs.common.storage import StoredUpload, UploadTooLarge, save_upload_stream
+from ..pipelines.backtest import backtest_dataframe
+from ..pipelines.forecast import forecast_dataframe, forecast_frame, forecast_many
+from ..pipelines.ingest import Source, detect_format, read_forecast_input
+from ..pipelines.churn import aggregate_file, score_frame
+from ..pipelines.churn_model import churn_registry, score_with_model, train_file
+from ..pipelines.rfm_store import RfmStateError, rfm_store
+from .formats import FORMATS, negotiate, table_response
 
 
 router = APIRouter()
 log = get_logger("pred.api")
+# Parsing, fitting and scoring are CPU-bound: they run here rather than on the event loop,
+# a bounded number at a time, and requests beyond the queue are turned away with a 429
+executor = BoundedExecutor("predict", settings.PREDICT_WORKERS, settings.PREDICT_QUEUE_SIZE)
+
+
+async def _store_upload(file: UploadFile) -> StoredUpload:
+	# Streamed to disk under the size limit; small files stay in memory for parsing
+	try:
+		with span("upload"):
+			return await save_upload_stream(
+				file, file.filename, keep_in_memory=settings.UPLOAD_MEMORY_BYTES
+			)
+	except UploadTooLarge as e:
+		raise HTTPException(status_code=413, detail=str(e))
+
+
+def _source(stored: StoredUpload) -> Source:
+	return io.BytesIO(stored.data) if stored.data is not None else stored.path
+
+
+async def _offload(fn: Callable[..., Any], *args: Any) -> Any:
+	try:
+		return await executor.run(settings.PREDICT_TIMEOUT_SECONDS, fn, *args)
+	except QueueFullError:
+		log.warning("predict_rejected", **executor.stats())
+		raise HTTPException(
+			status_code=429,
+			detail="too many predictive requests in progress",
+			headers={"Retry-After": str(executor.retry_after())},
+		)
+	except DeadlineExceeded as e:
+		raise HTTPException(status_code=504, detail=str(e))
+	except ValueError as e:
+		raise HTTPException(status_code=422, detail=str(e))
+	except RfmStateError as e:
+		raise HTTPException(status_code=500, detail=str(e))
+
+
+def _with_frame(
+	stored: StoredUpload,
+	filename: str,
+	series_cols: List[str],
+	fn: Callable[..., Any],
+	*args: Any,
+) -> Dict[str, Any]:
+	# Only the date, value and series columns are parsed (see pipelines/ingest.py)
+	with span("parse"):
+		frame = read_forecast_input(_source(stored), detect_format(filename), series_cols)
+	return fn(frame, *args)
+
+
+FORMAT_QUERY = Query(None, description=f"one of {', '.join(FORMATS)}; default from Accept")
 
 
 class ForecastResponse(BaseModel):
@@ -27,23 +88,277 @@ async def forecast(
 	file: UploadFile = File(...),
 	horizon: int = Form(8),
 	freq: str = Form("W"),
-	model: str = Form("prophet"),
+	model: str = Form("auto"),
+	series_id: Optional[str] = Form(None),
+	format: Optional[str] = FORMAT_QUERY,
+	accept: Optional[str] = Header(None),
 ):
-	content = await file.read()
-	df = pd.read_csv(io.BytesIO(content)) if file.filename.endswith(".csv") else pd.read_excel(io.BytesIO(content))
-	out = forecast_dataframe(df, horizon=horizon, freq=freq, model=model)
+	fmt = negotiate(accept, format)
+	stored = await _store_upload(file)
+	if fmt != "json":
+		return await _offload(
+			_with_frame, stored, file.filename, [], _forecast_table, fmt, horizon, freq, model, series_id
+		)
+	out = await _offload(
+		_with_frame, stored, file.filename, [], forecast_dataframe, horizon, freq, model, series_id
+	)
 	return ForecastResponse(**out)
 
 
+def _forecast_table(df: pd.DataFrame, fmt: str, *args: Any) -> Any:
+	predictions, metrics, model_info = forecast_frame(df, *args)
+	return table_response(predictions, fmt, {"metrics": metrics, "model_info": model_info})
+
+
+class ForecastBatchResponse(BaseModel):
+	forecast: Dict[str, List[Any]]  # long format, column -> values
+	series: List[Dict[str, Any]]
+	summary: Dict[str, Any]
+
+
+@router.post("/forecast/batch", response_model=ForecastBatchResponse)
+async def forecast_batch(
+	file: UploadFile = File(...),
+	series_cols: str = Form(..., description="comma-separated columns identifying a series"),
+	horizon: int = Form(8),
+	freq: str = Form("W"),
+	model: str = Form("auto"),
+	timeout: Optional[float] = Form(None),
+	format: Optional[str] = FORMAT_QUERY,
+	accept: Optional[str] = Header(None),
+):
+	fmt = negotiate(accept, format)
+	cols = _split_cols(series_cols)
+	if not cols:
+		raise HTTPException(status_code=422, detail="series_cols is empty")
+	stored = await _store_upload(file)
+	args = (cols, horizon, freq, model, timeout)
+	if fmt != "json":
+		return await _offload(
+			_with_frame, stored, file.filename, cols, _forecast_many_table, fmt, *args
+		)
+	out = await _offload(_with_frame, stored, file.filename, cols, forecast_many, *args)
+	return ForecastBatchResponse(**out)
+
+
+def _forecast_many_table(df: pd.DataFrame, fmt: str, *args: Any) -> Any:
+	out = forecast_many(df, *args)
+	meta = {"series": out["series"], "summary": out["summary"]}
+	return table_response(pd.DataFrame(out["forecast"]), fmt, meta)
+
+
+def _split_cols(value: Optional[str]) -> List[str]:
+	return [c.strip() for c in (value or "").split(",") if c.strip()]
+
+
+class BacktestResponse(BaseModel):
+	series: List[Dict[str, Any]]
+	summary: Dict[str, Any]
+
+
+@router.post("/forecast/backtest", response_model=BacktestResponse)
+async def forecast_backtest(
+	file: UploadFile = File(...),
+	models: str = Form("auto", description="comma-separated, e.g. auto,theta,sarimax"),
+	horizon: int = Form(8),
+	freq: str = Form("W"),
+	folds: int = Form(3),
+	step: Optional[int] = Form(None),
+	series_cols: Optional[str] = Form(None),
+	timeout: Optional[float] = Form(None),
+):
+	stored = await _store_upload(file)
+	cols = _split_cols(series_cols)
+	out = await _offload(
+		_with_frame,
+		stored,
+		file.filename,
+		cols,
+		backtest_dataframe,
+		_split_cols(models) or ["auto"],
+		horizon,
+		freq,
+		folds,
+		step,
+		cols,
+		timeout,
+	)
+	return BacktestResponse(**out)
+
+
 class ChurnResponse(BaseModel):
 	results: List[Dict[str, Any]]
+	model: Optional[Dict[str, Any]] = None  # the trained model used, if any
+
+
+def _churn_aggregates(stored: StoredUpload, filename: str) -> pd.DataFrame:
+	# Aggregated batch by batch instead of being loaded whole
+	return aggregate_file(_source(stored), detect_format(filename))
+
+
+def _score(
+	agg: pd.DataFrame,
+	model: Optional[str],
+	fmt: str,
+	ref_date: Optional[pd.Timestamp] = None,
+) -> Any:
+	# RFM heuristic, or the latest version of a trained model when one is named
+	info = None
+	if not model:
+		scores = score_frame(agg, ref_date)
+	else:
+		try:
+			scores, meta = score_with_model(model, agg, ref_date)
+		except KeyError as e:
+			raise HTTPException(status_code=404, detail=str(e.args[0]))
+		info = {"name": meta.name, "version": meta.version, "algorithm": meta.algorithm}
+	if fmt != "json":
+		return table_response(scores, fmt, {"model": info} if info else None)
+	return ChurnResponse(results=scores.to_dict(orient="records"), model=info)
+
+
+def _score_upload(stored: StoredUpload, filename: str, model: Optional[str], fmt: str) -> Any:
+	return _score(_churn_aggregates(stored, filename), model, fmt)
 
 
 @router.post("/churn", response_model=ChurnResponse)
-async def churn(file: UploadFile = File(...)):
-	content = await file.read()
-	df = pd.read_csv(io.BytesIO(content)) if file.filename.endswith(".csv") else pd.read_excel(io.BytesIO(content))
-	results = score_churn(df)
-	return ChurnResponse(results=results)
+async def churn(
+	file: UploadFile = File(...),
+	model: Optional[str] = Form(None),
+	format: Optional[str] = FORMAT_QUERY,
+	accept: Optional[str] = Header(None),
+):
+	fmt = negotiate(accept, format)
+	stored = await _store_upload(file)
+	return await _offload(_score_upload, stored, file.filename, model, fmt)
+
+
+def _train_upload(
+	stored: StoredUpload,
+	filename: str,
+	name: str,
+	label_days: Optional[int],
+	algorithm: Optional[str],
+) -> Dict[str, Any]:
+	fmt = detect_format(filename)
+	meta = train_file(_source(stored), name, label_days, algorithm, fmt=fmt)
+	return meta.model_dump(mode="json")
+
+
+@router.post("/churn/models/{name}")
+async def train_churn_model(
+	name: str,
+	file: UploadFile = File(...),
+	label_days: Optional[int] = Form(None),
+	algorithm: Optional[str] = Form(None, description="xgboost, lightgbm, sklearn or auto"),
+):
+	# Trains and publishes the next version of `name`; large histories are better trained
+	# offline with `python -m ai_insight_suite.services.predictive.app.pipelines.churn_model`
+	stored = await _store_upload(file)
+	return await _offload(_train_upload, stored, file.filename, name, label_days, algorithm)
+
+
+@router.get("/churn/models")
+async def churn_models():
+	models = []
+	for name in churn_registry.names():
+		meta = churn_registry.meta(name, churn_registry.latest(name))
+		models.append(meta.model_dump(mode="json"))
+	return {"models": models, "registry": churn_registry.stats()}
+
+
+class ChurnStateResponse(BaseModel):
+	dataset: str
+	customers: int
+	transactions: int
+	last_date: Optional[str]
+	updated_at: Optional[str]
+	batches: int
+	applied: Optional[bool] = None  # for deltas: False when the batch was already folded in
+
+
+def _state_response(state: Any, applied: Optional[bool] = None) -> ChurnStateResponse:
+	return ChurnStateResponse(
+		dataset=state.dataset,
+		customers=state.customers,
+		transactions=state.transactions,
+		last_date=state.last_date.isoformat() if state.last_date else None,
+		updated_at=state.updated_at.isoformat() if state.updated_at else None,
+		batches=len(state.batches),
+		applied=applied,
+	)
+
+
+def _apply_delta(dataset: str, stored: StoredUpload, filename: str, batch_id: str) -> Any:
+	delta = _churn_aggregates(stored, filename)
+	state, _, applied = rfm_store.apply(dataset, delta, batch_id)
+	log.info("churn_delta", dataset=dataset, batch_id=batch_id, applied=applied, rows=len(delta))
+	return _state_response(state, applied)
+
+
+@router.post("/churn/state/{dataset}", response_model=ChurnStateResponse)
+async def churn_delta(
+	dataset: str,
+	file: UploadFile = File(...),
+	batch_id: Optional[str] = Form(None, description="defaults to the SHA-256 of the file"),
+):
+	# Folds new transactions (e.g. yesterday's) into the stored per-customer aggregates.
+	# Each batch is applied once: resending a file or batch_id does not count it twice.
+	stored = await _store_upload(file)
+	return await _offload(_apply_delta, dataset, stored, file.filename, batch_id or stored.sha256)
+
+
+def _load_state(dataset: str) -> Any:
+	loaded = rfm_store.load(dataset)
+	if loaded is None:
+		raise HTTPException(status_code=404, detail="unknown dataset")
+	return loaded
+
+
+def _state_info(dataset: str) -> Any:
+	# the sidecar only; the aggregates are not loaded
+	state = rfm_store.state(dataset)
+	if state is None:
+		raise HTTPException(status_code=404, detail="unknown dataset")
+	return _state_response(state)
+
+
+@router.get("/churn/state/{dataset}", response_model=ChurnStateResponse)
+async def churn_state(dataset: str):
+	return await _offload(_state_info, dataset)
+
+
+def _score_state(dataset: str, as_of: Optional[str], model: Optional[str], fmt: str) -> Any:
+	_, aggregates = _load_state(dataset)
+	return _score(aggregates, model, fmt, pd.Timestamp(as_of) if as_of else None)
+
+
+@router.get("/churn/state/{dataset}/scores", response_model=ChurnResponse)
+async def churn_state_scores(
+	dataset: str,
+	as_of: Optional[str] = Query(None, description="reference date; default day after the last"),
+	model: Optional[str] = Query(None, description="trained model name; default RFM heuristic"),
+	format: Optional[str] = FORMAT_QUERY,
+	accept: Optional[str] = Header(None),
+):
+	fmt = negotiate(accept, format)
+	return await _offload(_score_state, dataset, as_of, model, fmt)
+
+
+def _delete_state(dataset: str) -> Dict[str, str]:
+	if not rfm_store.delete(dataset):
+		raise HTTPException(status_code=404, detail="unknown dataset")
+	return {"deleted": dataset}
+
+
+@router.delete("/churn/state/{dataset}")
+async def delete_churn_state(dataset: str):
+	# waits on the dataset's lock file, so off the event loop like the reads
+	return await _offload(_delete_state, dataset)
+
+
+@router.get("/queue")
+async def queue_stats():
+	return {**executor.stats(), "timeout_seconds": settings.PREDICT_TIMEOUT_SECONDS}
 
 
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterator, Optional
+
+import pandas as pd
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+from ai_insight_suite.libs.common.metrics import span
+
+try:
+	import pyarrow as pa
+except ImportError:  # the arrow format is then refused with a 406
+	pa = None
+
+# Tabular results (forecast points, churn scores) in the format picked by ?format= or,
+# without it, by the Accept header:
+#   json      records, through the endpoint's response model (the default)
+#   columnar  {"rows": n, "columns": {name: [values, ...]}, ...meta}
+#   ndjson    {"meta": {...}} when there is meta, then one object per row, streamed
+#   arrow     an Arrow IPC stream; meta is JSON under the schema metadata key "meta"
+# The last three are written from the DataFrame by pandas/pyarrow, without building a
+# dict per row or validating the rows through a response model. JSON floats keep 15
+# significant digits (pandas' maximum); Arrow keeps them exact.
+
+MEDIA_TYPES = {
+	"columnar": "application/vnd.insight.columnar+json",
+	"ndjson": "application/x-ndjson",
+	"arrow": "application/vnd.apache.arrow.stream",
+}
+FORMATS = ("json", *MEDIA_TYPES)
+NDJSON_ROWS = 10_000  # rows serialized per streamed chunk
+_JSON_OPTS = {"date_format": "iso", "date_unit": "s", "double_precision": 15, "force_ascii": False}
+
+
+def negotiate(accept: Optional[str], fmt: Optional[str]) -> str:
+	if fmt:
+		if fmt not in FORMATS:
+			raise HTTPException(status_code=422, detail=f"format must be one of {', '.join(FORMATS)}")
+		chosen = fmt
+	else:
+		# first acceptable media type listed wins; q-values are not weighed
+		chosen = "json"
+		for media in (m.split(";")[0].strip().lower() for m in (accept or "").split(",")):
+			match = next((k for k, v in MEDIA_TYPES.items() if v == media), None)
+			if match:
+				chosen = match
+				break
+	if chosen == "arrow" and pa is None:
+		raise HTTPException(status_code=406, detail="arrow output needs pyarrow")
+	return chosen
+
+
+def _dumps(value: Any) -> str:
+	return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _columnar(frame: pd.DataFrame, meta: Dict[str, Any]) -> bytes:
+	columns = ",".join(
+		f"{_dumps(str(c))}:{frame[c].to_json(orient='values', **_JSON_OPTS)}" for c in frame.columns
+	)
+	fields = "".join(f"{_dumps(k)}:{_dumps(v)}," for k, v in meta.items())
+	return f'{{{fields}"rows":{len(frame)},"columns":{{{columns}}}}}'.encode("utf-8")
+
+
+def _ndjson(frame: pd.DataFrame, meta: Dict[str, Any]) -> Iterator[str]:
+	if meta:
+		yield _dumps({"meta": meta}) + "\n"
+	for start in range(0, len(frame), NDJSON_ROWS):
+		part = frame.iloc[start : start + NDJSON_ROWS]
+		yield part.to_json(orient="records", lines=True, **_JSON_OPTS)
+
+
+def _arrow(frame: pd.DataFrame, meta: Dict[str, Any]) -> bytes:
+	table = pa.Table.from_pandas(frame, preserve_index=False)
+	metadata = {**(table.schema.metadata or {}), b"meta": _dumps(meta).encode("utf-8")}
+	table = table.replace_schema_metadata(metadata)
+	sink = pa.BufferOutputStream()
+	with pa.ipc.new_stream(sink, table.schema) as writer:
+		writer.write_table(table)
+	data: bytes = sink.getvalue().to_pybytes()
+	return data
+
+
+def table_response(
+	frame: pd.DataFrame, fmt: str, meta: Optional[Dict[str, Any]] = None
+) -> Response:
+	# Build inside the request's worker: encoding is CPU-bound (ndjson is encoded lazily,
+	# one chunk at a time, as the client reads)
+	meta = meta or {}
+	if fmt == "ndjson":
+		return StreamingResponse(_ndjson(frame, meta), media_type=MEDIA_TYPES["ndjson"])
+	with span(f"encode.{fmt}"):
+		body = _arrow(frame, meta) if fmt == "arrow" else _columnar(frame, meta)
+	return Response(body, media_type=MEDIA_TYPES["arrow" if fmt == "arrow" else "columnar"])
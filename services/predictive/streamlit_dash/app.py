@@ -13,7 +13,15 @@ project_root = Path(__file__).resolve().parents[3]
 sys.path.insert(0, str(project_root))
 
 from ai_insight_suite.services.predictive.app.pipelines.forecast import forecast_dataframe
-from ai_insight_suite.services.predictive.app.pipelines.churn import score_churn
+from ai_insight_suite.services.predictive.app.pipelines.churn import (
+	aggregate_file,
+	score_aggregates,
+)
+from ai_insight_suite.services.predictive.app.pipelines.ingest import (
+	UPLOAD_TYPES,
+	detect_format,
+	read_forecast_input,
+)
 
 
 st.set_page_config(page_title="Predictive Dashboard", layout="wide")
@@ -23,23 +31,21 @@ tab_overview, tab_forecast, tab_churn = st.tabs(["Overview", "Forecast", "Churn"
 
 with tab_forecast:
 	st.subheader("Upload Time Series")
-	file = st.file_uploader("CSV/XLSX", type=["csv", "xlsx"], key="ts")
+	file = st.file_uploader("CSV/XLSX/Parquet/Arrow", type=UPLOAD_TYPES, key="ts")
 	horizon = st.slider("Horizon (periods)", 4, 52, 12)
 	freq = st.selectbox("Frequency", ["D", "W", "M"], index=1)
 	if file:
-		data = file.read()
-		df = pd.read_csv(io.BytesIO(data)) if file.name.endswith(".csv") else pd.read_excel(io.BytesIO(data))
+		df = read_forecast_input(io.BytesIO(file.read()), detect_format(file.name))
 		res = forecast_dataframe(df, horizon=horizon, freq=freq)
 		pred_df = pd.DataFrame(res["predictions"]).rename(columns={"ds": "date"})
 		fig = px.line(pred_df, x="date", y=["yhat", "yhat_lower", "yhat_upper"], title="Forecast")
 		st.plotly_chart(fig, use_container_width=True)
-		st.json(res["metrics"]) 
+		st.json(res["metrics"])
 
 with tab_churn:
 	st.subheader("Upload Transactions")
-	file2 = st.file_uploader("CSV/XLSX", type=["csv", "xlsx"], key="churn")
+	file2 = st.file_uploader("CSV/XLSX/Parquet/Arrow", type=UPLOAD_TYPES, key="churn")
 	if file2:
-		data2 = file2.read()
-		df2 = pd.read_csv(io.BytesIO(data2)) if file2.name.endswith(".csv") else pd.read_excel(io.BytesIO(data2))
-		results = score_churn(df2)
+		agg = aggregate_file(io.BytesIO(file2.read()), detect_format(file2.name))
+		results = score_aggregates(agg)
 		st.dataframe(pd.DataFrame(results))
@@ -0,0 +1,33 @@
+import pytest
+
+from ai_insight_suite.libs.common import storage
+from ai_insight_suite.services.predictive.app.pipelines import churn_model, forecast
+from ai_insight_suite.services.predictive.app.pipelines.churn_registry import ChurnRegistry
+from ai_insight_suite.services.predictive.app.pipelines.model_store import ModelStore
+from ai_insight_suite.services.predictive.app.pipelines.rfm_store import RfmStore
+from ai_insight_suite.services.predictive.app.routers import api
+
+
+@pytest.fixture(autouse=True)
+def _temp_uploads(monkeypatch, tmp_path):
+	# endpoint tests store their uploads here instead of data/uploads
+	monkeypatch.setattr(storage, "UPLOADS_DIR", tmp_path / "uploads")
+	(tmp_path / "uploads").mkdir()
+
+
+@pytest.fixture(autouse=True)
+def _temp_model_store(monkeypatch, tmp_path):
+	# fitted forecast state goes to a per-test directory instead of data/models
+	monkeypatch.setattr(forecast, "model_store", ModelStore(tmp_path / "models"))
+
+
+@pytest.fixture(autouse=True)
+def _temp_rfm_store(monkeypatch, tmp_path):
+	monkeypatch.setattr(api, "rfm_store", RfmStore(tmp_path / "rfm"))
+
+
+@pytest.fixture(autouse=True)
+def _temp_churn_registry(monkeypatch, tmp_path):
+	registry = ChurnRegistry(tmp_path / "churn")
+	monkeypatch.setattr(churn_model, "churn_registry", registry)
+	monkeypatch.setattr(api, "churn_registry", registry)
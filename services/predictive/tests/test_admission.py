@@ -0,0 +1,79 @@
+import asyncio
+import io
+import threading
+import time
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.libs.common.jobs import BoundedExecutor, DeadlineExceeded, check_deadline
+from ai_insight_suite.services.predictive.app.main import app
+from ai_insight_suite.services.predictive.app.routers import api
+
+
+def _csv() -> bytes:
+	buf = io.BytesIO()
+	pd.DataFrame({
+		"customer_id": [1, 1, 2],
+		"date": ["2024-01-01", "2024-02-01", "2024-01-15"],
+		"amount": [10.0, 20.0, 5.0],
+	}).to_csv(buf, index=False)
+	return buf.getvalue()
+
+
+def test_run_deadline_cancels_queued_work():
+	ex = BoundedExecutor("t", 1, 1)
+	release = threading.Event()
+	ran = []
+
+	def cooperative():
+		while not release.wait(0.01):
+			check_deadline()
+
+	async def scenario():
+		blocker = asyncio.ensure_future(ex.run(0.1, cooperative))
+		queued = asyncio.ensure_future(ex.run(0.05, ran.append, 1))
+		with pytest.raises(DeadlineExceeded):
+			await queued
+		with pytest.raises(DeadlineExceeded):
+			await blocker
+
+	asyncio.run(scenario())
+	release.set()
+	time.sleep(0.05)
+	assert ran == []
+	stats = ex.stats()
+	assert stats["expired"] == 2 and stats["running"] == 0 and stats["queued"] == 0
+	ex.shutdown()
+
+
+def test_full_queue_returns_429(monkeypatch):
+	ex = BoundedExecutor("t", 1, 0)
+	monkeypatch.setattr(api, "executor", ex)
+	release = threading.Event()
+	ex.submit(release.wait)
+	client = TestClient(app)
+	r = client.post("/v1/churn", files={"file": ("tx.csv", _csv(), "text/csv")})
+	release.set()
+	assert r.status_code == 429
+	assert int(r.headers["Retry-After"]) >= 1
+	assert client.get("/v1/queue").json()["rejected"] == 1
+	ex.shutdown(wait=True)
+
+
+def test_deadline_returns_504(monkeypatch):
+	ex = BoundedExecutor("t", 1, 0)
+	monkeypatch.setattr(api, "executor", ex)
+	monkeypatch.setattr(settings, "PREDICT_TIMEOUT_SECONDS", 0.05)
+	monkeypatch.setattr(api, "score_frame", lambda agg, ref_date=None: time.sleep(0.3))
+	client = TestClient(app)
+	r = client.post("/v1/churn", files={"file": ("tx.csv", _csv(), "text/csv")})
+	assert r.status_code == 504
+	monkeypatch.setattr(settings, "PREDICT_TIMEOUT_SECONDS", 30.0)
+	monkeypatch.setattr(api, "score_frame", lambda agg, ref_date=None: pd.DataFrame())
+	time.sleep(0.3)
+	r = client.post("/v1/churn", files={"file": ("tx.csv", _csv(), "text/csv")})
+	assert r.status_code == 200
+	ex.shutdown()
@@ -0,0 +1,99 @@
+import io
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.services.predictive.app.main import app
+from ai_insight_suite.services.predictive.app.pipelines import forecast
+from ai_insight_suite.services.predictive.app.pipelines.accuracy import score
+from ai_insight_suite.services.predictive.app.pipelines.backtest import (
+	backtest_dataframe,
+	origins,
+)
+
+
+def test_metrics_and_origins():
+	m = score(np.array([10.0, 20.0]), np.array([11.0, 18.0]), np.array([1.0, 2.0, 4.0]), 1)
+	assert round(m["mape"], 6) == 10.0
+	assert round(m["mase"], 6) == 1.0
+	assert score(np.zeros(2), np.zeros(2), np.zeros(3), 1)["mape"] is None
+	assert origins(40, 4, 3, 4, min_train=8) == [28, 32, 36]
+	assert origins(10, 4, 3, 4, min_train=4) == [6]
+
+
+def _frame() -> pd.DataFrame:
+	rng = np.random.default_rng(5)
+	n = 60
+	t = np.arange(n)
+	dates = pd.date_range("2019-01-01", periods=n, freq="MS")
+	rows = []
+	for sku, amp in (("a", 20), ("b", 0)):
+		y = 100 + t + amp * np.sin(2 * np.pi * t / 12) + rng.normal(0, 1, n)
+		rows.append(pd.DataFrame({"date": dates, "sku": sku, "y": y}))
+	return pd.concat(rows, ignore_index=True)
+
+
+def test_backtest_reuses_sarimax_state_across_folds(monkeypatch):
+	monkeypatch.setattr(settings, "FORECAST_WORKERS", 1)
+	out = backtest_dataframe(
+		_frame(),
+		models=["sarimax", "theta", "seasonal_naive"],
+		horizon=3,
+		freq="MS",
+		folds=4,
+		series_cols=["sku"],
+	)
+	assert out["summary"]["ok"] == 2
+	runs = {r["requested"]: r for r in out["series"][0]["models"]}
+	assert len(runs["sarimax"]["folds"]) == 4
+	# only the first fold pays for the fit
+	first, *rest = [f["ms"] for f in runs["sarimax"]["folds"]]
+	assert max(rest) < first
+	assert runs["seasonal_naive"]["mase"] is not None
+	assert out["series"][0]["best"] in runs
+
+
+def test_backtest_endpoint_and_holdout_metrics(monkeypatch):
+	monkeypatch.setattr(settings, "FORECAST_WORKERS", 1)
+	buf = io.BytesIO()
+	_frame().query("sku == 'a'").to_csv(buf, index=False)
+	client = TestClient(app)
+	files = {"file": ("s.csv", buf.getvalue(), "text/csv")}
+	r = client.post("/v1/forecast/backtest", files=files, data={"models": "theta,ses", "freq": "MS"})
+	assert r.status_code == 200
+	assert {m["requested"] for m in r.json()["series"][0]["models"]} == {"theta", "ses"}
+	r = client.post("/v1/forecast/backtest", files=files, data={"models": "lstm"})
+	assert r.status_code == 422
+
+	r = client.post("/v1/forecast", files=files, data={"model": "theta", "freq": "MS"})
+	assert set(r.json()["metrics"]) == {"mape", "smape", "mase"}
+
+
+def test_sarimax_holdout_is_fitted_without_the_holdout(monkeypatch):
+	fitted = []
+	real_fit = forecast._fit_sarimax
+
+	def spy(y, *args):
+		fitted.append(len(y))
+		return real_fit(y, *args)
+
+	monkeypatch.setattr(forecast, "_fit_sarimax", spy)
+	df = _frame().query("sku == 'a'")[["date", "y"]]
+	out = forecast.forecast_dataframe(df, horizon=3, freq="MS", model="sarimax")
+	assert out["metrics"]
+	assert fitted == [60, 57]  # the forecast, then the holdout model on 60 - 3 points
+
+	# the metrics are stored with the model state: reusing or appending to it fits nothing
+	again = forecast.forecast_dataframe(df, horizon=3, freq="MS", model="sarimax")
+	assert again["model_info"]["state"] == "reused"
+	assert again["metrics"] == out["metrics"]
+	longer = pd.concat([df, df.tail(1).assign(date=pd.Timestamp("2024-01-01"))])
+	appended = forecast.forecast_dataframe(longer, horizon=3, freq="MS", model="sarimax")
+	assert appended["model_info"]["state"] == "appended"
+	assert appended["metrics"] == out["metrics"]
+	assert fitted == [60, 57]
+	# a horizon not evaluated yet costs one holdout fit
+	forecast.forecast_dataframe(longer, horizon=4, freq="MS", model="sarimax")
+	assert fitted == [60, 57, 57]
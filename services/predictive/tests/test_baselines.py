@@ -0,0 +1,68 @@
+import io
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.services.predictive.app.main import app
+from ai_insight_suite.services.predictive.app.pipelines.baselines import BASELINES
+from ai_insight_suite.services.predictive.app.pipelines.forecast import (
+	forecast_dataframe,
+	select_model,
+)
+
+
+def _weekly(n: int) -> np.ndarray:
+	rng = np.random.default_rng(3)
+	t = np.arange(n)
+	return 200 + 0.3 * t + 25 * np.sin(2 * np.pi * t / 52) + rng.normal(0, 2, n)
+
+
+@pytest.mark.parametrize("name", sorted(BASELINES))
+def test_baselines_are_fast_and_sane(name):
+	y = _weekly(156)
+	start = time.perf_counter()
+	fc = BASELINES[name](y, 52, 8)
+	assert time.perf_counter() - start < 0.5
+	assert fc.mean.shape == (8,)
+	assert np.all(fc.lower <= fc.mean) and np.all(fc.mean <= fc.upper)
+	assert np.all(np.abs(fc.mean - 250) < 150)
+
+
+def test_seasonal_models_follow_the_season():
+	y = _weekly(156)
+	truth = _weekly(164)[-8:]
+	err = {n: np.mean(np.abs(BASELINES[n](y, 52, 8).mean - truth)) for n in BASELINES}
+	assert err["holt_winters"] < err["ses"]
+
+
+def test_auto_avoids_sarimax_for_weekly_and_short_series():
+	assert select_model(_weekly(156), 52, 8)[0] != "sarimax"
+	assert select_model(_weekly(5), 52, 8)[0] == "naive"
+
+
+def test_prophet_request_falls_back_honestly(monkeypatch):
+	monkeypatch.setattr(settings, "USE_PROPHET", False)
+	dates = pd.date_range("2021-01-03", periods=60, freq="W")
+	df = pd.DataFrame({"date": dates, "revenue": _weekly(60)})
+	info = forecast_dataframe(df, horizon=4, freq="W", model="prophet")["model_info"]
+	assert info["requested"] == "prophet"
+	assert info["fallback"] == "USE_PROPHET is disabled"
+	assert info["model"] in BASELINES
+	with pytest.raises(ValueError):
+		forecast_dataframe(df, model="lstm")
+
+
+def test_forecast_endpoint_defaults_to_auto(monkeypatch):
+	monkeypatch.setattr(settings, "USE_PROPHET", False)
+	buf = io.BytesIO()
+	dates = pd.date_range("2021-01-03", periods=60, freq="W")
+	pd.DataFrame({"date": dates, "revenue": _weekly(60)}).to_csv(buf, index=False)
+	r = TestClient(app).post(
+		"/v1/forecast", files={"file": ("s.csv", buf.getvalue(), "text/csv")}, data={"freq": "W"}
+	)
+	info = r.json()["model_info"]
+	assert info["requested"] == "auto" and "fallback" not in info
@@ -0,0 +1,134 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from ai_insight_suite.services.predictive.app.main import app
+from ai_insight_suite.services.predictive.app.pipelines.churn import (
+	aggregate,
+	aggregate_file,
+	merge_aggregates,
+	score_aggregates,
+	score_churn,
+)
+from ai_insight_suite.services.predictive.app.pipelines.rfm_store import RfmStateError, RfmStore
+from ai_insight_suite.services.predictive.app.routers import api
+
+
+def _transactions(n: int = 2000, seed: int = 0) -> pd.DataFrame:
+	rng = np.random.default_rng(seed)
+	dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D")
+	return pd.DataFrame({
+		"customer_id": rng.integers(0, 150, n),
+		"txn_date": dates.strftime("%Y-%m-%d"),
+		"Amount": rng.gamma(2.0, 30.0, n).round(2),
+	})
+
+
+def _csv(df: pd.DataFrame) -> bytes:
+	buf = io.BytesIO()
+	df.to_csv(buf, index=False)
+	return buf.getvalue()
+
+
+def test_score_churn_rfm():
+	df = pd.DataFrame({
+		"customer_id": [1, 1, 1, 2, 3],
+		"date": ["2024-03-01", "2024-03-10", "2024-03-20", "2024-01-01", "2024-03-15"],
+		"amount": [50.0, 60.0, 70.0, 5.0, 40.0],
+	})
+	out = {r["customer_id"]: r for r in score_churn(df)}
+	assert out[1]["churn_score"] < 0.01 and out[1]["bucket"] == "low"
+	assert out[2]["churn_score"] > 0.99 and out[2]["bucket"] == "high"
+	assert out[1]["churn_score"] < out[3]["churn_score"] < out[2]["churn_score"]
+
+
+def test_chunked_csv_matches_in_memory():
+	df = _transactions()
+	whole = score_churn(df)
+	chunked = score_aggregates(aggregate_file(io.BytesIO(_csv(df)), "csv", batch_rows=97))
+	# ids are read as text from files
+	assert sorted(r["customer_id"] for r in chunked) == sorted(str(r["customer_id"]) for r in whole)
+	chunked = sorted(chunked, key=lambda r: int(r["customer_id"]))
+	assert np.allclose([r["churn_score"] for r in chunked], [r["churn_score"] for r in whole])
+
+
+def test_merge_aggregates_mixed_id_types():
+	a = aggregate(pd.DataFrame({"customer_id": [1, 2], "date": ["2024-01-01"] * 2, "value": [1, 2]}))
+	b = aggregate(
+		pd.DataFrame({"customer_id": ["1", "x"], "date": ["2024-02-01"] * 2, "value": [3, 4]})
+	)
+	merged = merge_aggregates([a, b]).set_index("customer_id")
+	assert merged.loc["1", "frequency"] == 2 and merged.loc["1", "monetary"] == 4
+	assert merged.loc["1", "last_date"] == pd.Timestamp("2024-02-01")
+	assert len(merged) == 3
+
+
+def test_state_deltas_are_idempotent():
+	df = _transactions()
+	day = pd.to_datetime(df["txn_date"])
+	history, delta = df[day < "2024-12-01"], df[day >= "2024-12-01"]
+	client = TestClient(app)
+
+	def post(frame, **data):
+		files = {"file": ("tx.csv", _csv(frame), "text/csv")}
+		return client.post("/v1/churn/state/shop-1", files=files, data=data)
+
+	assert client.get("/v1/churn/state/shop-1").status_code == 404
+	assert post(history).json()["applied"] is True
+	r = post(delta, batch_id="2024-12")
+	assert r.json()["applied"] is True
+	assert post(delta, batch_id="2024-12").json()["applied"] is False
+	assert post(history).json()["applied"] is False  # same content, same default id
+
+	state = client.get("/v1/churn/state/shop-1").json()
+	assert state["transactions"] == len(df) and state["batches"] == 2
+	scores = client.get("/v1/churn/state/shop-1/scores").json()["results"]
+	scores = sorted(scores, key=lambda r: int(r["customer_id"]))
+	whole = score_churn(df)
+	assert np.allclose([r["churn_score"] for r in scores], [r["churn_score"] for r in whole])
+
+	assert client.get("/v1/churn/state/bad name/scores").status_code == 422
+	assert client.delete("/v1/churn/state/shop-1").status_code == 200
+	assert client.get("/v1/churn/state/shop-1/scores").status_code == 404
+
+
+def test_unreadable_state_is_not_replaced(tmp_path):
+	store = RfmStore(tmp_path)
+	delta = aggregate(_transactions(50))
+	store.apply("shop-1", delta, "a")
+	path = tmp_path / "shop-1.pkl"
+	path.write_bytes(b"truncated")
+	with pytest.raises(RfmStateError):
+		store.apply("shop-1", delta, "b")
+	assert path.read_bytes() == b"truncated"
+
+
+def test_state_is_read_from_the_sidecar(tmp_path):
+	store = RfmStore(tmp_path)
+	state, _, _ = store.apply("shop-1", aggregate(_transactions(50)), "a")
+	(tmp_path / "shop-1.pkl").write_bytes(b"truncated")
+	# the aggregates are not needed to describe the dataset
+	assert store.state("shop-1") == state
+	(tmp_path / "shop-1.json").unlink()
+	with pytest.raises(RfmStateError):
+		store.state("shop-1")
+	assert store.delete("shop-1")
+	assert store.state("shop-1") is None
+	assert list(tmp_path.glob("shop-1.*")) == [tmp_path / "shop-1.lock"]
+
+
+def test_state_endpoints_report_unreadable_state():
+	client = TestClient(app)
+	files = {"file": ("tx.csv", _csv(_transactions(50)), "text/csv")}
+	assert client.post("/v1/churn/state/shop-1", files=files).status_code == 200
+	(api.rfm_store.root / "shop-1.json").unlink()
+	(api.rfm_store.root / "shop-1.pkl").write_bytes(b"truncated")
+	r = client.get("/v1/churn/state/shop-1")
+	assert r.status_code == 500 and "unreadable" in r.json()["detail"]
+	assert client.get("/v1/churn/state/bad name").status_code == 422
+	assert client.delete("/v1/churn/state/bad name").status_code == 422
+	assert client.delete("/v1/churn/state/shop-1").status_code == 200
+	assert client.delete("/v1/churn/state/shop-1").status_code == 404
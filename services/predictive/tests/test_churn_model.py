@@ -0,0 +1,100 @@
+import io
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.services.predictive.app.main import app
+from ai_insight_suite.services.predictive.app.pipelines import churn_model
+from ai_insight_suite.services.predictive.app.pipelines.churn import aggregate
+from ai_insight_suite.services.predictive.app.pipelines.churn_registry import ChurnRegistry
+
+START = pd.Timestamp("2023-01-01")
+DAYS = 540
+
+
+def _transactions(customers: int = 600, seed: int = 0) -> pd.DataFrame:
+	# Each customer buys at their own rate until a random stop day (past the end = retained)
+	rng = np.random.default_rng(seed)
+	rows = []
+	for cid in range(customers):
+		rate = rng.uniform(0.5, 6.0) / 30
+		stop = rng.uniform(60, DAYS * 1.6)
+		days = np.cumsum(rng.exponential(1 / rate, 200))
+		days = days[days < min(stop, DAYS)]
+		dates = START + pd.to_timedelta(days, unit="D")
+		rows.append(pd.DataFrame({"customer_id": cid, "date": dates}))
+	df = pd.concat(rows, ignore_index=True)
+	df["amount"] = rng.gamma(2.0, 40.0, len(df)).round(2)
+	return df
+
+
+def _csv(df: pd.DataFrame) -> bytes:
+	buf = io.BytesIO()
+	df.to_csv(buf, index=False)
+	return buf.getvalue()
+
+
+def test_train_versions_and_registry(monkeypatch):
+	df = _transactions()
+	cutoff = df["date"].max() - pd.Timedelta(days=90)
+	meta = churn_model.train([df], "shop", cutoff, label_days=90, algorithm="sklearn")
+	assert meta.version == 1 and meta.algorithm == "sklearn"
+	assert meta.metrics["auc"] > 0.7
+	assert 0 < meta.churn_rate < 1
+
+	registry = churn_model.churn_registry
+	assert churn_model.train([df], "shop", cutoff, algorithm="sklearn").version == 2
+	assert registry.get("shop").meta.version == 2
+	assert registry.loads == 0  # saved models are live without being read back
+
+	fresh = ChurnRegistry(registry.root)
+	assert fresh.warm() == ["shop"]
+	fresh.get("shop")
+	fresh.get("shop", 1)
+	assert fresh.loads == 2
+
+	agg = aggregate(df)
+	whole = churn_model.predict(fresh.get("shop"), agg)
+	monkeypatch.setattr(settings, "CHURN_SCORE_BATCH", 37)
+	assert np.allclose(churn_model.predict(fresh.get("shop"), agg), whole)
+
+
+def test_train_and_score_endpoints():
+	client = TestClient(app)
+	payload = _csv(_transactions(seed=1))
+	r = client.post(
+		"/v1/churn/models/demo",
+		files={"file": ("tx.csv", payload, "text/csv")},
+		data={"algorithm": "sklearn"},
+	)
+	assert r.status_code == 200, r.text
+	assert r.json()["version"] == 1
+	assert client.get("/v1/churn/models").json()["models"][0]["name"] == "demo"
+
+	files = {"file": ("tx.csv", payload, "text/csv")}
+	body = client.post("/v1/churn", files=files, data={"model": "demo"}).json()
+	assert body["model"]["version"] == 1
+	assert all(0 <= row["churn_score"] <= 1 for row in body["results"])
+	assert client.post("/v1/churn", files=files, data={"model": "nope"}).status_code == 404
+	r = client.post(
+		"/v1/churn/models/demo",
+		files={"file": ("tx.csv", payload, "text/csv")},
+		data={"algorithm": "catboost"},
+	)
+	assert r.status_code == 422
+
+
+def test_labels_only_count_purchases_in_window():
+	df = pd.DataFrame({
+		"customer_id": ["a", "a", "b", "b", "c"],
+		"date": pd.to_datetime(
+			["2024-01-01", "2024-02-15", "2024-01-05", "2024-09-01", "2024-01-10"]
+		),
+		"amount": [10.0, 10.0, 10.0, 10.0, 10.0],
+	})
+	history, y = churn_model.labelled([df], pd.Timestamp("2024-01-31"), label_days=90)
+	labels = dict(zip(history["customer_id"], y))
+	# b came back after the 90 days: still churned for this label window
+	assert labels == {"a": 0, "b": 1, "c": 1}
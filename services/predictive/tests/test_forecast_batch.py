@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.services.predictive.app.main import app
+from ai_insight_suite.services.predictive.app.pipelines.forecast import forecast_many
+
+
+def _long_frame() -> pd.DataFrame:
+	rng = np.random.default_rng(0)
+	frames = []
+	for store in ("A", "B"):
+		for product in ("x", "y"):
+			n = 36
+			frames.append(
+				pd.DataFrame({
+					"date": pd.date_range("2020-01-01", periods=n, freq="MS"),
+					"store": store,
+					"product": product,
+					"revenue": 50 + np.arange(n) + rng.normal(0, 1, n),
+				})
+			)
+	# duplicate dates cannot be put on a regular frequency
+	bad = pd.DataFrame({
+		"date": pd.to_datetime(["2020-01-01"] * 2),
+		"store": "C",
+		"product": "x",
+		"revenue": [1, 2],
+	})
+	return pd.concat(frames + [bad], ignore_index=True)
+
+
+def test_forecast_many_isolates_failures(monkeypatch):
+	monkeypatch.setattr(settings, "FORECAST_WORKERS", 1)
+	out = forecast_many(_long_frame(), ["store", "product"], horizon=3, freq="MS")
+	assert out["summary"]["series"] == 5
+	assert out["summary"]["failed"] == 1
+	failed = [s for s in out["series"] if not s["ok"]]
+	assert failed[0]["series_id"] == "C|x"
+	assert len(out["forecast"]["yhat"]) == 4 * 3
+	assert out["forecast"]["series_id"][:3] == ["A|x"] * 3
+
+
+def test_forecast_batch_endpoint(monkeypatch):
+	monkeypatch.setattr(settings, "FORECAST_WORKERS", 1)
+	buf = io.BytesIO()
+	_long_frame().to_csv(buf, index=False)
+	client = TestClient(app)
+	r = client.post(
+		"/v1/forecast/batch",
+		files={"file": ("sales.csv", buf.getvalue(), "text/csv")},
+		data={"series_cols": "store,product", "horizon": "2", "freq": "MS"},
+	)
+	assert r.status_code == 200
+	assert r.json()["summary"]["ok"] == 4
+	r = client.post(
+		"/v1/forecast/batch",
+		files={"file": ("sales.csv", buf.getvalue(), "text/csv")},
+		data={"series_cols": "region"},
+	)
+	assert r.status_code == 422
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from ai_insight_suite.libs.common.config import settings
+from ai_insight_suite.services.predictive.app.pipelines.forecast import forecast_dataframe
+
+
+def _monthly(n: int, bump: float = 0.0) -> pd.DataFrame:
+	rng = np.random.default_rng(1)
+	t = np.arange(n)
+	y = 100 + 0.5 * t + 10 * np.sin(2 * np.pi * t / 12) + rng.normal(0, 1, n)
+	y[-1] += bump
+	return pd.DataFrame({"date": pd.date_range("2018-01-01", periods=n, freq="MS"), "revenue": y})
+
+
+def _sarimax(df: pd.DataFrame, series_id: str):
+	return forecast_dataframe(df, horizon=3, freq="MS", model="sarimax", series_id=series_id)
+
+
+def test_state_is_reused_appended_and_refit(monkeypatch):
+	first = _sarimax(_monthly(48), "store-1")
+	assert first["model_info"]["state"] == "fit"
+
+	again = _sarimax(_monthly(48), "store-1")
+	assert again["model_info"]["state"] == "reused"
+	assert again["predictions"] == first["predictions"]
+
+	appended = _sarimax(_monthly(49), "store-1")
+	assert appended["model_info"]["state"] == "appended"
+	assert appended["predictions"][0]["ds"] > first["predictions"][0]["ds"]
+
+	# a point far outside the model's expectations triggers a refit
+	spiked = _monthly(50, bump=500)
+	drifted = _sarimax(spiked, "store-1")
+	assert drifted["model_info"]["reason"] == "drift"
+
+	monkeypatch.setattr(settings, "FORECAST_REFIT_EVERY", 0)
+	longer = pd.concat([spiked, _monthly(51).tail(1)], ignore_index=True)
+	scheduled = _sarimax(longer, "store-1")
+	assert scheduled["model_info"]["reason"] == "scheduled"
+
+
+def test_changed_history_is_refit():
+	_sarimax(_monthly(48), "s")
+	edited = _monthly(49)
+	edited.loc[45, "revenue"] += 50
+	out = _sarimax(edited, "s")
+	assert out["model_info"]["reason"] == "history_changed"
@@ -0,0 +1,73 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+from fastapi.testclient import TestClient
+
+from ai_insight_suite.services.predictive.app.main import app
+
+
+def _transactions() -> bytes:
+	rng = np.random.default_rng(0)
+	n = 300
+	buf = io.BytesIO()
+	pd.DataFrame({
+		"customer_id": rng.integers(1, 40, n),
+		"date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 200, n), unit="D"),
+		"amount": rng.uniform(5, 50, n).round(2),
+	}).to_csv(buf, index=False)
+	return buf.getvalue()
+
+
+def _churn(client: TestClient, **kwargs):
+	files = {"file": ("tx.csv", _transactions(), "text/csv")}
+	return client.post("/v1/churn", files=files, **kwargs)
+
+
+def test_churn_formats_agree():
+	client = TestClient(app)
+	records = _churn(client).json()["results"]
+
+	r = _churn(client, params={"format": "columnar"})
+	assert r.headers["content-type"].startswith("application/vnd.insight.columnar+json")
+	body = r.json()
+	assert body["rows"] == len(records)
+	assert body["columns"]["customer_id"] == [x["customer_id"] for x in records]
+	# 15 significant digits, as written by pandas
+	assert body["columns"]["churn_score"] == pytest.approx([x["churn_score"] for x in records])
+
+	r = _churn(client, headers={"Accept": "application/x-ndjson"})
+	lines = [json.loads(line) for line in r.text.splitlines()]
+	assert [x["customer_id"] for x in lines] == [x["customer_id"] for x in records]
+	assert [x["bucket"] for x in lines] == [x["bucket"] for x in records]
+
+	r = _churn(client, params={"format": "arrow"})
+	table = pa.ipc.open_stream(r.content).read_all()
+	assert table.column("churn_score").to_pylist() == [x["churn_score"] for x in records]
+
+
+def test_forecast_columnar_carries_meta():
+	buf = io.BytesIO()
+	pd.DataFrame({
+		"date": pd.date_range("2022-01-01", periods=24, freq="MS"),
+		"revenue": np.arange(24) + 100.0,
+	}).to_csv(buf, index=False)
+	r = TestClient(app).post(
+		"/v1/forecast",
+		params={"format": "columnar"},
+		files={"file": ("sales.csv", buf.getvalue(), "text/csv")},
+		data={"horizon": "3", "freq": "MS", "model": "naive"},
+	)
+	assert r.status_code == 200
+	body = r.json()
+	assert body["rows"] == 3
+	assert body["columns"]["ds"][0].startswith("2024-01-01")
+	assert "model_info" in body and "metrics" in body
+
+
+def test_unknown_format_rejected():
+	r = _churn(TestClient(app), params={"format": "xml"})
+	assert r.status_code == 422
@@ -0,0 +1,78 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from ai_insight_suite.services.predictive.app.main import app
+from ai_insight_suite.services.predictive.app.pipelines.ingest import (
+	detect_format,
+	iter_transactions,
+	read_forecast_input,
+)
+
+
+def _wide(n: int = 60) -> pd.DataFrame:
+	rng = np.random.default_rng(0)
+	df = pd.DataFrame({
+		"Date": pd.date_range("2022-01-02", periods=n, freq="W").strftime("%Y-%m-%d"),
+		"revenue": 100 + rng.normal(0, 5, n),
+		"store": rng.choice([1, 2], n),
+	})
+	for i in range(10):
+		df[f"extra_{i}"] = rng.normal(size=n)
+	return df
+
+
+def _encode(df: pd.DataFrame, fmt: str) -> bytes:
+	buf = io.BytesIO()
+	if fmt == "csv":
+		df.to_csv(buf, index=False)
+	elif fmt == "parquet":
+		df.to_parquet(buf, index=False)
+	else:
+		df.to_feather(buf)
+	return buf.getvalue()
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "arrow"])
+def test_reads_only_needed_columns(fmt):
+	out = read_forecast_input(io.BytesIO(_encode(_wide(), fmt)), fmt, ["store"])
+	assert list(out.columns) == ["Date", "revenue", "store"]
+	assert out["Date"].dtype == "datetime64[ns]"
+	assert out["revenue"].dtype == "float64"
+	assert set(out["store"]) == {"1", "2"}
+
+
+def test_transactions_batches_and_date_fallback():
+	df = pd.DataFrame({
+		"customer_id": [1, 2, 3, 1, 2],
+		"txn_date": ["15/01/2024", "16/01/2024", "17/01/2024", "18/01/2024", "19/01/2024"],
+		"value": ["1", "2", "3", "4", "5"],
+		"note": ["a"] * 5,
+	})
+	batches = list(iter_transactions(io.BytesIO(_encode(df, "csv")), "csv", batch_rows=2))
+	assert [len(b) for b in batches] == [2, 2, 1]
+	assert batches[0]["customer_id"].tolist() == ["1", "2"]
+	assert batches[-1]["txn_date"].iloc[0] == pd.Timestamp("2024-01-19")
+	assert "note" not in batches[0].columns
+
+
+def test_unsupported_format():
+	with pytest.raises(ValueError):
+		detect_format("sales.json")
+	assert detect_format("Sales.PARQUET") == "parquet"
+
+
+def test_forecast_parquet_upload():
+	client = TestClient(app)
+	r = client.post(
+		"/v1/forecast",
+		files={"file": ("sales.parquet", _encode(_wide(), "parquet"), "application/octet-stream")},
+		data={"model": "theta", "horizon": "4"},
+	)
+	assert r.status_code == 200, r.text
+	assert len(r.json()["predictions"]) == 4
+	r = client.post("/v1/forecast", files={"file": ("sales.txt", b"x", "text/plain")})
+	assert r.status_code == 422
@@ -0,0 +1,51 @@
+import io
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from ai_insight_suite.libs.common.metrics import STAGE_SECONDS, Registry, span, start_request
+from ai_insight_suite.services.predictive.app.main import app
+
+
+def test_histogram_renders_cumulative_buckets():
+	reg = Registry()
+	h = reg.histogram("t_seconds", "test", ("stage",), buckets=(0.1, 1))
+	for v in (0.05, 0.5, 0.5, 3):
+		h.observe(v, "a")
+	c = reg.counter("t_total", "test")
+	c.inc(amount=2)
+	text = reg.render()
+	assert 't_seconds_bucket{stage="a",le="0.1"} 1' in text
+	assert 't_seconds_bucket{stage="a",le="1"} 3' in text
+	assert 't_seconds_bucket{stage="a",le="+Inf"} 4' in text
+	assert 't_seconds_sum{stage="a"} 4.05' in text
+	assert "# TYPE t_total counter\nt_total 2" in text
+
+
+def test_span_records_on_error_and_into_request():
+	stages = start_request()
+	before = STAGE_SECONDS.snapshot("test.fail")[0]
+	try:
+		with span("test.fail"):
+			raise RuntimeError
+	except RuntimeError:
+		pass
+	assert STAGE_SECONDS.snapshot("test.fail")[0] == before + 1
+	assert "test.fail" in stages
+
+
+def test_metrics_endpoint_has_stages_and_routes():
+	buf = io.BytesIO()
+	pd.DataFrame({
+		"customer_id": [1, 1, 2, 3],
+		"date": ["2024-01-01", "2024-02-01", "2024-01-15", "2024-03-01"],
+		"amount": [10.0, 20.0, 5.0, 7.5],
+	}).to_csv(buf, index=False)
+	client = TestClient(app)
+	r = client.post("/v1/churn", files={"file": ("tx.csv", buf.getvalue(), "text/csv")})
+	assert r.status_code == 200
+	r = client.get("/metrics")
+	assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+	for stage in ("upload", "churn.aggregate", "churn.score"):
+		assert f'insight_stage_seconds_count{{stage="{stage}"}}' in r.text
+	assert 'route="/v1/churn",status="200"' in r.text